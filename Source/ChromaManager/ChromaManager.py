@@ -3,42 +3,440 @@ ChromaDB manager for RimTalk conversation storage and retrieval.
 Handles per-save database management, storing conversations with metadata,
 and querying relevant historical context for prompt enrichment.
 """
-from thefuzz import process, fuzz
 import chromadb
+import numpy as np
+import functools
 import hashlib
 import json
+import os
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
 import threading
 import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-# Global embedding model (loaded once)
-_model = None
-_model_lock = threading.Lock()
-
-
-def get_embedding_model():
-    """Get or initialize the lightweight Chinese embedding model."""
-    global _model
-    if _model is None:
-        with _model_lock:
-            if _model is None:
-                # CHANGE 1: Use the standard FlagModel, not BGEM3FlagModel
-                # CHANGE 2: Use the 'small' Chinese model
-                from FlagEmbedding import FlagModel
-                _model = FlagModel(
-                    # 'BAAI/bge-base-zh-v1.5', 
-                    'BAAI/bge-m3', 
-                    use_fp16=True
+from EmbeddingBackends import (
+    DEFAULT_MODEL_ID, KNOWN_DIMENSIONS, ChromaDefaultBackend, EmbeddingBackend, TorchBackend, backend_family,
+    create_backend
+)
+from EmbeddingCache import EmbeddingCache
+from EmbeddingScheduler import EmbeddingScheduler
+from GameTime import parse_game_day, recency_factors, time_metadata
+from HotTier import HotTier
+from QueryCache import QueryResultCache
+from Rerank import FUSION_METHODS, CandidatePool
+from SaveSnapshot import SNAPSHOT_SUFFIX, SnapshotReader, SnapshotWriter
+from Telemetry import telemetry
+from TitleIndex import TitleIndex
+
+EMBEDDING_MODEL_ID = DEFAULT_MODEL_ID
+
+# (backend, model) that wrote the vectors of saves created before the model was
+# recorded, by vector dimension: at first Chroma embedded documents with its
+# default function, later the manager embedded them with the torch model
+LEGACY_EMBEDDINGS = {
+    KNOWN_DIMENSIONS[ChromaDefaultBackend.MODEL_ID]: (ChromaDefaultBackend.name, ChromaDefaultBackend.MODEL_ID),
+    KNOWN_DIMENSIONS[EMBEDDING_MODEL_ID]: (TorchBackend.name, EMBEDDING_MODEL_ID),
+}
+
+# Embedding backends in use (loaded once each), keyed by (backend name, model id)
+_backends: Dict[Tuple[str, Optional[str]], EmbeddingBackend] = {}
+_backends_lock = threading.Lock()
+_backend_defaults = {"backend": TorchBackend.name, "model_id": None}
+
+# Micro-batching schedulers in front of the backends, keyed by backend cache id
+_schedulers: Dict[str, EmbeddingScheduler] = {}
+_scheduler_lock = threading.Lock()
+_scheduler_settings = {"max_batch_size": 64, "max_wait": 0.005, "num_threads": None}
+
+# Metadata key marking a pawn as listener of a conversation entry ("listener:<name>": True).
+# One boolean key per pawn lets listener filters run inside Chroma's where clause.
+LISTENER_KEY_PREFIX = "listener:"
+
+# "gen_to" of background entries that belong to every future generation
+GENERATION_OPEN = 2 ** 31 - 1
+
+# Collections of a save: conversation history (also holds the save's metadata)
+# and background knowledge ("info" entries)
+CONVERSATION_COLLECTION = "conversations"
+BACKGROUND_COLLECTION = "background"
+
+# Directory suffixes used while import_save() swaps a loaded snapshot in
+IMPORT_STAGING_SUFFIX = ".importing"
+IMPORT_REPLACED_SUFFIX = ".replaced"
+
+# Fields an exported/listed entry can carry (see ChromaDBManager.page_entries)
+ENTRY_FIELDS = ("id", "text", "speaker", "listeners", "date", "talk_type", "seq", "day", "tick")
+DEFAULT_ENTRY_FIELDS = ENTRY_FIELDS[:6]
+
+
+def listener_key(name: str) -> str:
+    return LISTENER_KEY_PREFIX + name
+
+
+def listeners_from_metadata(meta: Dict) -> List[str]:
+    """Recover the listener names of an entry from its membership keys."""
+    return [key[len(LISTENER_KEY_PREFIX):] for key in meta if key.startswith(LISTENER_KEY_PREFIX)]
+
+
+def configure_embedding_backend(backend: str = TorchBackend.name, model_id: Optional[str] = None):
+    """
+    Choose the backend used by saves that do not record one yet.
+    
+    Args:
+        backend: Registered backend name ("torch", "onnx", "int8", "hash")
+        model_id: Model to load (backend default if None)
+    """
+    _backend_defaults.update(backend=backend, model_id=model_id)
+
+
+def get_embedding_backend(name: Optional[str] = None, model_id: Optional[str] = None) -> EmbeddingBackend:
+    """Get or create an embedding backend (the configured default if `name` is None)."""
+    if name is None:
+        name, model_id = _backend_defaults["backend"], model_id or _backend_defaults["model_id"]
+    key = (name, model_id)
+    backend = _backends.get(key)
+    if backend is None:
+        with _backends_lock:
+            backend = _backends.get(key)
+            if backend is None:
+                # Construction is cheap (models load lazily); reuse an instance
+                # already serving the resolved model ID
+                created = create_backend(name, model_id, num_threads=_scheduler_settings["num_threads"])
+                backend = _backends.setdefault((name, created.model_id), created)
+                _backends[key] = backend
+    return backend
+
+
+def get_embedding_model() -> EmbeddingBackend:
+    """Get and load the default embedding backend."""
+    backend = get_embedding_backend()
+    backend.load()
+    return backend
+
+
+def configure_embedding_scheduler(
+    max_batch_size: int = 64,
+    max_wait: float = 0.005,
+    num_threads: Optional[int] = None
+):
+    """
+    Tune the cross-request micro-batching of embedding calls.
+    
+    Args:
+        max_batch_size: Maximum texts per forward pass
+        max_wait: Seconds a micro-batch keeps collecting after its first request
+        num_threads: Intra-op threads of the inference runtime (None keeps the default)
+    """
+    with _scheduler_lock:
+        _scheduler_settings.update(max_batch_size=max_batch_size, max_wait=max_wait, num_threads=num_threads)
+        old = list(_schedulers.values())
+        _schedulers.clear()
+    for scheduler in old:
+        scheduler.close()
+    with _backends_lock:
+        for backend in _backends.values():
+            backend.set_num_threads(num_threads)
+
+
+def get_embedding_scheduler(backend: Optional[EmbeddingBackend] = None) -> EmbeddingScheduler:
+    """Get or create the scheduler that batches encode calls across requests to `backend`."""
+    backend = backend or get_embedding_backend()
+    scheduler = _schedulers.get(backend.cache_id)
+    if scheduler is None:
+        with _scheduler_lock:
+            scheduler = _schedulers.get(backend.cache_id)
+            if scheduler is None:
+                scheduler = EmbeddingScheduler(
+                    functools.partial(_encode_timed, backend),
+                    _scheduler_settings["max_batch_size"],
+                    _scheduler_settings["max_wait"]
                 )
-    return _model
+                _schedulers[backend.cache_id] = scheduler
+    return scheduler
+
+
+def _encode_timed(backend: EmbeddingBackend, texts: List[str]) -> np.ndarray:
+    """One forward pass of the model, recorded as the "embed.model" stage."""
+    with telemetry.stage("embed.model"):
+        vectors = backend.encode(texts)
+    telemetry.incr("embed.model_texts", len(texts))
+    return vectors
+
+
+def scheduler_stats() -> Dict[str, Dict]:
+    with _scheduler_lock:
+        return {cache_id: scheduler.stats() for cache_id, scheduler in _schedulers.items()}
 
 class BGE_Base_ZH(chromadb.EmbeddingFunction):
-    """Wrapper for BGE-Base-ZH."""
+    """Embedding function of one backend, served through an optional embedding cache."""
+    def __init__(self, cache: Optional[EmbeddingCache] = None, backend: Optional[EmbeddingBackend] = None):
+        self.cache = cache
+        self.backend = backend
+
     def __call__(self, input: chromadb.Documents) -> chromadb.Embeddings:
-        model = get_embedding_model()
-        # FlagModel.encode returns a list of arrays, which fits Chroma's expectation
-        return model.encode(input).tolist()
+        texts = list(input)
+        if not texts:
+            return []
+        # Misses go through the scheduler, which shares forward passes between concurrent callers
+        scheduler = get_embedding_scheduler(self.backend)
+        telemetry.incr("embed.texts", len(texts))
+        with telemetry.stage("embed"):
+            if self.cache is None:
+                # Backends return a (n, dim) array, which fits Chroma's expectation
+                return scheduler.encode(texts)
+            return np.vstack(self.cache.embed(texts, scheduler.encode))
+
+
+def _write_json_atomic(path: Path, data: Dict):
+    """Write a small JSON file so readers never observe a half-written state."""
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class SequenceAllocator:
+    """
+    Persistent, monotonic per-save sequence used to build document IDs.
+    
+    Sequence numbers are reserved from disk in blocks, so allocating is O(1)
+    and only touches the file once every BLOCK_SIZE numbers. After a restart
+    allocation resumes from the reserved high-water mark; unused numbers of
+    the last block are skipped, never reused. Deleting entries never lowers
+    the counter, so IDs stay collision-free across evictions.
+    
+    The same file records the eviction watermark: every conversation entry
+    with a sequence number below it has already been evicted.
+    """
+
+    BLOCK_SIZE = 1024
+
+    def __init__(self, path: Path, start: int = 0):
+        """
+        Args:
+            path: File holding the reserved high-water mark
+            start: First sequence number to hand out if the file does not exist yet
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+        reserved = start
+        floor = 0
+        if path.exists():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+                reserved = max(start, int(state.get("reserved", 0)))
+                floor = int(state.get("floor", 0))
+            except (ValueError, OSError) as e:
+                print(
+                    f"[RimTalk ChromaDB] Unreadable sequence file {path}, resuming from {start}: {e}",
+                    file=sys.stderr, flush=True
+                )
+
+        self._next = reserved
+        self._floor = floor
+        self._persist(reserved)
+
+    def _persist(self, reserved: int):
+        _write_json_atomic(self.path, {"reserved": reserved, "floor": self._floor})
+        self._reserved = reserved
+
+    def allocate(self, count: int = 1) -> int:
+        """
+        Reserve `count` consecutive sequence numbers.
+        
+        Returns:
+            The first number of the reserved range
+        """
+        with self._lock:
+            first = self._next
+            self._next += count
+            if self._next > self._reserved:
+                self._persist(self._next + self.BLOCK_SIZE)
+            return first
+
+    def peek(self) -> int:
+        """Return the next number that would be allocated."""
+        with self._lock:
+            return self._next
+
+    @property
+    def floor(self) -> int:
+        """Eviction watermark: conversation entries below it are gone."""
+        with self._lock:
+            return self._floor
+
+    def set_floor(self, floor: int):
+        """Advance the eviction watermark (it never moves backwards)."""
+        with self._lock:
+            if floor > self._floor:
+                self._floor = floor
+                self._persist(self._reserved)
+
+    def advance(self, value: int):
+        """Never hand out numbers below `value` (e.g. after importing entries)."""
+        with self._lock:
+            if value > self._next:
+                self._next = value
+                if self._next > self._reserved:
+                    self._persist(self._next + self.BLOCK_SIZE)
+
+
+class IngestionQueue:
+    """
+    Write-behind queue that group-commits conversation turns.
+    
+    Turns are acknowledged as soon as they are queued. A single worker thread
+    drains the queue, merging records of the same save into one commit call,
+    and commits once `max_batch_size` documents are waiting or the oldest turn
+    has waited `max_delay` seconds. flush() lets readers wait for everything
+    acknowledged before them.
+    """
+
+    def __init__(self, commit_fn, max_batch_size: int = 64, max_delay: float = 0.05):
+        """
+        Args:
+            commit_fn: Callable(save_id, ids, documents, metadatas) performing the write
+            max_batch_size: Maximum number of documents taken per batch
+            max_delay: Maximum seconds the oldest queued turn waits before a commit
+        """
+        self._commit_fn = commit_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_delay = max(0.0, float(max_delay))
+
+        # (save_id, ids, documents, metadatas, enqueue_time, ticket)
+        self._items: List[Tuple] = []
+        self._cond = threading.Condition()
+        self._submitted: Dict[str, int] = {}
+        self._committed: Dict[str, int] = {}
+        self._flush_waiters = 0
+        self._closed = False
+        self.failed_batches = 0
+
+        self._worker = threading.Thread(target=self._run, name="RimTalkIngestion", daemon=True)
+        self._worker.start()
+
+    def submit(self, save_id: str, ids: List[str], documents: List[str], metadatas: List[Dict]):
+        """Queue the prepared records of one conversation turn."""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Ingestion queue is closed")
+            ticket = self._submitted.get(save_id, 0) + 1
+            self._submitted[save_id] = ticket
+            self._items.append((save_id, ids, documents, metadatas, time.monotonic(), ticket))
+            self._cond.notify_all()
+
+    def pending(self, save_id: Optional[str] = None) -> int:
+        """Number of queued turns not yet committed."""
+        with self._cond:
+            saves = [save_id] if save_id is not None else list(self._submitted)
+            return sum(self._submitted.get(s, 0) - self._committed.get(s, 0) for s in saves)
+
+    def flush(self, save_id: Optional[str] = None, timeout: Optional[float] = None) -> bool:
+        """Block until every turn queued so far (for one save or all) is committed."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            targets = {
+                s: t for s, t in self._submitted.items()
+                if save_id is None or s == save_id
+            }
+
+            def done():
+                return all(self._committed.get(s, 0) >= t for s, t in targets.items())
+
+            if done():
+                return True
+
+            self._flush_waiters += 1
+            self._cond.notify_all()
+            try:
+                while not done():
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                return True
+            finally:
+                self._flush_waiters -= 1
+
+    def close(self, timeout: Optional[float] = None):
+        """Commit everything still queued and stop the worker."""
+        self.flush(timeout=timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._worker.join(timeout)
+
+    def _take_batch(self) -> List[Tuple]:
+        """Wait until a batch is due and remove it from the queue."""
+        with self._cond:
+            while True:
+                if self._items:
+                    queued_docs = sum(len(item[2]) for item in self._items)
+                    age = time.monotonic() - self._items[0][4]
+                    if (queued_docs >= self.max_batch_size or age >= self.max_delay
+                            or self._flush_waiters or self._closed):
+                        break
+                    self._cond.wait(self.max_delay - age)
+                elif self._closed:
+                    return []
+                else:
+                    self._cond.wait()
+
+            batch = []
+            taken_docs = 0
+            while self._items and (not batch or taken_docs + len(self._items[0][2]) <= self.max_batch_size):
+                item = self._items.pop(0)
+                taken_docs += len(item[2])
+                batch.append(item)
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return
+
+            # Group records per save, keeping enqueue order within each save
+            grouped: Dict[str, List[Tuple]] = {}
+            for item in batch:
+                grouped.setdefault(item[0], []).append(item)
+
+            for save_id, items in grouped.items():
+                ids, documents, metadatas = [], [], []
+                for _, item_ids, item_docs, item_metas, _, _ in items:
+                    ids.extend(item_ids)
+                    documents.extend(item_docs)
+                    metadatas.extend(item_metas)
+                try:
+                    self._commit_fn(save_id, ids, documents, metadatas)
+                except Exception as e:
+                    self.failed_batches += 1
+                    # stderr: stdout carries the CLI's JSON replies
+                    print(
+                        f"[RimTalk ChromaDB] Error committing {len(documents)} queued entries for save {save_id}: {e}",
+                        file=sys.stderr, flush=True
+                    )
+
+                with self._cond:
+                    self._committed[save_id] = max(self._committed.get(save_id, 0), items[-1][5])
+                    self._cond.notify_all()
+
+
+def _pins_save(method):
+    """Keep the save named by the first argument open (not evicted from the pool) while `method` runs."""
+    @functools.wraps(method)
+    def wrapper(self, save_id, *args, **kwargs):
+        with self._using(save_id):
+            return method(self, save_id, *args, **kwargs)
+    return wrapper
 
 
 class ChromaDBManager:
@@ -60,14 +458,103 @@ class ChromaDBManager:
         self.base_dir = Path(base_dir)
         self.base_dir.mkdir(parents=True, exist_ok=True)
         
-        # Active collections per save (save_id -> collection)
+        # Active collections per save (save_id -> collection): conversations, background
         self._collections: Dict[str, chromadb.Collection] = {}
+        self._backgrounds: Dict[str, chromadb.Collection] = {}
         self._clients: Dict[str, chromadb.PersistentClient] = {}
+        self._sequences: Dict[str, SequenceAllocator] = {}
         self._lock = threading.Lock()
+
+        # Cached entry count per save, kept in step with our own adds/deletes.
+        # Background rows no longer visible (retired by a sync, purged by the
+        # next one) are not counted; _retired holds how many are still stored.
+        self._counts: Dict[str, int] = {}
+        self._retired: Dict[str, int] = {}
+        self._count_lock = threading.Lock()
+
+        # Saves with a background eviction currently running
+        self._evicting: set = set()
+
+        # Write generation per save: bumped by every change to its entries
+        self._write_generations: Dict[str, int] = {}
+        self.query_cache = QueryResultCache()
+
+        # Active background generation per save, and a lock serializing syncs
+        self._bg_generations: Dict[str, int] = {}
+        self._bg_locks: Dict[str, threading.Lock] = {}
+
+        # Newest game day per save: days of new turns are noted as they arrive,
+        # stored entries are scanned once per open save (see _latest_day)
+        self._latest_days: Dict[str, int] = {}
+        self._scanned_days: set = set()
         
         # Entry limit per collection
         self.ENTRY_LIMIT = 200000
-        self.embedding_fn = BGE_Base_ZH()
+        # Maximum sequence span (and so rows) read per eviction step
+        self.EVICTION_BATCH_SIZE = 2000
+        # Default and maximum number of entries per page_entries() page
+        self.PAGE_SIZE = 500
+        self.MAX_PAGE_SIZE = 5000
+        # Rows per snapshot chunk (export) and per collection.add call (import)
+        self.SNAPSHOT_CHUNK_SIZE = 2000
+        # HNSW parameters of new collections. Conversations form a large,
+        # append-heavy index; the background set is small, rebuilt by syncs and
+        # queried for 50 hits, so it gets a denser graph and a wider search.
+        self.CONVERSATION_INDEX = {"space": "l2", "ef_construction": 100, "max_neighbors": 16, "ef_search": 100}
+        self.BACKGROUND_INDEX = {"space": "l2", "ef_construction": 200, "max_neighbors": 32, "ef_search": 200}
+        # Background and conversation searches of a query run side by side here
+        self._search_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="RimTalkSearch")
+        # Conversation candidates fetched per query when ranking by recency,
+        # and the share of similarity an entry keeps however old it is
+        self.RECENCY_CANDIDATES = 40
+        self.RECENCY_FLOOR = 0.5
+
+        # In-memory hot tier per save holding its newest conversation entries
+        # (see configure_hot_tier); HOT_TIER_SIZE = 0 disables it
+        self.HOT_TIER_SIZE = 5000
+        self.HOT_TIER_DTYPE = "float32"
+        self.HOT_TIER_CONFIDENCE = 0.8
+        self._hot_tiers: Dict[str, HotTier] = {}
+        self._hot_lock = threading.Lock()
+
+        # Reranking of the merged hits (see configure_rerank): fusion across
+        # queries, relevance/novelty trade-off, near-duplicate cut-off and the
+        # time the selection may take
+        self.RERANK_FUSION = "max"
+        self.MMR_LAMBDA = 0.7
+        self.DUPLICATE_SIMILARITY: Optional[float] = 0.97
+        self.RERANK_BUDGET = 0.01
+
+        # Background titles mentioned in the query text are matched directly
+        # (see configure_title_match): "fuzzy", "exact" or "off"
+        self.TITLE_MATCH = "fuzzy"
+        self._title_indexes: Dict[str, TitleIndex] = {}
+        self._title_lock = threading.Lock()
+
+        # Embeddings are always computed here (through a cache per backend) and
+        # handed to Chroma precomputed. Each save is bound to one backend.
+        self._embedders: Dict[str, BGE_Base_ZH] = {}
+        self._save_embedders: Dict[str, BGE_Base_ZH] = {}
+
+        # Write-behind queue for conversation turns (None = synchronous writes)
+        self._ingestion: Optional[IngestionQueue] = None
+
+        # Pool of open saves: at most MAX_OPEN_SAVES (0 = no cap) stay open and
+        # within MEMORY_BUDGET bytes of index files (None = no budget); saves
+        # idle for IDLE_TIMEOUT seconds (0 = never) are closed. Saves with
+        # requests in flight are never closed.
+        self.MAX_OPEN_SAVES = 4
+        self.IDLE_TIMEOUT = 900.0
+        self.MEMORY_BUDGET: Optional[int] = None
+        self._pool_cond = threading.Condition()
+        self._last_used: Dict[str, float] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._closing: set = set()
+        self.pool_evictions = 0
+        self._pool_stopped = False
+        # Called with the save ID after a save is closed (see add_close_listener)
+        self._close_listeners: List[Callable[[str], None]] = []
+        threading.Thread(target=self._run_reaper, name="RimTalkSavePool", daemon=True).start()
 
     def check_database_health(self, save_id: str) -> bool:
         try:
@@ -75,7 +562,7 @@ class ChromaDBManager:
             collection = self.get_or_create_collection(save_id)
             
             # 步骤2: 测试计数操作（基本读取测试）
-            count = collection.count()
+            count = collection.count() + self._backgrounds[save_id].count()
             
             # 步骤3: 测试查询操作（复杂操作测试）
             test_results = collection.peek(limit=1)  # 查看前1条记录
@@ -87,19 +574,31 @@ class ChromaDBManager:
             # 步骤5: 任何一步出错都认为数据库不健康
             return False
 
-    def get_or_create_collection(self, save_id: str) -> chromadb.Collection:
+    def get_or_create_collection(
+        self,
+        save_id: str,
+        backend: Optional[str] = None,
+        model_id: Optional[str] = None
+    ) -> chromadb.Collection:
         """
         Get or create a ChromaDB collection for a specific save.
         
         Args:
             save_id: Unique identifier for the save (e.g., world name or hash)
+            backend: Embedding backend to use (default: the one recorded for the save,
+                or the configured default for new saves)
+            model_id: Embedding model to use (default: the one recorded for the save)
             
         Returns:
             ChromaDB collection for this save
         """
+        self._touch(save_id)
         with self._lock:
             if save_id in self._collections:
-                return self._collections[save_id]
+                collection = self._collections[save_id]
+                if backend is not None or model_id is not None:
+                    self._bind_embedding(save_id, collection, backend, model_id)
+                return collection
 
             # Create save-specific directory
             save_dir = self.base_dir / save_id
@@ -107,18 +606,316 @@ class ChromaDBManager:
 
             # Create persistent client for this save
             client = chromadb.PersistentClient(path=str(save_dir))
-            self._clients[save_id] = client
 
-            # Get or create collection
+            # Get or create the save's two collections, each with its own index
+            # parameters. Embeddings are computed by the save's backend (see
+            # _bind_embedding), never by Chroma itself.
             collection = client.get_or_create_collection(
-                name="conversations",
-                #embedding_function=self.embedding_fn,
+                name=CONVERSATION_COLLECTION,
+                configuration={"hnsw": dict(self.CONVERSATION_INDEX)},
+                metadata={"save_id": save_id}
+            )
+            background = client.get_or_create_collection(
+                name=BACKGROUND_COLLECTION,
+                configuration={"hnsw": dict(self.BACKGROUND_INDEX)},
                 metadata={"save_id": save_id}
             )
             
+            self._migrate(collection, background)
+            self._backgrounds[save_id] = background
+            self._bind_embedding(save_id, collection, backend, model_id)
+            self._clients[save_id] = client
+            self._bg_generations[save_id] = int((collection.metadata or {}).get("background_generation", 0))
+            self._bg_locks.setdefault(save_id, threading.Lock())
             self._collections[save_id] = collection
-            return collection
+            self._sequences[save_id] = self._open_sequence(save_id, save_dir, (collection, background))
+            retired = self._count_invisible_background(background, self._bg_generations[save_id])
+            with self._count_lock:
+                self._counts[save_id] = collection.count() + background.count() - retired
+                self._retired[save_id] = retired
+
+        # Make room for the newly opened save
+        self._shrink_pool(exclude=save_id)
+        return collection
+
+    def background_collection(self, save_id: str) -> chromadb.Collection:
+        """Background-knowledge collection of a save (opened with its conversation collection)."""
+        self.get_or_create_collection(save_id)
+        return self._backgrounds[save_id]
+
+    # Bumped whenever stored metadata gains a field that old saves must backfill
+    SCHEMA_VERSION = 5
+
+    def _migrate(self, collection: chromadb.Collection, background: chromadb.Collection):
+        """
+        Bring a save's stored metadata up to SCHEMA_VERSION.
+        
+        Version 1: every entry carries a numeric "seq" (insertion order). Older
+        entries get it from the number embedded in their ID.
+        Version 2: conversation entries carry one "listener:<name>" key per
+        listener, decoded once from the JSON "listeners" field.
+        Version 3: background entries carry "content_hash" and the generation
+        range ["gen_from", "gen_to") they are visible in.
+        Version 4: conversation entries carry the absolute game "day", parsed
+        from their date string where it is a recognizable English date.
+        Version 5: background entries live in their own collection; they are
+        moved out of the conversation collection with their embeddings.
+        """
+        metadata = dict(collection.metadata or {})
+        version = metadata.get("schema_version", 0)
+        if version >= self.SCHEMA_VERSION:
+            return
+
+        offset = 0
+        page_size = 5000
+        while True:
+            page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+            ids = page["ids"]
+            update_ids = []
+            update_metas = []
+            for doc_id, meta in zip(ids, page["metadatas"]):
+                meta = meta or {}
+                patch = {}
+                if "seq" not in meta:
+                    patch["seq"] = self._sequence_from_id(doc_id, meta.get("save_id", ""))
+                if version < 2 and meta.get("talk_type") != "info":
+                    try:
+                        for name in json.loads(meta.get("listeners", "[]")):
+                            patch[listener_key(name)] = True
+                    except (ValueError, TypeError):
+                        pass
+                if meta.get("talk_type") == "info" and "gen_from" not in meta:
+                    patch["content_hash"] = self._background_hash_from_id(doc_id)
+                    patch["gen_from"] = 0
+                    patch["gen_to"] = GENERATION_OPEN
+                if meta.get("talk_type") != "info" and "day" not in meta:
+                    day = parse_game_day(meta.get("date", ""))
+                    if day is not None:
+                        patch["day"] = day
+                if patch:
+                    update_ids.append(doc_id)
+                    update_metas.append(patch)
+            if update_ids:
+                collection.update(ids=update_ids, metadatas=update_metas)
+            if len(ids) < page_size:
+                break
+            offset += page_size
+
+        if version < 5:
+            self._split_background(collection, background)
+
+        metadata["schema_version"] = self.SCHEMA_VERSION
+        collection.modify(metadata=metadata)
+
+    @staticmethod
+    def _split_background(collection: chromadb.Collection, background: chromadb.Collection, page_size: int = 2000):
+        """
+        Move every background ("info") row, with its stored embedding, from the
+        conversation collection into the background collection.
+        
+        Rows are copied (upsert) before they are deleted, so a move interrupted
+        midway is simply resumed on the next open.
+        """
+        while True:
+            page = collection.get(
+                where={"talk_type": "info"},
+                include=["documents", "metadatas", "embeddings"],
+                limit=page_size
+            )
+            if not page["ids"]:
+                break
+            background.upsert(
+                ids=page["ids"],
+                documents=page["documents"],
+                metadatas=page["metadatas"],
+                embeddings=page["embeddings"]
+            )
+            collection.delete(ids=page["ids"])
+
+    def _bind_embedding(
+        self,
+        save_id: str,
+        collection: chromadb.Collection,
+        backend: Optional[str],
+        model_id: Optional[str]
+    ):
+        """
+        Select the embedding backend of a save and record it in the collection metadata.
+        
+        A save keeps the model (and so the vector space) it was first embedded
+        with: requesting another model or a different dimension raises
+        ValueError. Switching between backends of the same model, e.g. from
+        "torch" to "int8", is allowed, and so is any switch while the save is
+        still empty. For saves created before the model was recorded, the model
+        is told by the dimension of their stored vectors (see LEGACY_EMBEDDINGS).
+        """
+        metadata = dict(collection.metadata or {})
+        stored_model = metadata.get("embedding_model")
+        stored_dim = metadata.get("embedding_dim")
+        stored_backend = metadata.get("embedding_backend")
+        count = collection.count() + self._backgrounds[save_id].count()
+        if count == 0 and (backend is not None or model_id is not None):
+            # Nothing embedded yet, so the save may switch to any model
+            stored_model = stored_dim = stored_backend = None
+        elif stored_model is None and count > 0:
+            stored_dim = self._stored_dimension(collection, self._backgrounds[save_id])
+            if stored_dim not in LEGACY_EMBEDDINGS:
+                raise ValueError(
+                    f"Save '{save_id}' stores {stored_dim}-dimensional embeddings of an unrecorded model"
+                )
+            stored_backend, stored_model = LEGACY_EMBEDDINGS[stored_dim]
+
+        if backend is None and stored_backend is not None:
+            backend = stored_backend
+        if model_id is None and (backend is None or backend_family(backend) == backend_family(stored_backend)):
+            # Keep the recorded model unless the backend loads a different kind of model
+            model_id = stored_model
+        embedder = self._embedder(get_embedding_backend(backend, model_id))
+        chosen = embedder.backend
+
+        if stored_model is not None and chosen.model_id != stored_model:
+            raise ValueError(
+                f"Save '{save_id}' is embedded with '{stored_model}', "
+                f"backend '{chosen.name}' provides '{chosen.model_id}'"
+            )
+        dim = chosen.declared_dim if stored_dim is not None else chosen.dim
+        if stored_dim is not None and dim is not None and dim != stored_dim:
+            raise ValueError(
+                f"Save '{save_id}' stores {stored_dim}-dimensional embeddings, "
+                f"backend '{chosen.name}' produces {dim}"
+            )
+
+        recorded = {"embedding_model": chosen.model_id, "embedding_backend": chosen.name, "embedding_dim": stored_dim or dim}
+        if any(metadata.get(k) != v for k, v in recorded.items()):
+            metadata.update(recorded)
+            collection.modify(metadata=metadata)
+        if self._save_embedders.get(save_id) is not embedder:
+            self._save_embedders[save_id] = embedder
+            self._bump_generation(save_id)
+
+    @staticmethod
+    def _stored_dimension(*collections: chromadb.Collection) -> Optional[int]:
+        """Dimension of the vectors stored in the first non-empty collection."""
+        for collection in collections:
+            page = collection.get(limit=1, include=["embeddings"])
+            if page["ids"]:
+                return len(page["embeddings"][0])
+        return None
+
+    def _embedder(self, backend: EmbeddingBackend) -> BGE_Base_ZH:
+        """Embedding function (with its own cache) for a backend, shared by every save using it."""
+        embedder = self._embedders.get(backend.cache_id)
+        if embedder is None:
+            cache = EmbeddingCache(self.base_dir / "_embedding_cache", backend.cache_id)
+            embedder = BGE_Base_ZH(cache, backend)
+            self._embedders[backend.cache_id] = embedder
+        return embedder
+
+    def embedding_function(self, save_id: str) -> BGE_Base_ZH:
+        """Embedding function bound to a save."""
+        self.get_or_create_collection(save_id)
+        return self._save_embedders[save_id]
+
+    def _embed(self, save_id: str, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts for a save's stored vectors (documents to write or queries).
+        
+        Raises ValueError when the vectors do not match the dimension recorded
+        for the save, instead of letting Chroma reject or silently miss them.
+        """
+        vectors = self.embedding_function(save_id)(texts)
+        stored_dim = (self._collections[save_id].metadata or {}).get("embedding_dim")
+        if stored_dim is not None and len(vectors) and len(vectors[0]) != stored_dim:
+            raise ValueError(
+                f"Save '{save_id}' stores {stored_dim}-dimensional embeddings, "
+                f"its backend produced {len(vectors[0])}"
+            )
+        return vectors
+
+    @staticmethod
+    def _sequence_from_id(doc_id: str, save_id: str) -> int:
+        """Extract the number of an ID shaped "<save_id>_<number>[_<suffix>]" (0 if absent)."""
+        prefix = f"{save_id}_"
+        if not doc_id.startswith(prefix):
+            return 0
+        number = doc_id[len(prefix):].split("_", 1)[0]
+        return int(number) if number.isdigit() else 0
+
+    @staticmethod
+    def _background_hash_from_id(doc_id: str) -> str:
+        """Content hash embedded in a background ID "<save_id>_<seq>_<md5>[_short]"."""
+        if doc_id.endswith("_short"):
+            doc_id = doc_id[:-len("_short")]
+        return doc_id.rsplit("_", 1)[-1]
+
+    def _write_generation(self, save_id: str) -> int:
+        with self._count_lock:
+            return self._write_generations.get(save_id, 0)
+
+    def _bump_generation(self, save_id: str):
+        """Mark the save's stored entries as changed (invalidates cached query results)."""
+        with self._count_lock:
+            self._write_generations[save_id] = self._write_generations.get(save_id, 0) + 1
+
+    @staticmethod
+    def _count_invisible_background(background: chromadb.Collection, generation: int) -> int:
+        """Stored background rows outside the active generation (retired or left by an interrupted sync)."""
+        rows = background.get(
+            where={"$or": [{"gen_to": {"$lte": generation}}, {"gen_from": {"$gt": generation}}]},
+            include=[]
+        )
+        return len(rows["ids"])
+
+    def _live_background_count(self, save_id: str) -> int:
+        """Background rows visible in the active generation."""
+        with self._count_lock:
+            retired = self._retired.get(save_id, 0)
+        return max(0, self._backgrounds[save_id].count() - retired)
+
+    def _adjust_count(self, save_id: str, delta: int):
+        """Update the cached entry count after adding (+) or deleting (-) entries."""
+        with self._count_lock:
+            if save_id in self._counts:
+                self._counts[save_id] = max(0, self._counts[save_id] + delta)
+
+    def _open_sequence(
+        self,
+        save_id: str,
+        save_dir: Path,
+        collections: Sequence[chromadb.Collection]
+    ) -> SequenceAllocator:
+        """
+        Open the ID sequence of a save, seeding it from existing IDs on first use.
+        
+        Saves created before the allocator existed have IDs of the form
+        "<save_id>_<number>_<suffix>". They are scanned once (IDs only, in pages)
+        so new IDs start above every number already in use.
+        """
+        seq_path = save_dir / "sequence.json"
+        if seq_path.exists() or all(c.count() == 0 for c in collections):
+            return SequenceAllocator(seq_path)
 
+        start = 0
+        page_size = 5000
+        for collection in collections:
+            offset = 0
+            while True:
+                page = collection.get(include=[], limit=page_size, offset=offset)
+                ids = page["ids"]
+                for doc_id in ids:
+                    start = max(start, self._sequence_from_id(doc_id, save_id) + 1)
+                if len(ids) < page_size:
+                    break
+                offset += page_size
+
+        return SequenceAllocator(seq_path, start)
+
+    def _allocate_ids(self, save_id: str, count: int) -> int:
+        """Reserve `count` sequence numbers for new documents of a save."""
+        self.get_or_create_collection(save_id)
+        return self._sequences[save_id].allocate(count)
+
+    @_pins_save
     def add_conversation(
         self,
         save_id: str,
@@ -126,7 +923,8 @@ class ChromaDBManager:
         speakers: List[str],
         listeners: List[str],
         date_string: str,
-        talk_type: str
+        talk_type: str,
+        tick: Optional[int] = None
     ) -> bool:
         """
         Store a conversation turn in the database.
@@ -138,192 +936,782 @@ class ChromaDBManager:
             listeners: List of listener names (allInvolvedPawns)
             date_string: In-game date string (e.g., "5th of Septober, year 5500")
             talk_type: Type of the entry (e.g., "dialogue", "info")
+            tick: Absolute game tick of the turn (None = derive the day from date_string)
             
         Returns:
             True if successful, False otherwise
         """
         try:
-            collection = self.get_or_create_collection(save_id)
+            ids, documents, metadatas = self._build_conversation_records(
+                save_id, talk_responses, listeners, date_string, tick
+            )
+            self._commit_records(save_id, ids, documents, metadatas)
             
-            # Check entry limit and cleanup if needed
-            self._enforce_entry_limit(save_id)
+            #print(f"[ChromaManager] Successfully stored {len(documents)} entries for save {save_id}", flush=True)
+            return True
+            
+        except Exception as e:
+            print(f"[RimTalk ChromaDB] Error adding conversation: {e}", file=sys.stderr, flush=True)
+            return False
+
+    @_pins_save
+    def enqueue_conversation(
+        self,
+        save_id: str,
+        talk_responses: List[Dict],
+        speakers: List[str],
+        listeners: List[str],
+        date_string: str,
+        talk_type: str,
+        tick: Optional[int] = None
+    ) -> bool:
+        """
+        Store a conversation turn through the write-behind queue.
+        
+        IDs and metadata are assigned immediately, so the turn's position in the
+        save's history is fixed at enqueue time; embedding and the Chroma write
+        happen later on the ingestion worker. Falls back to add_conversation
+        when asynchronous ingestion is disabled.
+        
+        Returns:
+            True if the turn was accepted, False otherwise
+        """
+        if self._ingestion is None:
+            return self.add_conversation(
+                save_id, talk_responses, speakers, listeners, date_string, talk_type, tick
+            )
+
+        try:
+            ids, documents, metadatas = self._build_conversation_records(
+                save_id, talk_responses, listeners, date_string, tick
+            )
+            if documents:
+                self._ingestion.submit(save_id, ids, documents, metadatas)
+            return True
+
+        except Exception as e:
+            print(f"[RimTalk ChromaDB] Error queueing conversation: {e}", file=sys.stderr, flush=True)
+            return False
+
+    def _build_conversation_records(
+        self,
+        save_id: str,
+        talk_responses: List[Dict],
+        listeners: List[str],
+        date_string: str,
+        tick: Optional[int] = None
+    ) -> Tuple[List[str], List[str], List[Dict]]:
+        """Assign IDs and build documents/metadata for a conversation turn."""
+        documents = []
+        ids = []
+        metadatas = []
+        # Numeric "tick"/"day" let queries filter and rank by game time
+        time_fields = time_metadata(tick, date_string)
+        if "day" in time_fields:
+            self._note_day(save_id, time_fields["day"])
+        first_seq = self._allocate_ids(save_id, len(talk_responses))
+        
+        for idx, response in enumerate(talk_responses):
+            # Create unique ID
+            doc_id = f"{save_id}_{first_seq + idx}"
             
-            documents = []
-            ids = []
-            metadatas = []
+            # Prepare metadata - include speaker, listeners, and date
+            metadata = {
+                "save_id": save_id,
+                "speaker": response.get("name", "Unknown"),
+                "listeners": json.dumps(listeners),
+                "date": date_string,
+                "talk_type": response.get("talk_type", "Unknown"),
+                "seq": first_seq + idx
+            }
+            metadata.update(time_fields)
+            for name in listeners:
+                metadata[listener_key(name)] = True
             
-            for idx, response in enumerate(talk_responses):
-                # Create unique ID
-                doc_id = f"{save_id}_{len(collection.get()['ids'])}_{idx}"
-                
-                # Prepare metadata - include speaker, listeners, and date
-                metadata = {
-                    "save_id": save_id,
-                    "speaker": response.get("name", "Unknown"),
-                    "listeners": json.dumps(listeners),
-                    "date": date_string,
-                    "talk_type": response.get("talk_type", "Unknown")
-                }
-                
-                documents.append(response.get("text", ""))
-                ids.append(doc_id)
-                metadatas.append(metadata)
-                
-                #print(f"[ChromaManager] Storing entry: speaker={metadata['speaker']}, date={metadata['date']}, listeners={metadata['listeners']}", flush=True)
+            documents.append(response.get("text", ""))
+            ids.append(doc_id)
+            metadatas.append(metadata)
             
-            # Add to collection
-            if documents:
+            #print(f"[ChromaManager] Storing entry: speaker={metadata['speaker']}, date={metadata['date']}, listeners={metadata['listeners']}", flush=True)
+
+        return ids, documents, metadatas
+
+    def _note_day(self, save_id: str, day: int):
+        """Remember `day` as the save's newest game day if it is later than the known one."""
+        with self._count_lock:
+            self._latest_days[save_id] = max(day, self._latest_days.get(save_id, day))
+
+    def _latest_day(self, save_id: str) -> Optional[int]:
+        """
+        Newest game day among the save's conversation entries (None if none is dated).
+        
+        Found once per open save by scanning back from the newest sequence
+        number in doubling windows, then kept up to date by new turns.
+        """
+        with self._count_lock:
+            if save_id in self._scanned_days:
+                return self._latest_days.get(save_id)
+
+        collection = self.get_or_create_collection(save_id)
+        sequence = self._sequences[save_id]
+        high = sequence.peek()
+        floor = sequence.floor
+        span = 256
+        latest = None
+        while high > floor and latest is None:
+            low = max(floor, high - span)
+            page = collection.get(
+                where={"$and": [
+                    {"seq": {"$gte": low}},
+                    {"seq": {"$lt": high}},
+                ]},
+                include=["metadatas"]
+            )
+            days = [meta["day"] for meta in page["metadatas"] if meta and meta.get("day") is not None]
+            if days:
+                latest = int(max(days))
+            high = low
+            span = min(span * 2, self.MAX_PAGE_SIZE)
+
+        with self._count_lock:
+            known = self._latest_days.get(save_id)
+            if latest is not None:
+                self._latest_days[save_id] = latest if known is None else max(latest, known)
+            self._scanned_days.add(save_id)
+            return self._latest_days.get(save_id)
+
+    def _commit_records(
+        self,
+        save_id: str,
+        ids: List[str],
+        documents: List[str],
+        metadatas: List[Dict]
+    ):
+        """Write prepared conversation records to the save's collection."""
+        collection = self.get_or_create_collection(save_id)
+        
+        # Check entry limit and cleanup if needed
+        self._enforce_entry_limit(save_id)
+        
+        # Add to collection
+        if documents:
+            embeddings = self._embed(save_id, documents)
+            with telemetry.stage("write"):
                 collection.add(
                     ids=ids,
                     documents=documents,
+                    embeddings=embeddings,
                     metadatas=metadatas
                 )
+            telemetry.incr("write.documents", len(ids))
+            self._adjust_count(save_id, len(ids))
+            tier = self._hot_tiers.get(save_id)
+            if tier is not None:
+                with tier.lock:
+                    # A tier still waiting for its fill reads these rows from the collection
+                    if tier.loaded:
+                        tier.add(ids, embeddings, documents, metadatas)
+            self._bump_generation(save_id)
+
+    def configure_rerank(
+        self,
+        fusion: str = "max",
+        mmr_lambda: float = 0.7,
+        duplicate_similarity: Optional[float] = 0.97,
+        budget: float = 0.01
+    ):
+        """
+        Configure how query_context merges and picks its hits.
+        
+        Args:
+            fusion: "max" (best relevance over all queries) or "rrf" (reciprocal-rank fusion)
+            mmr_lambda: Weight of relevance against novelty in the maximal-marginal-relevance
+                pick (1 = by relevance only)
+            duplicate_similarity: Hits at least this similar to a picked entry are left
+                out (None keeps near-duplicates)
+            budget: Seconds the pick may take before the rest is filled by relevance
+        """
+        if fusion not in FUSION_METHODS:
+            raise ValueError(f"Unknown fusion method {fusion!r} (expected one of {FUSION_METHODS})")
+        self.RERANK_FUSION = fusion
+        self.MMR_LAMBDA = min(1.0, max(0.0, float(mmr_lambda)))
+        self.DUPLICATE_SIMILARITY = None if duplicate_similarity is None else float(duplicate_similarity)
+        self.RERANK_BUDGET = max(0.0, float(budget))
+
+    def configure_hot_tier(
+        self,
+        size: int = 5000,
+        dtype: str = "float32",
+        confidence: float = 0.8
+    ):
+        """
+        Configure the in-memory hot tier of recent conversation entries.
+        
+        Args:
+            size: Newest conversation entries held per open save (0 = no hot tier)
+            dtype: "float32" or "float16" storage of the held embeddings
+            confidence: Relevance every one of n_results hot hits (per query) must
+                reach for the persistent index search to be skipped
+        """
+        np.dtype(dtype)  # reject unknown types before anything changes
+        with self._hot_lock:
+            self.HOT_TIER_SIZE = max(0, int(size))
+            self.HOT_TIER_DTYPE = dtype
+            self.HOT_TIER_CONFIDENCE = float(confidence)
+            # Rebuilt lazily with the new settings
+            self._hot_tiers.clear()
+
+    def _hot_tier(self, save_id: str) -> Optional[HotTier]:
+        """
+        The save's hot tier, filled from the collection on first use (None if disabled).
+        
+        The tier is registered before it is filled. Commits only append to a
+        loaded tier: one racing with the fill either lands before it (and is
+        read from the collection) or waits on the tier's lock and appends
+        whatever the fill did not read.
+        """
+        with self._hot_lock:
+            if self.HOT_TIER_SIZE <= 0:
+                return None
+            tier = self._hot_tiers.get(save_id)
+            if tier is None:
+                tier = self._hot_tiers[save_id] = HotTier(
+                    self.HOT_TIER_SIZE, self.HOT_TIER_DTYPE, LISTENER_KEY_PREFIX
+                )
+        if tier.loaded:
+            return tier
+
+        with tier.lock:
+            if tier.loaded:
+                return tier
+            with telemetry.stage("hot_fill"):
+                collection = self.get_or_create_collection(save_id)
+                sequence = self._sequences[save_id]
+                high = sequence.peek()
+                floor = sequence.floor
+                span = 256
+                pages = []
+                held = 0
+                # Walk back from the newest entry until the tier is full or the save is exhausted
+                while high > floor and held < tier.capacity:
+                    low = max(floor, high - span)
+                    page = collection.get(
+                        where={"$and": [
+                            {"seq": {"$gte": low}},
+                            {"seq": {"$lt": high}},
+                        ]},
+                        include=["documents", "metadatas", "embeddings"]
+                    )
+                    pages.append(page)
+                    held += len(page["ids"])
+                    high = low
+                    span = min(span * 2, self.MAX_PAGE_SIZE)
+
+                rows = sorted(
+                    (
+                        (meta["seq"], doc_id, doc, meta, embedding)
+                        for page in pages
+                        for doc_id, doc, meta, embedding in zip(
+                            page["ids"], page["documents"], page["metadatas"], page["embeddings"]
+                        )
+                    ),
+                    key=lambda row: row[0]
+                )
+                if held < tier.capacity:
+                    coverage_low = floor
+                else:
+                    # Rows sharing a seq (lines of a migrated turn) may be cut apart;
+                    # the tier only covers a seq it holds in full
+                    cut = len(rows) - tier.capacity
+                    coverage_low = rows[cut][0]
+                    if cut > 0 and rows[cut - 1][0] == coverage_low:
+                        coverage_low += 1
+                    rows = rows[cut:]
+                tier.load(
+                    [row[1] for row in rows],
+                    [row[4] for row in rows],
+                    [row[2] for row in rows],
+                    [row[3] for row in rows],
+                    coverage_low
+                )
+        return tier
+
+    TITLE_MATCH_MODES = ("fuzzy", "exact", "off")
+
+    def configure_title_match(self, mode: str = "fuzzy"):
+        """
+        Configure direct matching of background titles mentioned in query texts.
+        
+        Args:
+            mode: "fuzzy" (exact mentions and near-misses of a few edits),
+                "exact" (exact mentions only) or "off"
+        """
+        if mode not in self.TITLE_MATCH_MODES:
+            raise ValueError(f"Unknown title match mode {mode!r} (expected one of {self.TITLE_MATCH_MODES})")
+        with self._title_lock:
+            self.TITLE_MATCH = mode
+            if mode == "off":
+                self._title_indexes.clear()
+
+    def _title_index(self, save_id: str, wait: bool = False) -> Optional[TitleIndex]:
+        """
+        The save's background title index, if it reflects the active background generation.
+        
+        Reading the title rows takes a while on large background sets, so
+        by default a missing or stale index is built on the search pool and
+        None is returned meanwhile; with wait=True it is built right away.
+        sync_background otherwise updates the index in place.
+        
+        Returns:
+            The index, or None if title matching is off or the index is not ready
+        """
+        with self._title_lock:
+            if self.TITLE_MATCH == "off":
+                return None
+            index = self._title_indexes.get(save_id)
+            if index is None:
+                index = self._title_indexes[save_id] = TitleIndex()
+            if index.generation == self._bg_generations[save_id]:
+                return index
+            if not wait:
+                if not index.building:
+                    index.building = True
+                    self._search_pool.submit(self._build_title_index, save_id, index)
+                return None
+        self._build_title_index(save_id, index)
+        return index
+
+    def _build_title_index(self, save_id: str, index: TitleIndex):
+        """Fill a title index from the title ("_short") rows of the active background generation."""
+        try:
+            with index.lock:
+                generation = self._bg_generations[save_id]
+                if index.generation == generation:
+                    return
+                with telemetry.stage("title_index.build"):
+                    rows = self._backgrounds[save_id].get(
+                        where={"$and": [
+                            {"definition": {"$ne": "N/A"}},
+                            {"gen_from": {"$lte": generation}},
+                            {"gen_to": {"$gt": generation}},
+                        ]},
+                        include=["documents", "metadatas"]
+                    )
+                    index.clear()
+                    self._index_titles(index, rows["ids"], rows["documents"], rows["metadatas"])
+                    index.generation = generation
+            # Results cached while the index was missing lack the title matches
+            self._bump_generation(save_id)
+        except Exception as e:
+            print(f"[RimTalk ChromaDB] Error building title index: {e}", file=sys.stderr, flush=True)
+        finally:
+            index.building = False
+
+    @staticmethod
+    def _index_titles(index: TitleIndex, ids: List[str], documents: List[str], metadatas: List[Dict]):
+        """Add the "_short" title rows among background rows to a title index."""
+        for doc_id, doc, meta in zip(ids, documents, metadatas):
+            if not doc_id.endswith("_short"):
+                continue
+            index.add(doc_id[:-len("_short")], doc, {
+                "text": doc + ":" + meta.get("definition", ""),
+                "speaker": meta.get("speaker", "Unknown"),
+                "listeners": listeners_from_metadata(meta),
+                "date": meta.get("date", ""),
+                "talk_type": meta.get("talk_type", ""),
+            })
+
+    def configure_ingestion(
+        self,
+        enabled: bool,
+        max_batch_size: int = 64,
+        max_delay: float = 0.05
+    ):
+        """
+        Enable or disable asynchronous (write-behind) conversation ingestion.
+        
+        Args:
+            enabled: Whether enqueue_conversation should return before the write
+            max_batch_size: Maximum number of documents per collection.add call
+            max_delay: Maximum seconds a queued turn waits for its batch to fill
+        """
+        old = self._ingestion
+        self._ingestion = IngestionQueue(self._commit_records, max_batch_size, max_delay) if enabled else None
+        if old is not None:
+            old.close()
+
+    def flush(self, save_id: Optional[str] = None, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every queued conversation turn is written.
+        
+        Args:
+            save_id: Only wait for this save's turns (all saves if None)
+            timeout: Maximum seconds to wait (forever if None)
             
-            #print(f"[ChromaManager] Successfully stored {len(documents)} entries for save {save_id}", flush=True)
+        Returns:
+            True if all pending writes were committed in time
+        """
+        if self._ingestion is None:
             return True
+        return self._ingestion.flush(save_id, timeout)
+
+    @_pins_save
+    def query_relevant_context(
+        self,
+        save_id: str,
+        query_texts: List[str], # Accepts a list of query strings
+        n_results: int = 5,
+        *,
+        speakers: Optional[List[str]] = None,
+        listeners: Optional[List[str]] = None,
+        since_day: Optional[int] = None,
+        until_day: Optional[int] = None,
+        recent_days: Optional[int] = None,
+        now_day: Optional[int] = None,
+        recency_half_life_days: Optional[float] = None,
+        fusion: Optional[str] = None,
+        mmr_lambda: Optional[float] = None
+    ) -> List[Dict]:
+        """
+        Query historically relevant conversations for context enrichment using multiple query vectors.
+        
+        Args:
+            save_id: Identifier for the current save database.
+            query_texts: A list of search query strings generated by the AI.
+            n_results: The maximum number of results to return.
+            speakers: Optional list of speakers; conversation entries must be spoken by one of them.
+            listeners: Optional list of pawns; conversation entries must have one of them as a listener.
+            since_day: Only conversation entries from this absolute game day on.
+            until_day: Only conversation entries up to this absolute game day.
+            recent_days: Only conversation entries from the last N days before now_day.
+            now_day: Current absolute game day (default: the newest day stored in the save).
+            recency_half_life_days: Rank conversation entries by similarity decayed with
+                this half-life (in game days) instead of similarity alone.
+            fusion: How hits of the different queries are combined, "max" or "rrf"
+                (default: the manager's, see configure_rerank).
+            mmr_lambda: Relevance/novelty trade-off of the pick, 1 = relevance only
+                (default: the manager's).
+            
+        Background entries whose title ("name" of "name:definition") is mentioned
+        in a query text, exactly or within a few edits, come first; the vector
+        hits follow.
             
+        Returns:
+            A list of dictionaries, each representing a unique, relevant context entry,
+            in pick order: title matches, then the most relevant vector hit, then
+            each the best trade-off of relevance and difference from those before
+            it. Near-duplicates of a returned entry are left out, so fewer than
+            n_results may come back.
+        """
+        # Ensure input is a list (though it should be by this point)
+        if isinstance(query_texts, str):
+            query_texts = [query_texts]
+        if not query_texts:
+            return []
+
+        try:
+            # Acknowledged turns may still sit in the write-behind queue
+            with telemetry.stage("ingest_wait"):
+                self.flush(save_id)
+
+            # Identical requests within the same write generation share one result
+            generation = self._write_generation(save_id)
+            fusion = fusion or self.RERANK_FUSION
+            mmr_lambda = self.MMR_LAMBDA if mmr_lambda is None else mmr_lambda
+            cache_key = QueryResultCache.make_key(
+                save_id, query_texts, n_results, speakers, listeners,
+                since_day=since_day, until_day=until_day, recent_days=recent_days,
+                now_day=now_day, recency_half_life_days=recency_half_life_days,
+                fusion=fusion, mmr_lambda=mmr_lambda, duplicate_similarity=self.DUPLICATE_SIMILARITY,
+                title_match=self.TITLE_MATCH,
+                hot_tier=(self.HOT_TIER_SIZE, self.HOT_TIER_DTYPE, self.HOT_TIER_CONFIDENCE)
+            )
+            cached = self.query_cache.get(cache_key, generation)
+            if cached is not None:
+                telemetry.incr("query.cache_hits")
+                return cached
+
+            # Encode every query in one batched call; both searches reuse the vectors
+            query_embeddings = self._embed(save_id, query_texts)
+            results = self._search_context(
+                save_id, query_embeddings, n_results, query_texts=query_texts,
+                speakers=speakers, listeners=listeners,
+                since_day=since_day, until_day=until_day, recent_days=recent_days,
+                now_day=now_day, recency_half_life_days=recency_half_life_days,
+                fusion=fusion, mmr_lambda=mmr_lambda
+            )
+            self.query_cache.put(cache_key, generation, results)
+            return results
+
         except Exception as e:
-            print(f"[RimTalk ChromaDB] Error adding conversation: {e}", flush=True)
-            return False
-        
-    def query_relevant_context(
+            # Standard error logging/handling
+            print(f"[RimTalk ChromaDB] Error querying context: {e}", file=sys.stderr, flush=True)
+            return []
+
+    @_pins_save
+    def query_relevant_context_by_embedding(
         self,
         save_id: str,
-        query_texts: List[str], # Accepts a list of query strings
+        query_embeddings: List[List[float]],
         n_results: int = 5,
+        *,
+        query_texts: Optional[List[str]] = None,
         speakers: Optional[List[str]] = None,
-        listeners: Optional[List[str]] = None
+        listeners: Optional[List[str]] = None,
+        since_day: Optional[int] = None,
+        until_day: Optional[int] = None,
+        recent_days: Optional[int] = None,
+        now_day: Optional[int] = None,
+        recency_half_life_days: Optional[float] = None,
+        fusion: Optional[str] = None,
+        mmr_lambda: Optional[float] = None
     ) -> List[Dict]:
         """
-        Query historically relevant conversations for context enrichment using multiple query vectors.
+        Same as query_relevant_context, for callers that already hold query vectors.
+        The embedding model is not touched.
         
         Args:
             save_id: Identifier for the current save database.
-            query_texts: A list of search query strings generated by the AI.
+            query_embeddings: One vector per search query, from the save's embedding model.
             n_results: The maximum number of results to return.
-            speakers: Optional list of speakers to filter conversational history by (for proximity/relation).
-            listeners: Optional list of listeners to filter conversational history by (for proximity/relation).
+            query_texts: Optional query strings the vectors were made from, for
+                background titles mentioned in them (see query_relevant_context).
+            speakers: Optional list of speakers to filter conversational history by.
+            listeners: Optional list of listeners to filter conversational history by.
+            since_day, until_day, recent_days, now_day, recency_half_life_days:
+                Game-time window and recency ranking, as in query_relevant_context.
+            fusion, mmr_lambda: Reranking, as in query_relevant_context.
             
         Returns:
-            A list of dictionaries, each representing a unique, relevant context entry, 
-            sorted by normalized relevance score (highest first).
+            Context entries in pick order, as in query_relevant_context.
         """
         try:
-            collection = self.get_or_create_collection(save_id)
-            
-            # 1. Basic checks
-            if collection.count() == 0 or not query_texts:
-                return []
-            
-            # Ensure input is a list (though it should be by this point)
-            if isinstance(query_texts, str):
-                query_texts = [query_texts]
-            
-            all_results_map = {} # Use a dict (ID: result_dict) to deduplicate results
-            all_results_map_text = {} 
-
-            # 2. Helper to process batch results from Chroma
-            def process_batch_results(results):
-                """Processes the nested list structure returned by Chroma's batch query."""
-                if results and results['documents']:
-                    # Iterate over each query's result set
-                    for i in range(len(results['documents'])): 
-                        if not results['documents'][i]: continue
-                        
-                        # Iterate over the results for the i-th query
-                        for doc, meta, dist, id in zip(
-                            results['documents'][i],
-                            results['metadatas'][i],
-                            results['distances'][i],
-                            results['ids'][i]
-                        ):
-                            # Listener filtering (only applies to non-'info' talk_type)
-                            if meta.get("talk_type") != "info" and listeners:
-                                doc_listeners = json.loads(meta.get("listeners", "[]"))
-                                # Check if any of the target listeners are in the document's listeners
-                                if not any(l in doc_listeners for l in listeners):
-                                    continue
-
-                            doc2=doc+(":"+meta.get("definition","([WARNING] Info entry does not include a definition.)") if (meta.get("talk_type", "")=="info" and meta.get("definition") != "N/A") else "")
-                            id2 = id
-                            id2=id2.replace("_short","")
-
-                            # Deduplicate based on unique ID
-                            if id2 not in all_results_map:
-                                # Normalize distance (L2 norm) to relevance score (e.g., 1.0 - distance/2.0)
-                                relevance = float(1.0-(dist/2.0))
-                                
-                                all_results_map[id2] = {
-                                    "text": doc2,
-                                    "speaker": meta.get("speaker", "Unknown"),
-                                    "listeners": json.loads(meta.get("listeners", "[]")),
-                                    "date": meta.get("date", ""),
-                                    "talk_type": meta.get("talk_type", ""),
-                                    "relevance": relevance,
-                                }
-                            else:
-                                # If found again (via another keyword), keep the higher relevance score
-                                current_rel = float(1.0-(dist/2.0))
-                                if current_rel > all_results_map[id2]["relevance"]:
-                                    all_results_map[id2]["relevance"] = current_rel
-
-            # 3. Query 'info' (background) with ALL keywords (no speaker/listener filter)
-            info_results = collection.query(
-                query_texts=query_texts,
-                n_results=min(50, collection.count()), # Query more results for better merging
-                where={"talk_type": "info"}
-            )
-            process_batch_results(info_results)
-
-            # 4. Prepare filter for conversation history (talk_type != "info")
-            where_filter = None
-            conditions = [{"talk_type": {"$ne": "info"}}]
-
-            if speakers:
-                # Speakers filter: Matches documents where the 'speaker' is one of the desired speakers
-                speaker_conditions = [{"speaker": {"$eq": s}} for s in speakers]
-                if len(speaker_conditions) > 1:
-                    conditions.append({"$or": speaker_conditions})
-                else:
-                    conditions.extend(speaker_conditions)
-            
-            if len(conditions) > 1:
-                where_filter = {"$and": conditions}
-            elif conditions:
-                where_filter = conditions[0]
-
-            # 5. Query conversation history with ALL keywords
-            # Note: Listener filtering is handled post-retrieval in process_batch_results 
-            # because the 'listeners' metadata is stored as a JSON string, not a direct list field.
-            filtered_results = collection.query(
-                query_texts=query_texts,
-                n_results=min(10, collection.count()), 
-                where=where_filter
+            # Acknowledged turns may still sit in the write-behind queue
+            with telemetry.stage("ingest_wait"):
+                self.flush(save_id)
+            return self._search_context(
+                save_id, query_embeddings, n_results, query_texts=query_texts,
+                speakers=speakers, listeners=listeners,
+                since_day=since_day, until_day=until_day, recent_days=recent_days,
+                now_day=now_day, recency_half_life_days=recency_half_life_days,
+                fusion=fusion, mmr_lambda=mmr_lambda
             )
-            process_batch_results(filtered_results)
-            
-            # 6. Final sorting and truncation
-            final_results = list(all_results_map.values())
-            final_results.sort(key=lambda x: x["relevance"], reverse=True)
-            
-            # Return only the top N results
-            return final_results[:n_results]
             
         except Exception as e:
             # Standard error logging/handling
-            print(f"[RimTalk ChromaDB] Error querying context: {e}")
+            print(f"[RimTalk ChromaDB] Error querying context: {e}", file=sys.stderr, flush=True)
+            return []
+
+    def _search_context(
+        self,
+        save_id: str,
+        query_embeddings: List[List[float]],
+        n_results: int,
+        *,
+        query_texts: Optional[Sequence[str]] = None,
+        speakers: Optional[List[str]] = None,
+        listeners: Optional[List[str]] = None,
+        since_day: Optional[int] = None,
+        until_day: Optional[int] = None,
+        recent_days: Optional[int] = None,
+        now_day: Optional[int] = None,
+        recency_half_life_days: Optional[float] = None,
+        fusion: Optional[str] = None,
+        mmr_lambda: Optional[float] = None
+    ) -> List[Dict]:
+        """Match background titles, run the background and conversation searches and rerank their hits (raises on error)."""
+        collection = self.get_or_create_collection(save_id)
+        background = self._backgrounds[save_id]
+
+        # 1. Basic checks
+        conversation_count = collection.count()
+        background_count = self._live_background_count(save_id)
+        if conversation_count + background_count == 0 or len(query_embeddings) == 0:
             return []
 
+        # 2. Hits of every query and search, reranked together at the end
+        pool = CandidatePool(len(query_embeddings))
+
+        # 3. Query 'info' (background) with ALL keywords (no speaker/listener filter),
+        # in its own collection and alongside the conversation search below.
+        # Only the active background generation is visible
+        generation = self._bg_generations[save_id]
+
+        def search_background():
+            start = time.perf_counter()
+            results = background.query(
+                query_embeddings=query_embeddings,
+                n_results=min(50, background_count), # Query more results for better merging
+                where={"$and": [
+                    {"gen_from": {"$lte": generation}},
+                    {"gen_to": {"$gt": generation}},
+                ]},
+                include=["documents", "metadatas", "distances", "embeddings"]
+            )
+            return results, time.perf_counter() - start
+
+        info_search = self._search_pool.submit(search_background) if background_count else None
+
+        # Background titles mentioned in the query texts, while the search runs
+        title_hits = []
+        index = self._title_index(save_id) if query_texts and background_count else None
+        if index is not None:
+            with telemetry.stage("title_match"):
+                with index.lock:
+                    title_hits = index.match(query_texts, fuzzy=self.TITLE_MATCH == "fuzzy")[:n_results]
+            telemetry.incr("title.hits", len(title_hits))
+
+        # 4. Prepare filter for conversation history
+        where_filter = None
+        conditions = []
+
+        if speakers:
+            # Speakers filter: Matches documents where the 'speaker' is one of the desired speakers
+            speaker_conditions = [{"speaker": {"$eq": s}} for s in speakers]
+            if len(speaker_conditions) > 1:
+                conditions.append({"$or": speaker_conditions})
+            else:
+                conditions.extend(speaker_conditions)
+
+        if listeners:
+            # Listeners filter: one membership key per pawn, so this stays inside the index query
+            listener_conditions = [{listener_key(l): True} for l in listeners]
+            if len(listener_conditions) > 1:
+                conditions.append({"$or": listener_conditions})
+            else:
+                conditions.extend(listener_conditions)
+
+        # Game-time window on the numeric "day" (undated entries never match a window)
+        rescore = bool(recency_half_life_days)
+        if now_day is None and (recent_days is not None or rescore):
+            now_day = self._latest_day(save_id)
+        if recent_days is not None and now_day is not None:
+            window_start = now_day - recent_days
+            since_day = window_start if since_day is None else max(since_day, window_start)
+        if since_day is not None:
+            conditions.append({"day": {"$gte": int(since_day)}})
+        if until_day is not None:
+            conditions.append({"day": {"$lte": int(until_day)}})
+
+        # Ranking by recency re-sorts a wider candidate set, so fetch more
+        rescore = rescore and now_day is not None
+        candidates = self.RECENCY_CANDIDATES if rescore else 10
+
+        def recency(results):
+            if not rescore:
+                return None
+            return [
+                recency_factors(
+                    [(meta or {}).get("day") for meta in metas],
+                    now_day, recency_half_life_days, self.RECENCY_FLOOR
+                )
+                for metas in results['metadatas']
+            ]
+
+        # 5. Search the hot tier (newest conversation entries, in memory) first
+        conversation_results = []
+        search_cold = conversation_count > 0
+        tier = self._hot_tier(save_id) if search_cold else None
+        if tier is not None:
+            with telemetry.stage("hot_search"):
+                with tier.lock:
+                    hot_results = tier.search(
+                        query_embeddings, candidates, speakers, listeners, since_day, until_day
+                    )
+                    coverage_low = tier.coverage_low
+            conversation_results.append(hot_results)
+
+            if coverage_low <= self._sequences[save_id].floor:
+                # The tier holds every conversation entry of the save
+                search_cold = False
+            elif all(
+                sum(1.0 - d / 2.0 >= self.HOT_TIER_CONFIDENCE for d in distances) >= n_results
+                for distances in hot_results['distances']
+            ):
+                # Enough confident recent hits for every query
+                search_cold = False
+            else:
+                # The cold search only has to cover what the tier does not hold
+                conditions.append({"seq": {"$lt": coverage_low}})
+            if not search_cold:
+                telemetry.incr("query.cold_skipped")
+
+        if len(conditions) > 1:
+            where_filter = {"$and": conditions}
+        elif conditions:
+            where_filter = conditions[0]
+
+        # 6. Query conversation history with ALL keywords
+        if search_cold:
+            with telemetry.stage("search"):
+                conversation_results.append(collection.query(
+                    query_embeddings=query_embeddings,
+                    n_results=min(candidates, conversation_count), 
+                    where=where_filter,
+                    include=["documents", "metadatas", "distances", "embeddings"]
+                ))
+
+        if info_search is not None:
+            info_results, seconds = info_search.result()
+            telemetry.record("search", seconds)
+        with telemetry.stage("post_filter"):
+            if info_search is not None:
+                pool.add(info_results)
+            for results in conversation_results:
+                pool.add(results, recency(results))
+
+        # 7. Fuse across queries and pick diverse entries
+        with telemetry.stage("rerank"):
+            picked, relevances, stats = pool.select(
+                n_results - len(title_hits),
+                placed=[key for key, _ in title_hits],
+                fusion=fusion or self.RERANK_FUSION,
+                mmr_lambda=self.MMR_LAMBDA if mmr_lambda is None else mmr_lambda,
+                duplicate_similarity=self.DUPLICATE_SIMILARITY,
+                budget=self.RERANK_BUDGET
+            )
+        telemetry.incr("rerank.duplicates", stats["duplicates"])
+        telemetry.incr("rerank.budget_exceeded", stats["budget_exceeded"])
+
+        # Title matches go ahead of the vector hits
+        final_results = [entry for _, entry in title_hits]
+        for hit, relevance in zip(picked, relevances):
+            doc, meta = pool.documents[hit], pool.metadatas[hit]
+            if meta.get("talk_type", "") == "info" and meta.get("definition") != "N/A":
+                doc = doc + ":" + meta.get("definition", "([WARNING] Info entry does not include a definition.)")
+            final_results.append({
+                "text": doc,
+                "speaker": meta.get("speaker", "Unknown"),
+                "listeners": listeners_from_metadata(meta),
+                "date": meta.get("date", ""),
+                "talk_type": meta.get("talk_type", ""),
+                "relevance": relevance,
+            })
+
+        telemetry.incr("query.results", len(final_results))
+        return final_results
+
+    @_pins_save
     def info(
         self,
         save_id: str):
         try:
-            collection = self.get_or_create_collection(save_id)
+            self.flush(save_id)
+            conversations = self.get_or_create_collection(save_id).count()
+            background = self._live_background_count(save_id)
+            embedder = self._save_embedders[save_id]
             return {
-                "count": collection.count()
+                "count": conversations + background,
+                "conversation_count": conversations,
+                "background_count": background,
+                "embedding_model": embedder.backend.model_id,
+                "embedding_backend": embedder.backend.name,
+                "embedding_cache": embedder.cache.stats(),
+                "query_cache": self.query_cache.stats(),
+                "write_generation": self._write_generation(save_id)
             }
         except Exception as e:
-            print(f"[RimTalk ChromaDB] Error getting info: {e}")
+            print(f"[RimTalk ChromaDB] Error getting info: {e}", file=sys.stderr, flush=True)
             return {}
         
     def update_background(
@@ -350,99 +1738,691 @@ class ChromaDBManager:
             string indicating success or error message
         """
         try:
-            collection = self.get_or_create_collection(save_id)
-            
-            # Check entry limit and cleanup if needed
-            self.delete_background(save_id)
+            self.sync_background(save_id, talk_responses, date_string)
+            return "Success"
             
-            documents = []
-            ids = []
-            metadatas = []
-            collection_info = collection.get()
-            existing_ids_count = len(collection_info['ids'])
+        except Exception as e:
+            return f"[RimTalk ChromaDB] Error updating background: {e}"
+
+    @_pins_save
+    def sync_background(
+        self,
+        save_id: str,
+        entries: List[str],
+        date_string: str = "Not applicable",
+        batch_size: int = 200
+    ) -> Dict:
+        """
+        Make the save's background set equal to `entries`, touching only the difference.
+        
+        Entries are matched by content hash: unchanged ones are kept as stored,
+        only new ones are embedded and inserted, and only vanished ones are
+        removed. Background entries are visible in a generation range
+        [gen_from, gen_to); new rows are written for the next generation and
+        retired rows are closed at it, then the active generation is switched
+        in a single step. A concurrent query therefore sees either the old set
+        or the new set, never a mix or an empty set. Rows retired by the
+        previous sync are physically deleted at the start of the next one.
+        
+        Args:
+            save_id: Save identifier
+            entries: The complete background set ("name:definition" lines)
+            date_string: Date stored with new entries
+            batch_size: Entries embedded and inserted per collection.add call
             
-            for i, entry in enumerate(talk_responses):
-                # Create unique ID
-                doc_id = f"{save_id}_{existing_ids_count + i}_{hashlib.md5(entry.encode()).hexdigest()}"
+        Returns:
+            Counts of added, removed, unchanged and purged entries, and the new generation
+        """
+        collection = self.get_or_create_collection(save_id)
+        background = self._backgrounds[save_id]
+        with self._bg_locks[save_id]:
+            generation = self._bg_generations[save_id]
+            next_generation = generation + 1
 
-                # Prepare metadata - include speaker, listeners, and date
-                metadata = {
-                    "save_id": save_id,
-                    "speaker": "system",
-                    "listeners": json.dumps([]),
-                    "date": date_string,
-                    "talk_type": "info",
-                    "definition": "N/A",
-                }
-                
-                documents.append(entry)
-                ids.append(doc_id)
-                metadatas.append(metadata)
+            wanted: Dict[str, str] = {}
+            for entry in entries:
+                if entry and entry.strip():
+                    wanted.setdefault(hashlib.md5(entry.encode()).hexdigest(), entry)
 
-                doc_id2 = doc_id + "_short"
-                
-                entry2 = entry.split(':',1)
-                if len(entry2) == 1:
-                    continue
+            with telemetry.stage("background.diff"):
+                stored = background.get(include=["metadatas"])
+            live: Dict[str, List[Tuple[str, Dict]]] = {}
+            purge_ids = []
+            for doc_id, meta in zip(stored["ids"], stored["metadatas"]):
+                gen_from = meta.get("gen_from", 0)
+                gen_to = meta.get("gen_to", GENERATION_OPEN)
+                if gen_from <= generation < gen_to:
+                    content_hash = meta.get("content_hash") or self._background_hash_from_id(doc_id)
+                    live.setdefault(content_hash, []).append((doc_id, meta))
+                else:
+                    # Retired by an earlier sync, or left behind by an interrupted one
+                    purge_ids.append(doc_id)
 
-                metadata2 = metadata.copy()
-                metadata2["definition"] = entry2[1]
-                
-                documents.append(entry2[0])
-                ids.append(doc_id2)
-                metadatas.append(metadata2)
-                
-                #print(f"[ChromaManager] Storing entry: speaker={metadata['speaker']}, date={metadata['date']}, listeners={metadata['listeners']}", flush=True)
-            
-            # Add to collection
-            if documents:
-                collection.add(
-                    ids=ids,
-                    documents=documents,
-                    metadatas=metadatas
+            if purge_ids:
+                background.delete(ids=purge_ids)
+                # Retired rows already left the count; only rows added by an
+                # interrupted sync of this process are still in it
+                with self._count_lock:
+                    counted = len(purge_ids) - self._retired.get(save_id, 0)
+                    self._retired[save_id] = 0
+                self._adjust_count(save_id, -max(0, counted))
+
+            retire_ids = []
+            reopen_ids = []
+            for content_hash, rows in live.items():
+                for doc_id, meta in rows:
+                    if content_hash not in wanted:
+                        retire_ids.append(doc_id)
+                    elif meta.get("gen_to", GENERATION_OPEN) != GENERATION_OPEN:
+                        # Closed by an interrupted sync but still wanted
+                        reopen_ids.append(doc_id)
+
+            new_entries = [entry for content_hash, entry in wanted.items() if content_hash not in live]
+            added_rows = []
+            for start in range(0, len(new_entries), batch_size):
+                ids, documents, metadatas = self._build_background_records(
+                    save_id, new_entries[start:start + batch_size], date_string, next_generation
                 )
+                added_rows.append((ids, documents, metadatas))
+                embeddings = self._embed(save_id, documents)
+                with telemetry.stage("write"):
+                    background.add(
+                        ids=ids,
+                        documents=documents,
+                        embeddings=embeddings,
+                        metadatas=metadatas
+                    )
+                telemetry.incr("write.documents", len(ids))
+                self._adjust_count(save_id, len(ids))
+
+            if reopen_ids or retire_ids:
+                with telemetry.stage("write"):
+                    if reopen_ids:
+                        background.update(ids=reopen_ids, metadatas=[{"gen_to": GENERATION_OPEN}] * len(reopen_ids))
+                    if retire_ids:
+                        background.update(ids=retire_ids, metadatas=[{"gen_to": next_generation}] * len(retire_ids))
+            telemetry.incr("background.added", len(new_entries))
+            telemetry.incr("background.retired", len(retire_ids))
+
+            # Switch generations: persist first (in the save's metadata), then publish to queries
+            metadata = dict(collection.metadata or {})
+            metadata["background_generation"] = next_generation
+            collection.modify(metadata=metadata)
+            self._bg_generations[save_id] = next_generation
+            self._bump_generation(save_id)
+            # Retired rows stay stored until the next sync but no longer count
+            with self._count_lock:
+                self._retired[save_id] = self._retired.get(save_id, 0) + len(retire_ids)
+            self._adjust_count(save_id, -len(retire_ids))
+
+            # Carry the title index over to the new generation with just the difference
+            with self._title_lock:
+                index = self._title_indexes.get(save_id)
+            if index is not None:
+                with index.lock:
+                    if index.generation == generation:
+                        for doc_id in retire_ids:
+                            index.remove(doc_id.replace("_short", ""))
+                        for ids, documents, metadatas in added_rows:
+                            self._index_titles(index, ids, documents, metadatas)
+                        index.generation = next_generation
+            # Otherwise build it now rather than on the first query
+            self._title_index(save_id, wait=True)
+
+            return {
+                "added": len(new_entries),
+                "removed": len(set(self._background_hash_from_id(i) for i in retire_ids)),
+                "unchanged": len(wanted) - len(new_entries),
+                "purged": len(purge_ids),
+                "generation": next_generation,
+            }
+
+    def _build_background_records(
+        self,
+        save_id: str,
+        entries: List[str],
+        date_string: str,
+        generation: int
+    ) -> Tuple[List[str], List[str], List[Dict]]:
+        """Build IDs, documents and metadata for background entries (plus their "_short" name docs)."""
+        documents = []
+        ids = []
+        metadatas = []
+        first_seq = self._allocate_ids(save_id, len(entries))
+        
+        for i, entry in enumerate(entries):
+            content_hash = hashlib.md5(entry.encode()).hexdigest()
+            # Create unique ID
+            doc_id = f"{save_id}_{first_seq + i}_{content_hash}"
+
+            # Prepare metadata - include speaker, listeners, and date
+            metadata = {
+                "save_id": save_id,
+                "speaker": "system",
+                "listeners": json.dumps([]),
+                "date": date_string,
+                "talk_type": "info",
+                "definition": "N/A",
+                "seq": first_seq + i,
+                "content_hash": content_hash,
+                "gen_from": generation,
+                "gen_to": GENERATION_OPEN,
+            }
             
-            #print(f"[ChromaManager] Successfully stored {len(documents)} entries for save {save_id}", flush=True)
-            return "Success"
+            documents.append(entry)
+            ids.append(doc_id)
+            metadatas.append(metadata)
+
+            doc_id2 = doc_id + "_short"
             
-        except Exception as e:
-            return f"[RimTalk ChromaDB] Error updating background: {e}"
+            entry2 = entry.split(':',1)
+            if len(entry2) == 1:
+                continue
+
+            metadata2 = metadata.copy()
+            metadata2["definition"] = entry2[1]
+            
+            documents.append(entry2[0])
+            ids.append(doc_id2)
+            metadatas.append(metadata2)
+
+        return ids, documents, metadatas
+
+    @staticmethod
+    def _format_entry(doc_id: str, doc: Optional[str], meta: Optional[Dict], fields: Sequence[str]) -> Dict:
+        """Project one stored row onto the requested entry fields."""
+        meta = meta or {}
+        entry = {}
+        for field in fields:
+            if field == "id":
+                entry["id"] = doc_id
+            elif field == "text":
+                text = doc or ""
+                if meta.get("talk_type", "") == "info" and meta.get("definition") != "N/A":
+                    text += ":" + meta.get("definition", "([WARNING] Info entry does not include a definition.)")
+                entry["text"] = text
+            elif field == "speaker":
+                entry["speaker"] = meta.get("speaker", "Unknown")
+            elif field == "listeners":
+                entry["listeners"] = listeners_from_metadata(meta)
+            elif field in ("seq", "day", "tick"):
+                entry[field] = meta.get(field)
+            else:
+                entry[field] = meta.get(field, "")
+        return entry
+
+    def _scan_window(
+        self,
+        collections: Sequence[chromadb.Collection],
+        low: int,
+        end: int,
+        limit: int,
+        where: Optional[Dict],
+        include: List[str]
+    ) -> Tuple[List[Tuple[int, str, Optional[str], Dict, Optional[np.ndarray]]], int]:
+        """
+        Read up to `limit` rows with the smallest "seq" in [low, end) of the
+        given collections (sequence numbers are shared by both collections of
+        a save), in seq order.
+        
+        Walks the sequence in windows: a window holding too few matches is
+        followed by one twice as wide (so sparse stretches left by eviction
+        or a selective filter are crossed in a few reads), and a window
+        holding more rows than one page may keep is halved and re-read. At
+        most about 2 * limit rows are held at a time, unless more rows than
+        that share one seq (saves migrated from before seq numbers existed
+        give every line of a turn the turn's number): such a group cannot be
+        split by the cursor, so it is read whole, in pages, and returned as
+        one oversized page.
+        
+        Returns:
+            (rows as (seq, id, document, metadata, embedding), first seq not yet read);
+            document and embedding are None unless requested in `include`
+        """
+        rows = []
+        window = max(1, limit)
+        # A seq is shared by at most two rows (a background entry and its "_short" title)
+        cap = 2 * limit + 2
+        while low < end and len(rows) < limit:
+            high = min(end, low + window)
+            clauses = [{"seq": {"$gte": low}}, {"seq": {"$lt": high}}]
+            if where:
+                clauses.append(where)
+            batches = [c.get(where={"$and": clauses}, include=include, limit=cap + 1) for c in collections]
+            if sum(len(batch["ids"]) for batch in batches) > cap:
+                if window > 1:
+                    window //= 2
+                    continue
+                batches = [self._get_all(c, {"$and": clauses}, include, cap) for c in collections]
+            found = []
+            for batch in batches:
+                documents = batch.get("documents") or [None] * len(batch["ids"])
+                embeddings = batch.get("embeddings")
+                if embeddings is None:
+                    embeddings = [None] * len(batch["ids"])
+                found.extend(zip(
+                    (meta["seq"] for meta in batch["metadatas"]), batch["ids"], documents, batch["metadatas"], embeddings
+                ))
+            found.sort(key=lambda row: (row[0], row[1]))
+            if len(rows) + len(found) > limit:
+                # Keep whole seq groups only, so the cursor never splits a pair
+                keep = limit - len(rows)
+                while keep < len(found) and keep > 0 and found[keep][0] == found[keep - 1][0]:
+                    keep += 1
+                rows += found[:keep]
+                return rows, found[keep][0] if keep < len(found) else high
+            rows += found
+            low = high
+            if len(found) < limit:
+                window *= 2
+        return rows, low
+
+    @staticmethod
+    def _get_all(collection: chromadb.Collection, where: Dict, include: List[str], page_size: int) -> Dict:
+        """Read every row matching `where`, page_size rows per call, into one get() result."""
+        merged = {key: [] for key in ["ids"] + include}
+        offset = 0
+        while True:
+            page = collection.get(where=where, include=include, limit=page_size, offset=offset)
+            for key, values in merged.items():
+                values.extend(page[key])
+            if len(page["ids"]) < page_size:
+                return merged
+            offset += page_size
+
+    @_pins_save
+    def page_entries(
+        self,
+        save_id: str,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        cursor: Optional[int] = None,
+        where: Optional[Dict] = None,
+        fields: Optional[Sequence[str]] = None
+    ) -> Dict:
+        """
+        Read one page of a save's stored entries.
+        
+        Two ways to page:
+        - cursor (default): entries in insertion ("seq") order, starting after
+          the `cursor` returned by the previous page. Stable while entries are
+          added or evicted between pages.
+        - offset: Chroma's own limit/offset over its storage order (conversation
+          entries, then background entries). Simple, but pages shift when
+          entries are deleted in between.
+        
+        Args:
+            save_id: Save identifier
+            limit: Entries per page (PAGE_SIZE if None, at most MAX_PAGE_SIZE)
+            offset: Use offset paging, starting at this position
+            cursor: Resume cursor paging after this position (None = first page)
+            where: Optional Chroma metadata filter, e.g. {"talk_type": "info"}
+            fields: Entry fields to return (subset of ENTRY_FIELDS, default DEFAULT_ENTRY_FIELDS)
+            
+        Returns:
+            {"entries": [...], "next_cursor" or "next_offset": position of the
+            next page (None on the last page), "total": entries in the save
+            (only without `where`: counting the matches would mean reading them all)}
+        """
+        fields = list(fields) if fields else list(DEFAULT_ENTRY_FIELDS)
+        unknown = [f for f in fields if f not in ENTRY_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown entry fields: {', '.join(unknown)} (available: {', '.join(ENTRY_FIELDS)})")
+        limit = min(self.MAX_PAGE_SIZE, max(1, int(limit or self.PAGE_SIZE)))
+        include = ["metadatas"] + (["documents"] if "text" in fields else [])
+
+        self.flush(save_id)
+        collections = (self.get_or_create_collection(save_id), self._backgrounds[save_id])
+        totals = {} if where else {"total": sum(c.count() for c in collections)}
+
+        with telemetry.stage("scan"):
+            if offset is not None:
+                offset = max(0, int(offset))
+                entries = []
+                skip = offset
+                for c in collections:
+                    if len(entries) >= limit:
+                        break
+                    # Offsets run through the conversation rows, then the background rows.
+                    # Matches are only counted one past the offset.
+                    matched = 0 if not skip else c.count() if not where else len(
+                        c.get(where=where, include=[], limit=skip + 1)["ids"]
+                    )
+                    if skip and skip >= matched:
+                        skip -= matched
+                        continue
+                    batch = c.get(where=where or None, include=include, limit=limit - len(entries), offset=skip)
+                    skip = 0
+                    documents = batch.get("documents") or [None] * len(batch["ids"])
+                    rows = zip(batch["ids"], documents, batch["metadatas"])
+                    entries += [self._format_entry(doc_id, doc, meta, fields) for doc_id, doc, meta in rows]
+                next_offset = offset + len(entries) if len(entries) == limit else None
+                return {"entries": entries, "next_offset": next_offset, **totals}
+
+            low = 0 if cursor is None else int(cursor) + 1
+            end = self._sequences[save_id].peek()
+            rows, next_low = self._scan_window(collections, low, end, limit, where, include)
+
+        entries = [self._format_entry(doc_id, doc, meta, fields) for _, doc_id, doc, meta, _ in rows]
+        telemetry.incr("entries_scanned", len(entries))
+        return {"entries": entries, "next_cursor": next_low - 1 if next_low < end else None, **totals}
+
+    def iter_entries(
+        self,
+        save_id: str,
+        limit: Optional[int] = None,
+        where: Optional[Dict] = None,
+        fields: Optional[Sequence[str]] = None,
+        cursor: Optional[int] = None
+    ) -> Iterator[Dict]:
+        """Yield page_entries() pages in seq order until the save is exhausted."""
+        while True:
+            page = self.page_entries(save_id, limit=limit, cursor=cursor, where=where, fields=fields)
+            yield page
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return
 
     def query_all_entry(
         self,
         save_id: str):
         try:
-            collection = self.get_or_create_collection(save_id)
-            
-            if collection.count() == 0:
-                return []
-            
-            # Query using prompt for semantic search
-            results = collection.get()
-            
-            # Format results
             relevant = []
-            if results and results['documents'] and len(results['documents']) > 0:
-                for id, doc, meta in zip(
-                    results['ids'],
-                    results['documents'],
-                    results['metadatas']
-                ):
-                    
-                    relevant.append({
-                        "id": id,
-                        "text": doc+(":"+meta.get("definition","([WARNING] Info entry does not include a definition.)") if (meta.get("talk_type", "")=="info" and meta.get("definition") != "N/A") else ""),
-                        "speaker": meta.get("speaker", "Unknown"),
-                        "listeners": json.loads(meta.get("listeners", "[]")),
-                        "date": meta.get("date", ""),
-                        "talk_type": meta.get("talk_type", ""),
-                    })
-            
+            for page in self.iter_entries(save_id, limit=self.MAX_PAGE_SIZE):
+                relevant.extend(page["entries"])
             return relevant
             
         except Exception as e:
-            print(f"[RimTalk ChromaDB] Error querying all entry: {e}")
+            print(f"[RimTalk ChromaDB] Error querying all entry: {e}", file=sys.stderr, flush=True)
             return []
+
+    # --- snapshots -------------------------------------------------------
+
+    @_pins_save
+    def export_save(
+        self,
+        save_id: str,
+        path: Optional[str] = None,
+        progress: Optional[Callable[[str, int, int], None]] = None
+    ) -> Dict:
+        """
+        Write every entry of a save, with its stored embedding, to a snapshot file.
+        
+        Rows are read in seq order, SNAPSHOT_CHUNK_SIZE at a time, and each
+        chunk is written before the next is read, so memory use does not
+        grow with the save. Background syncs wait until the export is done.
+        
+        Args:
+            save_id: Save identifier
+            path: Snapshot file (default chromadb/_exports/<save_id>_<time>.rtsnap)
+            progress: Called with ("export", rows written, rows in the save) after each chunk
+            
+        Returns:
+            Path, row count, embedding dimension, chunk count and duration
+        """
+        start = time.perf_counter()
+        self.flush(save_id)
+        collection = self.get_or_create_collection(save_id)
+        background = self._backgrounds[save_id]
+        if path is None:
+            path = self.base_dir / "_exports" / f"{save_id}_{time.strftime('%Y%m%d-%H%M%S')}{SNAPSHOT_SUFFIX}"
+
+        with self._bg_locks[save_id]:
+            total = collection.count() + background.count()
+            sequence = self._sequences[save_id]
+            end = sequence.peek()
+            writer = SnapshotWriter(Path(path))
+            try:
+                low = 0
+                while low < end:
+                    with telemetry.stage("scan"):
+                        rows, low = self._scan_window(
+                            (collection, background), low, end, self.SNAPSHOT_CHUNK_SIZE, None,
+                            ["documents", "metadatas", "embeddings"]
+                        )
+                    if rows:
+                        writer.add_chunk(
+                            [row[1] for row in rows],
+                            [row[2] for row in rows],
+                            [row[3] for row in rows],
+                            np.stack([row[4] for row in rows])
+                        )
+                        if progress is not None:
+                            progress("export", writer.count, total)
+                metadata = dict(collection.metadata or {})
+                manifest = writer.close({
+                    "save_id": save_id,
+                    "embedding": {
+                        "model": metadata.get("embedding_model"),
+                        "backend": metadata.get("embedding_backend"),
+                        "dim": metadata.get("embedding_dim"),
+                    },
+                    "collection_metadata": metadata,
+                    "sequence": {"next": end, "floor": sequence.floor},
+                })
+            except BaseException:
+                writer.abort()
+                raise
+
+        telemetry.incr("snapshot.exported", manifest["count"])
+        return {
+            "path": str(writer.path),
+            "count": manifest["count"],
+            "dim": manifest["dim"],
+            "chunks": len(manifest["chunks"]),
+            "seconds": time.perf_counter() - start,
+        }
+
+    @_pins_save
+    def import_save(
+        self,
+        save_id: str,
+        path: str,
+        replace: bool = False,
+        verify: bool = True,
+        backend: Optional[str] = None,
+        progress: Optional[Callable[[str, int, int], None]] = None
+    ) -> Dict:
+        """
+        Load a snapshot into a save, reusing its stored embeddings.
+        
+        The embedding model is never run: rows are bulk-inserted with their
+        embeddings, and the save is bound to the snapshot's model. IDs of a
+        snapshot taken from another save are rewritten to this save's prefix.
+        The sequence counter, eviction watermark and background generation
+        are restored, so the save continues exactly where the snapshot left
+        off. The verification pass reads every row back and compares IDs,
+        documents and embeddings with the snapshot.
+        
+        The snapshot is checked against the save before anything is written,
+        then loaded into a staging save and swapped in only after it passed
+        verification, so a failed import leaves the save as it was.
+        
+        Args:
+            save_id: Save to load into
+            path: Snapshot file
+            replace: Replace the save's current entries (otherwise it must be empty)
+            verify: Read every row back after loading
+            backend: Backend to bind instead of the snapshot's (must provide the same model)
+            progress: Called with (phase, rows done, rows total) for "import" and "verify"
+            
+        Returns:
+            Row count, embedding dimension, verification result and duration
+            
+        Raises:
+            ValueError: If the save is not empty, the snapshot is unreadable or
+                belongs to another model, or verification finds missing or altered rows
+        """
+        start = time.perf_counter()
+        with SnapshotReader(Path(path)) as reader:
+            manifest = reader.manifest
+            embedding = manifest.get("embedding") or {}
+            source_prefix = f"{manifest.get('save_id', '')}_"
+            target_prefix = f"{save_id}_"
+
+            def rewrite(doc_id: str) -> str:
+                if source_prefix != target_prefix and doc_id.startswith(source_prefix):
+                    return target_prefix + doc_id[len(source_prefix):]
+                return doc_id
+
+            # Everything that can reject the snapshot is checked before the save is touched
+            chosen = get_embedding_backend(backend or embedding.get("backend"), embedding.get("model"))
+            if manifest.get("dim") is not None and chosen.declared_dim not in (None, manifest["dim"]):
+                raise ValueError(
+                    f"Snapshot stores {manifest['dim']}-dimensional embeddings, "
+                    f"backend '{chosen.name}' produces {chosen.declared_dim}"
+                )
+            self.flush(save_id)
+            if not replace and self.get_or_create_collection(save_id).count() + self._backgrounds[save_id].count() > 0:
+                raise ValueError(f"Save '{save_id}' is not empty; import with replace to overwrite it")
+
+            # Rows are loaded into a staging save next to the target, which is
+            # only replaced once the staging copy is complete (and verified)
+            staging = f"{save_id}{IMPORT_STAGING_SUFFIX}"
+            self._release_save(staging)
+            shutil.rmtree(self.base_dir / staging, ignore_errors=True)
+            try:
+                imported = self._load_snapshot(staging, save_id, reader, rewrite, chosen, progress)
+                telemetry.incr("snapshot.imported", imported)
+                verified = None
+                if verify:
+                    collections = (self._collections[staging], self._backgrounds[staging])
+                    verified = self._verify_import(save_id, collections, reader, rewrite, progress)
+                self._release_save(staging)
+                self._swap_in(save_id, self.base_dir / staging)
+            except BaseException:
+                self._release_save(staging)
+                shutil.rmtree(self.base_dir / staging, ignore_errors=True)
+                raise
+
+        return {
+            "save_id": save_id,
+            "count": imported,
+            "dim": manifest.get("dim"),
+            "verified": verified,
+            "seconds": time.perf_counter() - start,
+        }
+
+    def _load_snapshot(
+        self,
+        staging: str,
+        save_id: str,
+        reader: SnapshotReader,
+        rewrite: Callable[[str], str],
+        chosen: EmbeddingBackend,
+        progress: Optional[Callable[[str, int, int], None]]
+    ) -> int:
+        """Bulk-insert a snapshot's rows and counters into the (empty) staging save of `save_id`."""
+        manifest = reader.manifest
+        collection = self.get_or_create_collection(staging, chosen.name, chosen.model_id)
+        background = self._backgrounds[staging]
+        metadata = dict(collection.metadata or {})
+        if manifest.get("dim") is not None and metadata.get("embedding_dim") != manifest["dim"]:
+            raise ValueError(
+                f"Snapshot stores {manifest['dim']}-dimensional embeddings, "
+                f"backend '{chosen.name}' produces {metadata.get('embedding_dim')}"
+            )
+
+        max_batch = self.SNAPSHOT_CHUNK_SIZE
+        get_max_batch_size = getattr(self._clients[staging], "get_max_batch_size", None)
+        if get_max_batch_size is not None:
+            max_batch = max(1, min(max_batch, get_max_batch_size()))
+
+        imported = 0
+        for ids, documents, metadatas, embeddings in reader.chunks():
+            ids = [rewrite(doc_id) for doc_id in ids]
+            for meta in metadatas:
+                if "save_id" in meta:
+                    meta["save_id"] = save_id
+            # Background rows go to their own collection (snapshots hold both kinds)
+            is_info = np.array([meta.get("talk_type") == "info" for meta in metadatas], dtype=bool)
+            for target, selected in ((collection, ~is_info), (background, is_info)):
+                rows = np.flatnonzero(selected)
+                for i in range(0, len(rows), max_batch):
+                    batch = rows[i:i + max_batch]
+                    with telemetry.stage("write"):
+                        target.add(
+                            ids=[ids[j] for j in batch],
+                            documents=[documents[j] for j in batch],
+                            embeddings=embeddings[batch],
+                            metadatas=[metadatas[j] for j in batch]
+                        )
+            imported += len(ids)
+            if progress is not None:
+                progress("import", imported, reader.count)
+
+        # Restore the save's counters (the embedding binding stays as just recorded)
+        metadata.update(
+            (k, v) for k, v in (manifest.get("collection_metadata") or {}).items()
+            if k != "save_id" and not k.startswith("embedding_")
+        )
+        metadata["save_id"] = save_id
+        collection.modify(metadata=metadata)
+        background.modify(metadata={**(background.metadata or {}), "save_id": save_id})
+        sequence = manifest.get("sequence") or {}
+        self._sequences[staging].advance(int(sequence.get("next", 0)))
+        self._sequences[staging].set_floor(int(sequence.get("floor", 0)))
+        return imported
+
+    def _swap_in(self, save_id: str, staged_dir: Path):
+        """
+        Replace a save's directory with a fully loaded one (closed beforehand).
+        
+        The old directory is moved aside before the new one is moved in and
+        only deleted afterwards, so the save is never left without a complete
+        database. The save is reopened from the new directory, which recomputes
+        its counts, sequence and background generation.
+        """
+        save_dir = self.base_dir / save_id
+        replaced_dir = self.base_dir / f"{save_id}{IMPORT_REPLACED_SUFFIX}"
+        self.flush(save_id)
+        with self._bg_locks.setdefault(save_id, threading.Lock()):
+            self._release_save(save_id)
+            self._bump_generation(save_id)
+            shutil.rmtree(replaced_dir, ignore_errors=True)
+            if save_dir.exists():
+                os.replace(save_dir, replaced_dir)
+            os.replace(staged_dir, save_dir)
+            shutil.rmtree(replaced_dir, ignore_errors=True)
+            self.get_or_create_collection(save_id)
+
+    def _verify_import(
+        self,
+        save_id: str,
+        collections: Sequence[chromadb.Collection],
+        reader: SnapshotReader,
+        rewrite: Callable[[str], str],
+        progress: Optional[Callable[[str, int, int], None]]
+    ) -> bool:
+        """Compare every imported row with the snapshot; raises ValueError on any difference."""
+        missing = altered = checked = 0
+        for ids, documents, _, embeddings in reader.chunks():
+            ids = [rewrite(doc_id) for doc_id in ids]
+            rows = {}
+            for collection in collections:
+                with telemetry.stage("scan"):
+                    stored = collection.get(ids=ids, include=["documents", "embeddings"])
+                rows.update(
+                    (doc_id, (doc, vector))
+                    for doc_id, doc, vector in zip(stored["ids"], stored["documents"], stored["embeddings"])
+                )
+            for doc_id, doc, vector in zip(ids, documents, embeddings):
+                row = rows.get(doc_id)
+                if row is None:
+                    missing += 1
+                elif row[0] != doc or not np.allclose(row[1], vector, atol=1e-6):
+                    altered += 1
+            checked += len(ids)
+            if progress is not None:
+                progress("verify", checked, reader.count)
+
+        count = sum(collection.count() for collection in collections)
+        if missing or altered or count != reader.count:
+            raise ValueError(
+                f"Import into '{save_id}' failed verification: {missing} missing, {altered} altered, "
+                f"{count} stored of {reader.count}"
+            )
+        return True
         
     def ensure_healthy_database(self, save_id: str):
         if not self.check_database_health(save_id):
@@ -451,45 +2431,124 @@ class ChromaDBManager:
             return self.get_or_create_collection(save_id)
         
     def reset_corrupted_database(self, save_id: str):
-        # 1. 关闭现有连接
-        del self._collections[save_id]
-        del self._clients[save_id]
+        # 0. 等待写入队列中属于该存档的条目写完
+        self.flush(save_id)
+
+        # 1. 关闭现有连接（保留该存档选用的向量化后端）
+        embedder = self._save_embedders.get(save_id)
+        self._release_save(save_id)
+        self._bump_generation(save_id)
         
         # 2. 删除数据库目录（彻底清除）
         shutil.rmtree(self.base_dir / save_id, ignore_errors=True)
         
         # 3. 重新创建集合（全新的开始）
-        return self.get_or_create_collection(save_id)
+        if embedder is None:
+            return self.get_or_create_collection(save_id)
+        return self.get_or_create_collection(save_id, embedder.backend.name, embedder.backend.model_id)
 
     def _enforce_entry_limit(self, save_id: str):
         """
-        Enforce the 800k entry limit by removing oldest entries if exceeded.
+        Schedule eviction of the oldest entries once the entry limit is reached.
+        
+        The check uses the cached count, so the write path never calls
+        collection.count(); the deletion itself runs on a background thread.
         
         Args:
             save_id: Save identifier
         """
         try:
-            collection = self.get_or_create_collection(save_id)
-            current_count = collection.count()
+            with self._count_lock:
+                current_count = self._counts.get(save_id, 0)
             
             if current_count >= self.ENTRY_LIMIT:
-                # Get all entries and sort by insertion order (remove oldest)
-                all_data = collection.get(
-                    where={"talk_type": {"$ne": "info"}}  # 排除 talk_type="info" 的条目
-                )
-                ids = all_data['ids']
-                
+                with self._lock:
+                    if save_id in self._evicting:
+                        return "success"
+                    self._evicting.add(save_id)
+
                 # Remove oldest 10% when limit exceeded
                 remove_count = max(1, current_count // 10)
-                ids_to_remove = ids[:remove_count]
-                
-                collection.delete(ids=ids_to_remove)
-                #print(f"[RimTalk ChromaDB] Cleaned up {remove_count} old entries for save {save_id}")
+                threading.Thread(
+                    target=self._run_eviction,
+                    args=(save_id, remove_count),
+                    name=f"RimTalkEviction-{save_id}",
+                    daemon=True
+                ).start()
             return "success"
                 
         except Exception as e:
             return f"[RimTalk ChromaDB] Error enforcing entry limit: {e}"
 
+    def _run_eviction(self, save_id: str, remove_count: int):
+        try:
+            with telemetry.stage("evict"):
+                removed = self.evict_oldest(save_id, remove_count)
+            telemetry.incr("evict.entries", removed)
+        except Exception as e:
+            print(f"[RimTalk ChromaDB] Error evicting old entries for save {save_id}: {e}", file=sys.stderr, flush=True)
+        finally:
+            with self._lock:
+                self._evicting.discard(save_id)
+
+    @_pins_save
+    def evict_oldest(self, save_id: str, remove_count: int) -> int:
+        """
+        Delete the `remove_count` oldest conversation entries (never 'info').
+        
+        Walks the "seq" metadata upwards from the save's eviction watermark in
+        windows of EVICTION_BATCH_SIZE sequence numbers, so each step reads and
+        deletes a bounded number of rows. Entries are removed strictly in
+        insertion order.
+        
+        Args:
+            save_id: Save identifier
+            remove_count: Number of entries to delete
+            
+        Returns:
+            Number of entries actually deleted
+        """
+        collection = self.get_or_create_collection(save_id)
+        sequence = self._sequences[save_id]
+        low = sequence.floor
+        end = sequence.peek()
+        removed = 0
+
+        while removed < remove_count and low < end:
+            high = low + self.EVICTION_BATCH_SIZE
+            window = collection.get(
+                where={"$and": [
+                    {"seq": {"$gte": low}},
+                    {"seq": {"$lt": high}},
+                ]},
+                include=["metadatas"]
+            )
+            rows = sorted(
+                zip(window["metadatas"], window["ids"]),
+                key=lambda row: row[0]["seq"]
+            )
+            victims = rows[:remove_count - removed]
+            if victims:
+                collection.delete(ids=[doc_id for _, doc_id in victims])
+                self._adjust_count(save_id, -len(victims))
+                self._bump_generation(save_id)
+                removed += len(victims)
+
+            if len(victims) < len(rows):
+                # Window only partly evicted: the watermark stops at its oldest survivor
+                sequence.set_floor(rows[len(victims)][0]["seq"])
+                break
+            low = high
+            sequence.set_floor(low)
+
+        tier = self._hot_tiers.get(save_id)
+        if tier is not None:
+            with tier.lock:
+                tier.discard_below(sequence.floor)
+
+        return removed
+
+    @_pins_save
     def delete_background(self, save_id: str):
         """
         Delete background entries.
@@ -498,30 +2557,237 @@ class ChromaDBManager:
             save_id: Save identifier
         """
         try:
-            collection = self.get_or_create_collection(save_id)
-            all_data = collection.get(
-                where={"talk_type": "info"}
-            )
+            background = self.background_collection(save_id)
+            all_data = background.get(include=[])
             if not all_data['ids']:
                 return
             ids = all_data['ids']
-            collection.delete(ids=ids)
+            background.delete(ids=ids)
+            with self._count_lock:
+                counted = len(ids) - self._retired.get(save_id, 0)
+                self._retired[save_id] = 0
+            self._adjust_count(save_id, -counted)
+            with self._title_lock:
+                self._title_indexes.pop(save_id, None)
+            self._bump_generation(save_id)
                 
         except Exception as e:
             return f"[RimTalk ChromaDB] Error deleting background: {e}"
 
+    def cache_stats(self) -> Dict:
+        """Hit/miss counters of the manager's caches."""
+        return {
+            "embedding": {cache_id: e.cache.stats() for cache_id, e in list(self._embedders.items())},
+            "query": self.query_cache.stats(),
+            "scheduler": scheduler_stats(),
+            "hot_tier": {save_id: tier.stats() for save_id, tier in list(self._hot_tiers.items())},
+            "title_index": {save_id: index.stats() for save_id, index in list(self._title_indexes.items())}
+        }
+
+    def shutdown(self):
+        """Drain pending writes and persist caches before the process exits."""
+        with self._pool_cond:
+            self._pool_stopped = True
+            self._pool_cond.notify_all()
+        self.flush()
+        for embedder in list(self._embedders.values()):
+            embedder.cache.flush()
+        self._search_pool.shutdown(wait=False)
+
     def close_save(self, save_id: str):
         """
         Close and unload a save's database connection.
         
+        Waits for the save's running requests and queued writes to finish,
+        then releases its client (SQLite handles, loaded index segments).
+        
         Args:
             save_id: Save identifier
         """
+        self.flush(save_id)
+        with self._pool_cond:
+            while self._busy(save_id):
+                self._pool_cond.wait(0.05)
+            self._closing.add(save_id)
+        self._finish_close(save_id)
+
+    # --- open-save pool --------------------------------------------------
+
+    def configure_pool(
+        self,
+        max_open_saves: int = 4,
+        idle_timeout: float = 900.0,
+        memory_budget: Optional[int] = None
+    ):
+        """
+        Set the limits of the open-save pool and apply them right away.
+        
+        Args:
+            max_open_saves: Maximum number of saves kept open (0 = no cap)
+            idle_timeout: Seconds without requests after which a save is closed (0 = never)
+            memory_budget: Maximum bytes of index files of open saves (None = no budget)
+        """
+        with self._pool_cond:
+            self.MAX_OPEN_SAVES = max(0, int(max_open_saves))
+            self.IDLE_TIMEOUT = max(0.0, float(idle_timeout))
+            self.MEMORY_BUDGET = memory_budget
+            self._pool_cond.notify_all()
+        self._shrink_pool()
+
+    @contextmanager
+    def _using(self, save_id: str):
+        """Mark a request as in flight on a save; waits while the save is being closed."""
+        with self._pool_cond:
+            while save_id in self._closing:
+                self._pool_cond.wait()
+            self._in_flight[save_id] = self._in_flight.get(save_id, 0) + 1
+            self._last_used[save_id] = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._pool_cond:
+                remaining = self._in_flight[save_id] - 1
+                if remaining:
+                    self._in_flight[save_id] = remaining
+                else:
+                    del self._in_flight[save_id]
+                self._last_used[save_id] = time.monotonic()
+                self._pool_cond.notify_all()
+
+    def _touch(self, save_id: str):
+        with self._pool_cond:
+            self._last_used[save_id] = time.monotonic()
+
+    def _busy(self, save_id: str) -> bool:
+        """Whether a save has requests, queued writes or an eviction running (pool lock held)."""
+        return (
+            self._in_flight.get(save_id, 0) > 0
+            or save_id in self._closing
+            or save_id in self._evicting
+            or (self._ingestion is not None and self._ingestion.pending(save_id) > 0)
+        )
+
+    def _save_memory_bytes(self, save_id: str) -> int:
+        """
+        Size of a save's vector index files. Chroma loads them into memory
+        while the save is open, so this tracks the resident cost of the save.
+        """
+        total = 0
+        try:
+            for segment_dir in (self.base_dir / save_id).iterdir():
+                if segment_dir.is_dir():
+                    total += sum(f.stat().st_size for f in segment_dir.iterdir() if f.suffix == ".bin")
+        except OSError:
+            pass
+        return total
+
+    def _shrink_pool(self, exclude: Optional[str] = None):
+        """Close least recently used idle saves until the pool is within its limits."""
+        while True:
+            with self._pool_cond:
+                open_saves = list(self._collections)
+                over_count = 0 < self.MAX_OPEN_SAVES < len(open_saves)
+                over_memory = (
+                    self.MEMORY_BUDGET is not None and len(open_saves) > 1
+                    and sum(self._save_memory_bytes(s) for s in open_saves) > self.MEMORY_BUDGET
+                )
+                if not (over_count or over_memory):
+                    return
+                candidates = [s for s in open_saves if s != exclude and not self._busy(s)]
+                if not candidates:
+                    # Every other save is in use; stay over the limit until one is released
+                    return
+                victim = min(candidates, key=lambda s: self._last_used.get(s, 0.0))
+                self._closing.add(victim)
+                self.pool_evictions += 1
+            self._finish_close(victim)
+
+    def _run_reaper(self):
+        """Close saves that have been idle for longer than IDLE_TIMEOUT."""
+        while True:
+            with self._pool_cond:
+                # Woken early by configure_pool() and shutdown()
+                self._pool_cond.wait(max(1.0, min(60.0, (self.IDLE_TIMEOUT or 60.0) / 4)))
+                if self._pool_stopped:
+                    return
+                if not self.IDLE_TIMEOUT:
+                    continue
+                now = time.monotonic()
+                idle = [
+                    s for s in list(self._collections)
+                    if not self._busy(s) and now - self._last_used.get(s, now) >= self.IDLE_TIMEOUT
+                ]
+                self._closing.update(idle)
+            for save_id in idle:
+                self._finish_close(save_id)
+
+    def add_close_listener(self, listener: Callable[[str], None]):
+        """Call `listener(save_id)` whenever a save is closed, explicitly or by the pool."""
+        self._close_listeners.append(listener)
+
+    def _finish_close(self, save_id: str):
+        """Release a save marked as closing and wake up requests waiting for it."""
+        try:
+            self._release_save(save_id)
+        except Exception as e:
+            print(f"[RimTalk ChromaDB] Error closing save {save_id}: {e}", file=sys.stderr, flush=True)
+        finally:
+            with self._pool_cond:
+                self._closing.discard(save_id)
+                self._pool_cond.notify_all()
+        for listener in list(self._close_listeners):
+            try:
+                listener(save_id)
+            except Exception as e:
+                print(f"[RimTalk ChromaDB] Error in close listener for save {save_id}: {e}", file=sys.stderr, flush=True)
+
+    def _release_save(self, save_id: str):
+        """Drop a save's in-memory state and close its client."""
         with self._lock:
-            if save_id in self._collections:
-                del self._collections[save_id]
-            if save_id in self._clients:
-                del self._clients[save_id]
+            self._collections.pop(save_id, None)
+            self._backgrounds.pop(save_id, None)
+            client = self._clients.pop(save_id, None)
+            self._sequences.pop(save_id, None)
+            self._bg_generations.pop(save_id, None)
+            self._save_embedders.pop(save_id, None)
+        with self._count_lock:
+            self._counts.pop(save_id, None)
+            self._retired.pop(save_id, None)
+            self._latest_days.pop(save_id, None)
+            self._scanned_days.discard(save_id)
+        with self._hot_lock:
+            self._hot_tiers.pop(save_id, None)
+        with self._title_lock:
+            self._title_indexes.pop(save_id, None)
+        with self._pool_cond:
+            self._last_used.pop(save_id, None)
+        self.query_cache.drop_save(save_id)
+        if client is not None:
+            # Stops the client's system once no other client shares it (chromadb >= 1.1)
+            close = getattr(client, "close", None)
+            if close is not None:
+                close()
+
+    def pool_stats(self) -> Dict:
+        """Open saves with their idle time, in-flight requests and index size."""
+        now = time.monotonic()
+        with self._pool_cond:
+            saves = {
+                s: {
+                    "idle_seconds": now - self._last_used.get(s, now),
+                    "in_flight": self._in_flight.get(s, 0),
+                    "memory_bytes": self._save_memory_bytes(s),
+                }
+                for s in list(self._collections)
+            }
+            return {
+                "open_saves": saves,
+                "memory_bytes": sum(v["memory_bytes"] for v in saves.values()),
+                "max_open_saves": self.MAX_OPEN_SAVES,
+                "idle_timeout": self.IDLE_TIMEOUT,
+                "memory_budget": self.MEMORY_BUDGET,
+                "evictions": self.pool_evictions,
+            }
 
 
 # Global manager instance
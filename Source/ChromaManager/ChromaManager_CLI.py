@@ -3,12 +3,24 @@
 """
 RimTalk ChromaManager CLI - handles stdin/stdout JSON-based communication.
 Processes commands from C# ChromaClient via JSON lines protocol.
+
+Only the standard library is imported at startup so the process can answer
+a handshake immediately; ChromaManager (chromadb, numpy) and the embedding
+model are loaded by a background warm-up thread.
 """
 
 import sys
+import os
 import json
 import io
+import functools
+import threading
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from RequestProfiler import RequestProfiler
+from Telemetry import telemetry
 
 # Ensure UTF-8 encoding for stdin/stdout/stderr
 if sys.version_info[0] >= 3:
@@ -17,21 +29,628 @@ if sys.version_info[0] >= 3:
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', line_buffering=True)
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
 
-try:
-    from ChromaManager import get_manager
-except Exception as e:
-    # If import fails, print error and exit gracefully
-    error_response = {
-        "status": "error",
-        "message": f"Failed to import ChromaManager: {type(e).__name__}: {str(e)}",
-        "traceback": traceback.format_exc()
-    }
-    print(json.dumps(error_response, ensure_ascii=False), flush=True)
-    sys.exit(1)
+_process_start = time.perf_counter()
+
+def configure_from_env(manager):
+    """
+    Apply optional tuning from environment variables.
+    
+    RIMTALK_INGEST_ASYNC        "0" stores conversations synchronously (default "1")
+    RIMTALK_INGEST_MAX_BATCH    maximum documents per group commit (default 64)
+    RIMTALK_INGEST_MAX_DELAY_MS maximum wait for a group commit to fill (default 50)
+    RIMTALK_EMBED_MAX_BATCH     maximum texts per embedding forward pass (default 64)
+    RIMTALK_EMBED_MAX_WAIT_MS   micro-batching window for embedding calls (default 5)
+    RIMTALK_EMBED_THREADS       intra-op threads of the inference runtime (default: runtime's choice)
+    RIMTALK_EMBED_BACKEND       embedding backend of new saves: torch, onnx, int8 or hash (default torch)
+    RIMTALK_EMBED_MODEL         embedding model of new saves (default BAAI/bge-m3)
+    RIMTALK_MAX_OPEN_SAVES      saves kept open at once, least recently used closed first (default 4, 0 = no cap)
+    RIMTALK_SAVE_IDLE_TIMEOUT   seconds after which an unused save is closed (default 900, 0 = never)
+    RIMTALK_SAVE_MEMORY_MB      budget for the index files of open saves (default: none)
+    RIMTALK_HOT_TIER_SIZE       newest conversation entries kept in memory per save (default 5000, 0 = off)
+    RIMTALK_HOT_TIER_DTYPE      storage of the in-memory embeddings: float32 or float16 (default float32)
+    RIMTALK_HOT_TIER_CONFIDENCE relevance the in-memory hits must reach to skip the index search (default 0.8)
+    RIMTALK_FUSION              fusion of the hits of several queries: max or rrf (default max)
+    RIMTALK_MMR_LAMBDA          relevance/novelty trade-off of the result pick, 1 = relevance only (default 0.7)
+    RIMTALK_DUPLICATE_SIMILARITY similarity from which a hit counts as a duplicate and is left out (default 0.97, 0 = keep)
+    RIMTALK_RERANK_BUDGET_MS    time the result pick may take (default 10)
+    RIMTALK_TITLE_MATCH         background titles mentioned in queries: fuzzy, exact or off (default fuzzy)
+    """
+    import ChromaManager
+    manager.configure_ingestion(
+        os.environ.get("RIMTALK_INGEST_ASYNC", "1") != "0",
+        max_batch_size=int(os.environ.get("RIMTALK_INGEST_MAX_BATCH", "64")),
+        max_delay=float(os.environ.get("RIMTALK_INGEST_MAX_DELAY_MS", "50")) / 1000.0
+    )
+    ChromaManager.configure_embedding_backend(
+        os.environ.get("RIMTALK_EMBED_BACKEND", "torch"),
+        os.environ.get("RIMTALK_EMBED_MODEL") or None
+    )
+    memory_mb = os.environ.get("RIMTALK_SAVE_MEMORY_MB")
+    manager.configure_pool(
+        max_open_saves=int(os.environ.get("RIMTALK_MAX_OPEN_SAVES", "4")),
+        idle_timeout=float(os.environ.get("RIMTALK_SAVE_IDLE_TIMEOUT", "900")),
+        memory_budget=int(float(memory_mb) * 1024 * 1024) if memory_mb else None
+    )
+    manager.configure_hot_tier(
+        size=int(os.environ.get("RIMTALK_HOT_TIER_SIZE", "5000")),
+        dtype=os.environ.get("RIMTALK_HOT_TIER_DTYPE", "float32"),
+        confidence=float(os.environ.get("RIMTALK_HOT_TIER_CONFIDENCE", "0.8"))
+    )
+    duplicate_similarity = float(os.environ.get("RIMTALK_DUPLICATE_SIMILARITY", "0.97"))
+    manager.configure_rerank(
+        fusion=os.environ.get("RIMTALK_FUSION", "max"),
+        mmr_lambda=float(os.environ.get("RIMTALK_MMR_LAMBDA", "0.7")),
+        duplicate_similarity=duplicate_similarity or None,
+        budget=float(os.environ.get("RIMTALK_RERANK_BUDGET_MS", "10")) / 1000.0
+    )
+    manager.configure_title_match(os.environ.get("RIMTALK_TITLE_MATCH", "fuzzy"))
+    threads = os.environ.get("RIMTALK_EMBED_THREADS")
+    ChromaManager.configure_embedding_scheduler(
+        max_batch_size=int(os.environ.get("RIMTALK_EMBED_MAX_BATCH", "64")),
+        max_wait=float(os.environ.get("RIMTALK_EMBED_MAX_WAIT_MS", "5")) / 1000.0,
+        num_threads=int(threads) if threads else None
+    )
+
+def profiler_from_env():
+    """
+    Build the request profiler from environment variables.
+    
+    RIMTALK_PROFILE_DIR         directory for profiles and slow-request logs (default ./chromadb/_profiles)
+    RIMTALK_SLOW_REQUEST_MS     log requests at least this slow with their stage breakdown (default 1000, 0 = off)
+    RIMTALK_PROFILE_NEXT        profile the next N requests
+    RIMTALK_PROFILE_SLOWER_MS   profile requests, keeping those at least this slow
+    RIMTALK_PROFILE_ACTIONS     comma-separated actions eligible for profiling (default: all)
+    RIMTALK_PROFILE_MEMORY      "1" also traces allocations with tracemalloc
+    """
+    slow_log_ms = float(os.environ.get("RIMTALK_SLOW_REQUEST_MS", "1000"))
+    profiler = RequestProfiler(
+        os.environ.get("RIMTALK_PROFILE_DIR", os.path.join("chromadb", "_profiles")),
+        slow_log_ms if slow_log_ms > 0 else None
+    )
+    slower_than = os.environ.get("RIMTALK_PROFILE_SLOWER_MS")
+    actions = os.environ.get("RIMTALK_PROFILE_ACTIONS")
+    profiler.configure(
+        next_requests=int(os.environ.get("RIMTALK_PROFILE_NEXT", "0")),
+        slower_than_ms=float(slower_than) if slower_than else None,
+        actions=[a.strip() for a in actions.split(",") if a.strip()] if actions else None,
+        memory=os.environ.get("RIMTALK_PROFILE_MEMORY", "0") == "1"
+    )
+    return profiler
+
+class Warmup:
+    """
+    Loads the heavy components on a background thread, in phases:
+    
+    1. "chromadb": import ChromaManager (chromadb, numpy) and create the manager
+    2. "embedding_model": load the embedding model and run one tiny encode
+    
+    Each component reports "pending", "loading", "ready", "deferred" or "error".
+    """
+
+    def __init__(self, warm_model: bool = True):
+        self._warm_model = warm_model
+        self._lock = threading.Lock()
+        self.components = {"chromadb": "pending", "embedding_model": "pending"}
+        self.errors = {}
+        self.timings = {}
+        self.manager = None
+        self._manager_ready = threading.Event()
+        self._model_ready = threading.Event()
+        threading.Thread(target=self._run, name="RimTalkWarmup", daemon=True).start()
+
+    def _set(self, component, state, error=None):
+        with self._lock:
+            self.components[component] = state
+            if error is not None:
+                self.errors[component] = error
+
+    def _run(self):
+        self._set("chromadb", "loading")
+        start = time.perf_counter()
+        try:
+            import ChromaManager
+            manager = ChromaManager.get_manager()
+            configure_from_env(manager)
+            self.manager = manager
+            self.timings["chromadb_seconds"] = time.perf_counter() - start
+            self._set("chromadb", "ready")
+        except Exception as e:
+            self._set("chromadb", "error", f"Failed to import ChromaManager: {type(e).__name__}: {str(e)}")
+            self._set("embedding_model", "error", "ChromaManager unavailable")
+            print(traceback.format_exc(), file=sys.stderr, flush=True)
+            self._manager_ready.set()
+            self._model_ready.set()
+            return
+        self._manager_ready.set()
+
+        if not self._warm_model:
+            # Loaded lazily by the first request that needs it
+            self._set("embedding_model", "deferred")
+            self._model_ready.set()
+            return
+
+        self._set("embedding_model", "loading")
+        start = time.perf_counter()
+        try:
+            ChromaManager.get_embedding_model().encode(["warm-up"])
+            self.timings["embedding_model_seconds"] = time.perf_counter() - start
+            self._set("embedding_model", "ready")
+        except Exception as e:
+            self._set("embedding_model", "error", f"{type(e).__name__}: {str(e)}")
+        self._model_ready.set()
+
+    def is_ready(self, component):
+        with self._lock:
+            return self.components[component] in ("ready", "deferred")
+
+    def wait_manager(self, timeout=None):
+        """Block until the manager exists; raise if warm-up failed or timed out."""
+        if not self._manager_ready.wait(timeout):
+            raise RuntimeError("ChromaManager is still warming up")
+        if self.manager is None:
+            raise RuntimeError(self.errors.get("chromadb", "ChromaManager failed to load"))
+        return self.manager
+
+    def report(self):
+        with self._lock:
+            return {
+                "ready": all(state in ("ready", "deferred") for state in self.components.values()),
+                "components": dict(self.components),
+                "errors": dict(self.errors),
+                "timings": dict(self.timings),
+                "uptime_seconds": time.perf_counter() - _process_start,
+            }
+
+# Fields of debug_get_all_entry that select paged instead of whole-save output
+PAGING_FIELDS = ("limit", "offset", "cursor", "where", "fields")
+# query_context options selecting a game-time window and recency ranking
+TIME_FIELDS = ("since_day", "until_day", "recent_days", "now_day", "recency_half_life_days")
+# query_context options overriding the manager's reranking ("fusion": "max"/"rrf", "mmr_lambda")
+RERANK_FIELDS = ("fusion", "mmr_lambda")
+
+
+def handle_command(manager, command, emit=None):
+    """
+    Execute one decoded command and return its response dict.
+    Safe to call from worker threads; the manager serializes its own state.
+    Streamed actions hand their intermediate frames to `emit` (if given)
+    before returning the final frame.
+    """
+    action = command.get("action")
+    
+    if action == "init":
+        save_id = command.get("save_id", "default")
+        manager.get_or_create_collection(
+            save_id,
+            backend=command.get("embedding_backend"),
+            model_id=command.get("embedding_model")
+        )
+        response = {"status": "ok", "message": f"Initialized for save: {save_id}", "protocol_version": Dispatcher.PROTOCOL_VERSION}
+
+    elif action == "info":
+        save_id = command.get("save_id")
+        result = manager.info(save_id)
+        response = {"status": "ok", "data": result}
+
+    elif action =="debug_get_all_entry":
+        save_id = command.get("save_id")
+
+        if command.get("stream") and emit is not None:
+            # One frame per page, then a final frame with "done": true
+            frames = 0
+            for page in manager.iter_entries(
+                save_id,
+                limit=command.get("limit"),
+                where=command.get("where"),
+                fields=command.get("fields"),
+                cursor=command.get("cursor")
+            ):
+                emit({
+                    "status": "ok",
+                    "frame": frames,
+                    "done": False,
+                    "data": page["entries"],
+                    "next_cursor": page["next_cursor"],
+                    "total": page.get("total")
+                })
+                frames += 1
+            response = {"status": "ok", "frame": frames, "done": True, "data": []}
+
+        elif any(command.get(f) is not None for f in PAGING_FIELDS):
+            page = manager.page_entries(save_id, **{f: command.get(f) for f in PAGING_FIELDS})
+            response = {"status": "ok", "data": page.pop("entries")}
+            response.update(page)
+
+        else:
+            results = manager.query_all_entry(
+                save_id
+            )
+
+            # Convert ContextEntry objects to dicts
+            result_dicts = []
+            for r in results:
+                result_dicts.append({
+                    "id": r["id"],
+                    "text": r["text"],
+                    "speaker": r["speaker"],
+                    "listeners": r["listeners"],
+                    "date": r["date"],
+                    "talk_type": r["talk_type"]
+                })
+
+            response = {"status": "ok", "data": result_dicts}
+
+    elif action in ("export_save", "import_save"):
+        # With "progress": true, progress goes out as extra {"status": "progress"} frames
+        save_id = command.get("save_id")
+        progress = None
+        if command.get("progress") and emit is not None:
+            def progress(phase, done, total):
+                emit({"status": "progress", "phase": phase, "done": done, "total": total})
+
+        if action == "export_save":
+            result = manager.export_save(save_id, command.get("path"), progress=progress)
+            response = {"status": "ok", "message": f"Exported {result['count']} entries", "data": result}
+        else:
+            result = manager.import_save(
+                save_id,
+                command["path"],
+                replace=bool(command.get("replace", False)),
+                verify=bool(command.get("verify", True)),
+                backend=command.get("embedding_backend"),
+                progress=progress
+            )
+            response = {"status": "ok", "message": f"Imported {result['count']} entries", "data": result}
+
+    elif action == "add_conversation":
+        save_id = command.get("save_id")
+        responses = command.get("responses", [])
+        speakers = command.get("speakers", [])
+        listeners = command.get("listeners", [])
+        date_string = command.get("date", "Not Specified")
+        tick = command.get("tick")
+
+        #print(f"[ChromaManager_CLI] add_conversation: save_id={save_id}, responses_count={len(responses)}, speakers={speakers}, listeners={listeners}, date={date_string}", flush=True)
+
+        # Acknowledged once queued; the write-behind worker embeds and stores it
+        success = manager.enqueue_conversation(
+            save_id,
+            responses,
+            speakers,
+            listeners,
+            date_string,
+            "",
+            tick
+        )
+
+        if not success:
+            try:
+                manager.get_or_create_collection(save_id)
+                success = manager.add_conversation(
+                    save_id,
+                    responses,
+                    speakers,
+                    listeners,
+                    date_string,
+                    "",
+                    tick
+                )
+            except Exception as e:
+                response = {"status": "error", "message": f"Failed to create collection: {type(e).__name__}: {str(e)}"}
+
+        #print(f"[ChromaManager_CLI] add_conversation result: success={success}", flush=True)
+        if success:
+            response = {"status": "ok", "message": "Conversation stored"}
+
+    elif action == "query_context":
+        save_id = command.get("save_id")
+
+        # CHANGED: Handle 'queries' list, fallback to 'prompt'
+        queries = command.get("queries", [])
+        if not queries:
+            single_prompt = command.get("prompt", "")
+            if single_prompt:
+                queries = [single_prompt]
+
+        speakers = command.get("speakers", [])
+        listeners = command.get("listeners", [])
+        n_results = command.get("n_results", 5)
+        query_embeddings = command.get("query_embeddings")
+
+        # Game-time window and recency ranking (absolute days; "now_tick" is converted),
+        # and reranking overrides
+        search_options = {key: command.get(key) for key in TIME_FIELDS}
+        if search_options["now_day"] is None and command.get("now_tick") is not None:
+            from GameTime import day_from_tick
+            search_options["now_day"] = day_from_tick(command["now_tick"])
+        search_options.update((key, command.get(key)) for key in RERANK_FIELDS)
+
+        if query_embeddings:
+            # Caller already holds vectors: skip the embedding model
+            results = manager.query_relevant_context_by_embedding(
+                save_id,
+                query_embeddings,
+                n_results,
+                query_texts=queries or None, # Title matching only; vectors are given
+                speakers=speakers,
+                listeners=listeners,
+                **search_options
+            )
+        else:
+            results = manager.query_relevant_context(
+                save_id,
+                queries, # Pass list
+                n_results,
+                speakers=speakers,
+                listeners=listeners,
+                **search_options
+            )
+
+        # Convert ContextEntry objects to dicts
+        result_dicts = []
+        for r in results:
+            result_dicts.append({
+                "text": r["text"],
+                "speaker": r["speaker"],
+                "listeners": r["listeners"],
+                "date": r["date"],
+                "talk_type": r["talk_type"],
+                "relevance": r["relevance"]
+            })
+
+        response = {"status": "ok", "data": result_dicts}
+
+    elif action == "update_background":
+        # The full background set in one differential sync (embedded in batches internally)
+        save_id = command.get("save_id")
+        responses = command.get("responses", [])
+        date_string = command.get("date", "Not applicable")
+
+        try:
+            result = manager.sync_background(save_id, responses, date_string)
+            response = {"status": "ok", "message": "Background updated", "data": result}
+        except Exception as e:
+            response = {"status": "error", "message": f"[RimTalk ChromaDB] Error updating background: {e}"}
+
+    elif action == "flush":
+        # Wait for queued conversation writes (one save, or all if save_id is omitted)
+        save_id = command.get("save_id")
+        timeout = command.get("timeout")
+        if manager.flush(save_id, timeout):
+            response = {"status": "ok", "message": "Pending writes flushed"}
+        else:
+            response = {"status": "error", "message": "Timed out waiting for pending writes"}
+
+    elif action == "cache_stats":
+        response = {"status": "ok", "data": manager.cache_stats()}
+
+    elif action == "pool_stats":
+        response = {"status": "ok", "data": manager.pool_stats()}
+
+    elif action == "close_save":
+        save_id = command.get("save_id")
+        manager.close_save(save_id)
+        response = {"status": "ok", "message": f"Closed save: {save_id}"}
+
+    else:
+        response = {"status": "error", "message": f"Unknown action: {action}"}
+
+    return response
+
+class WriteLane:
+    """Serial executor of one save's write commands, with the number still queued or running."""
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="RimTalkWrite")
+        self.pending = 0
+        # Set when the save is closed; the lane is dropped once it runs dry
+        self.closed = False
+
+class Dispatcher:
+    """
+    Protocol version 2: requests carrying an "id" run concurrently.
+    
+    Reads go to a shared worker pool. Writes go to a per-save serial lane, so
+    writes to one save still apply in arrival order while queries (and writes
+    to other saves) proceed next to a long background refresh. A lane is
+    dropped when its save is closed (close_save or the open-save pool) and
+    no write is left in it. Responses echo
+    the request "id" and are written as soon as they are ready, possibly out
+    of order. Requests without an "id" (version 1) are handled inline, one at
+    a time, exactly as before.
+    """
+
+    PROTOCOL_VERSION = 2
+    WRITE_ACTIONS = {"init", "add_conversation", "update_background", "flush", "close_save", "export_save", "import_save"}
+    # Answered from the main thread, even while warming up
+    CONTROL_ACTIONS = {"handshake", "status", "stats", "profile"}
+    # Actions that run the embedding model synchronously
+    EMBEDDING_ACTIONS = {"query_context", "update_background"}
+
+    def __init__(
+        self,
+        warmup: Warmup,
+        workers: int = 4,
+        warming_policy: str = "queue",
+        profiler: RequestProfiler = None
+    ):
+        """
+        Args:
+            warmup: Background loader providing the manager
+            workers: Size of the read worker pool
+            warming_policy: "queue" waits for warm-up, "reject" answers {"status": "warming"}
+            profiler: On-demand request profiler (None disables profiling and the slow log)
+        """
+        self.warmup = warmup
+        self.warming_policy = warming_policy
+        self.profiler = profiler
+        self._output_lock = threading.Lock()
+        self._lanes_lock = threading.Lock()
+        self._readers = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="RimTalkRead")
+        self._lanes = {}
+        self._listening = False
+
+    def submit(self, command):
+        """Schedule a version-2 command; its response is written when done."""
+        if command.get("action") in self.WRITE_ACTIONS:
+            save_id = command.get("save_id") or ""
+            with self._lanes_lock:
+                lane = self._lanes.get(save_id)
+                if lane is None:
+                    lane = self._lanes[save_id] = WriteLane()
+                lane.pending += 1
+            lane.executor.submit(self._run_write, save_id, lane, command, time.perf_counter())
+        else:
+            self._readers.submit(self._run, command, time.perf_counter())
+
+    def release_lane(self, save_id):
+        """Drop a closed save's write lane once the writes queued in it are done."""
+        with self._lanes_lock:
+            lane = self._lanes.get(save_id)
+            if lane is None:
+                return
+            lane.closed = True
+            if lane.pending == 0:
+                self._drop_lane(save_id, lane)
+
+    def _drop_lane(self, save_id, lane):
+        # Lanes lock held. The lane is idle, so its thread just exits (no join
+        # needed, which also allows dropping a lane from its own thread)
+        if self._lanes.get(save_id) is lane:
+            del self._lanes[save_id]
+        lane.executor.shutdown(wait=False)
+
+    def _manager(self):
+        """The warmed-up manager; the first caller subscribes to its save closes."""
+        manager = self.warmup.wait_manager()
+        with self._lanes_lock:
+            subscribe = not self._listening
+            self._listening = True
+        if subscribe:
+            manager.add_close_listener(self.release_lane)
+        return manager
+
+    def control(self, command):
+        """Handle a handshake/status/stats command without waiting for the manager."""
+        action = command.get("action")
+        if action == "stats":
+            return {"status": "ok", "data": self.stats(reset=bool(command.get("reset")))}
+        if action == "profile":
+            if self.profiler is None:
+                return {"status": "error", "message": "Profiling is not available"}
+            if command.get("off"):
+                self.profiler.configure()
+            else:
+                self.profiler.configure(
+                    next_requests=command.get("next", 0),
+                    slower_than_ms=command.get("slower_than_ms"),
+                    actions=command.get("actions"),
+                    memory=command.get("memory", False)
+                )
+            return {"status": "ok", "data": self.profiler.state()}
+        report = self.warmup.report()
+        if action == "handshake":
+            return {"status": "ok", "protocol_version": self.PROTOCOL_VERSION, "ready": report["ready"]}
+        return {"status": "ok", "data": report}
+
+    def stats(self, reset=False):
+        """Telemetry (per-action and per-stage latency, counters, RSS) plus cache and pool state."""
+        data = {"telemetry": telemetry.snapshot()}
+        data.update(self.component_stats())
+        if reset:
+            telemetry.reset()
+        return data
+
+    def component_stats(self):
+        data = {"warmup": self.warmup.report()}
+        manager = self.warmup.manager
+        if manager is not None:
+            data["caches"] = manager.cache_stats()
+            data["pool"] = manager.pool_stats()
+        return data
+
+    def execute(self, command):
+        """Run a command once the components it needs are loaded (or report warming)."""
+        action = command.get("action")
+        if command.get("if_warming", self.warming_policy) == "reject":
+            needed = ["chromadb"] + (["embedding_model"] if action in self.EMBEDDING_ACTIONS else [])
+            if not all(self.warmup.is_ready(c) for c in needed):
+                return {"status": "warming", "message": "ChromaManager is still warming up", "data": self.warmup.report()}
+        start = time.perf_counter()
+        telemetry.begin_request()
+        capture = self.profiler.start(command) if self.profiler is not None else None
+        try:
+            return handle_command(self._manager(), command, functools.partial(self._emit, command))
+        finally:
+            elapsed = time.perf_counter() - start
+            telemetry.record_action(action, elapsed)
+            stages = telemetry.end_request()
+            if self.profiler is not None:
+                self.profiler.finish(capture, command, elapsed, stages)
+
+    def _run(self, command, submitted):
+        telemetry.record("queue_wait", time.perf_counter() - submitted)
+        try:
+            response = self.execute(command)
+        except Exception as e:
+            response = {"status": "error", "message": f"Error: {str(e)}"}
+        response["id"] = command.get("id")
+        self.write(response)
+
+    def _run_write(self, save_id, lane, command, submitted):
+        try:
+            self._run(command, submitted)
+        finally:
+            with self._lanes_lock:
+                lane.pending -= 1
+                if lane.closed and lane.pending == 0:
+                    self._drop_lane(save_id, lane)
+
+    def _emit(self, command, frame):
+        """Write an intermediate frame of a streamed response."""
+        if "id" in command:
+            frame["id"] = command["id"]
+        self.write(frame)
+
+    def write(self, response):
+        """Send a response as one JSON line with UTF-8 encoding."""
+        with telemetry.stage("respond"):
+            try:
+                json_str = json.dumps(response, ensure_ascii=False, separators=(',', ': '))
+            except Exception as encode_err:
+                # Fallback if there are encoding issues
+                fallback = {"status": "error", "message": f"Encoding error: {str(encode_err)}"}
+                if "id" in response:
+                    fallback["id"] = response["id"]
+                json_str = json.dumps(fallback, ensure_ascii=True)
+            with self._output_lock:
+                print(json_str, flush=True)
+
+    def shutdown(self):
+        """Wait for every scheduled command to finish."""
+        self._readers.shutdown(wait=True)
+        with self._lanes_lock:
+            lanes = list(self._lanes.values())
+        for lane in lanes:
+            lane.executor.shutdown(wait=True)
 
 def main():
     """Main loop for processing commands from C# via stdin."""
-    manager = get_manager()
+    telemetry.enabled = os.environ.get("RIMTALK_TELEMETRY", "1") != "0"
+    warmup = Warmup(os.environ.get("RIMTALK_WARMUP_MODEL", "1") != "0")
+    dispatcher = Dispatcher(
+        warmup,
+        int(os.environ.get("RIMTALK_CLI_WORKERS", "4")),
+        os.environ.get("RIMTALK_WARMING_POLICY", "queue"),
+        profiler_from_env()
+    )
+    stats_file = os.environ.get("RIMTALK_STATS_FILE")
+    if stats_file and telemetry.enabled:
+        telemetry.start_snapshots(
+            stats_file,
+            float(os.environ.get("RIMTALK_STATS_INTERVAL", "60")),
+            dispatcher.component_stats
+        )
     
     try:
         while True:
@@ -46,156 +665,24 @@ def main():
                 line = line[1:]
             
             try:
-                command = json.loads(line.strip())
-                action = command.get("action")
-                
-                if action == "init":
-                    save_id = command.get("save_id", "default")
-                    manager.get_or_create_collection(save_id)
-                    response = {"status": "ok", "message": f"Initialized for save: {save_id}"}
-
-                elif action == "info":
-                    save_id = command.get("save_id")
-                    result = manager.info(save_id)
-                    response = {"status": "ok", "data": result}
-
-                elif action =="debug_get_all_entry":
-                    save_id = command.get("save_id")
-                    
-                    results = manager.query_all_entry(
-                        save_id
-                    )
-                    
-                    # Convert ContextEntry objects to dicts
-                    result_dicts = []
-                    for r in results:
-                        result_dicts.append({
-                            "id": r["id"],
-                            "text": r["text"],
-                            "speaker": r["speaker"],
-                            "listeners": r["listeners"],
-                            "date": r["date"],
-                            "talk_type": r["talk_type"]
-                        })
-                    
-                    response = {"status": "ok", "data": result_dicts}
-                
-                elif action == "add_conversation":
-                    save_id = command.get("save_id")
-                    responses = command.get("responses", [])
-                    speakers = command.get("speakers", [])
-                    listeners = command.get("listeners", [])
-                    date_string = command.get("date", "Not Specified")
-                    
-                    #print(f"[ChromaManager_CLI] add_conversation: save_id={save_id}, responses_count={len(responses)}, speakers={speakers}, listeners={listeners}, date={date_string}", flush=True)
-                    
-                    success = manager.add_conversation(
-                        save_id,
-                        responses,
-                        speakers,
-                        listeners,
-                        date_string,
-                        ""
-                    )
-
-                    if not success:
-                        try:
-                            manager.get_or_create_collection(save_id)
-                            success = manager.add_conversation(
-                                save_id,
-                                responses,
-                                speakers,
-                                listeners,
-                                date_string,
-                                ""
-                            )
-                        except Exception as e:
-                            response = {"status": "error", "message": f"Failed to create collection: {type(e).__name__}: {str(e)}"}
-                    
-                    #print(f"[ChromaManager_CLI] add_conversation result: success={success}", flush=True)
-                    if success:
-                        response = {"status": "ok", "message": "Conversation stored"}
-                
-                elif action == "query_context":
-                    save_id = command.get("save_id")
-                    
-                    # CHANGED: Handle 'queries' list, fallback to 'prompt'
-                    queries = command.get("queries", [])
-                    if not queries:
-                        single_prompt = command.get("prompt", "")
-                        if single_prompt:
-                            queries = [single_prompt]
-
-                    listeners = command.get("listeners", [])
-                    n_results = command.get("n_results", 5)
-                    
-                    results = manager.query_relevant_context(
-                        save_id,
-                        queries, # Pass list
-                        n_results,
-                        listeners
-                    )
-                    
-                    # Convert ContextEntry objects to dicts
-                    result_dicts = []
-                    for r in results:
-                        result_dicts.append({
-                            "text": r["text"],
-                            "speaker": r["speaker"],
-                            "listeners": r["listeners"],
-                            "date": r["date"],
-                            "talk_type": r["talk_type"],
-                            "relevance": r["relevance"]
-                        })
-                    
-                    response = {"status": "ok", "data": result_dicts}
-
-                elif action == "update_background":
-                    def chunkize(arr, sz):
-                        return [arr[i:min(i+sz,len(arr))] for i in range(0,len(arr),sz)]
-
-                    save_id = command.get("save_id")
-                    responses = chunkize(command.get("responses", []),200)
-                    speakers = [[]]
-                    listeners = [[]]
-                    date_string = command.get("date", "Not applicable")
-                    
-                    for i in range(len(responses)):
-                        success = manager.update_background(
-                            save_id,
-                            responses[i],
-                            speakers[0],
-                            listeners[0],
-                            date_string,
-                            "info"
-                        )
-
-                        if not "Error" in success:
-                            response = {"status": "ok", "message": "Background updated"}
-                        else:
-                            response = {"status": "error", "message": success}
-                            break
-                
-                elif action == "close_save":
-                    save_id = command.get("save_id")
-                    manager.close_save(save_id)
-                    response = {"status": "ok", "message": f"Closed save: {save_id}"}
-                
+                with telemetry.stage("parse"):
+                    command = json.loads(line.strip())
+                if command.get("action") in Dispatcher.CONTROL_ACTIONS:
+                    response = dispatcher.control(command)
+                    if "id" in command:
+                        response["id"] = command["id"]
+                elif "id" in command:
+                    dispatcher.submit(command)
+                    continue
                 else:
-                    response = {"status": "error", "message": f"Unknown action: {action}"}
+                    response = dispatcher.execute(command)
                 
             except json.JSONDecodeError as e:
                 response = {"status": "error", "message": f"Invalid JSON: {str(e)}"}
             except Exception as e:
                 response = {"status": "error", "message": f"Error: {str(e)}"}
             
-            # Send response as JSON line with UTF-8 encoding
-            try:
-                json_str = json.dumps(response, ensure_ascii=False, separators=(',', ': '))
-                print(json_str, flush=True)
-            except Exception as encode_err:
-                # Fallback if there are encoding issues
-                print(json.dumps({"status": "error", "message": f"Encoding error: {str(encode_err)}"}, ensure_ascii=True), flush=True)
+            dispatcher.write(response)
     
     except KeyboardInterrupt:
         pass
@@ -206,8 +693,12 @@ def main():
         except:
             print(json.dumps({"status": "error", "message": "Unknown fatal error"}, ensure_ascii=True), flush=True)
     finally:
-        # Cleanup
-        pass
+        # Cleanup: finish in-flight requests, commit anything still sitting in
+        # the write-behind queue, persist caches
+        dispatcher.shutdown()
+        telemetry.stop_snapshots()
+        if warmup.manager is not None:
+            warmup.manager.shutdown()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,316 @@
+"""
+Embedding backends for RimTalk ChromaDB.
+Each backend turns texts into L2-normalized float32 vectors. Backends are
+selected by name from a registry, so a save can be embedded with the full
+torch model, an ONNX Runtime export, a dynamically int8-quantized export,
+Chroma's built-in model (for saves Chroma embedded itself), or a tiny
+deterministic hashing model for tests.
+"""
+import hashlib
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_MODEL_ID = 'BAAI/bge-m3'
+
+# Output dimension of known models, so it can be checked without loading them
+KNOWN_DIMENSIONS = {
+    'BAAI/bge-m3': 1024,
+    'BAAI/bge-base-zh-v1.5': 768,
+    'BAAI/bge-small-zh-v1.5': 512,
+    'all-MiniLM-L6-v2': 384,
+}
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class EmbeddingBackend:
+    """
+    Base class of embedding backends.
+
+    Subclasses implement _load() and _encode(); loading is lazy, thread-safe
+    and happens once. `cache_id` identifies the vectors a backend produces:
+    backends whose output differs numerically must not share cache entries.
+    Backends of the same `family` can load the same model IDs.
+    """
+
+    name = ""
+    family = "transformers"
+
+    def __init__(self, model_id: str = DEFAULT_MODEL_ID, num_threads: Optional[int] = None):
+        """
+        Args:
+            model_id: Model to load (Hugging Face ID or local path)
+            num_threads: Intra-op threads of the inference runtime (None keeps the default)
+        """
+        self.model_id = model_id
+        self.num_threads = num_threads
+        self._dim: Optional[int] = KNOWN_DIMENSIONS.get(model_id)
+        self._loaded = False
+        self._load_lock = threading.Lock()
+
+    @property
+    def cache_id(self) -> str:
+        return f"{self.model_id}#{self.name}"
+
+    @property
+    def declared_dim(self) -> Optional[int]:
+        """Output dimension if known without loading the model."""
+        return self._dim
+
+    @property
+    def dim(self) -> int:
+        """Output dimension (encodes a probe text if it is not known upfront)."""
+        if self._dim is None:
+            self._dim = int(self.encode(["dim"]).shape[1])
+        return self._dim
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def load(self):
+        if self._loaded:
+            return
+        with self._load_lock:
+            if not self._loaded:
+                self._load()
+                self._loaded = True
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed `texts` into an (n, dim) array of L2-normalized float32 rows."""
+        self.load()
+        vectors = _normalize(self._encode(list(texts)))
+        if self._dim is None:
+            self._dim = int(vectors.shape[1])
+        return vectors
+
+    def set_num_threads(self, num_threads: Optional[int]):
+        self.num_threads = num_threads
+        if self._loaded:
+            self._apply_num_threads()
+
+    def _load(self):
+        raise NotImplementedError
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+    def _apply_num_threads(self):
+        pass
+
+
+class TorchBackend(EmbeddingBackend):
+    """
+    FlagEmbedding model on PyTorch. Runs fp32 on CPU; fp16 is only used
+    when a CUDA device is present, since it gives no speed-up on CPU.
+    """
+
+    name = "torch"
+
+    @property
+    def cache_id(self) -> str:
+        # The reference backend keeps the plain model ID, so existing caches stay valid
+        return self.model_id
+
+    def _load(self):
+        import torch
+        from FlagEmbedding import FlagModel
+        self._model = FlagModel(self.model_id, use_fp16=torch.cuda.is_available())
+        self._apply_num_threads()
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        return self._model.encode(texts)
+
+    def _apply_num_threads(self):
+        if self.num_threads:
+            import torch
+            torch.set_num_threads(int(self.num_threads))
+
+
+class OnnxBackend(EmbeddingBackend):
+    """
+    ONNX Runtime export of the model (CLS pooling, as used by BGE models).
+    The export is produced once with optimum and kept under `export_dir`.
+    """
+
+    name = "onnx"
+    MAX_LENGTH = 512
+
+    def __init__(
+        self,
+        model_id: str = DEFAULT_MODEL_ID,
+        num_threads: Optional[int] = None,
+        export_dir: Optional[Path] = None
+    ):
+        """
+        Args:
+            model_id: Model to export and load
+            num_threads: Intra-op threads of the ONNX Runtime session
+            export_dir: Directory holding exported models (default ./onnx_models)
+        """
+        super().__init__(model_id, num_threads)
+        self.export_dir = Path(export_dir) if export_dir is not None else Path("./onnx_models")
+
+    def _model_dir(self) -> Path:
+        return self.export_dir / self.model_id.replace("/", "__")
+
+    def _model_file(self) -> Path:
+        model_dir = self._model_dir()
+        model_file = model_dir / "model.onnx"
+        if not model_file.exists():
+            from optimum.exporters.onnx import main_export
+            main_export(self.model_id, output=model_dir, task="feature-extraction")
+        return model_file
+
+    def _load(self):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        model_file = self._model_file()
+        self._tokenizer = AutoTokenizer.from_pretrained(str(self._model_dir()))
+        self._session = self._create_session(ort, model_file)
+
+    def _create_session(self, ort, model_file: Path):
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self.num_threads:
+            options.intra_op_num_threads = int(self.num_threads)
+        session = ort.InferenceSession(str(model_file), options, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in session.get_inputs()}
+        return session
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        inputs = self._tokenizer(
+            texts, padding=True, truncation=True, max_length=self.MAX_LENGTH, return_tensors="np"
+        )
+        feed = {k: v for k, v in inputs.items() if k in self._input_names}
+        hidden = self._session.run(None, feed)[0]
+        return hidden[:, 0]
+
+    def _apply_num_threads(self):
+        # Session options are fixed at creation, so rebuild the session
+        import onnxruntime as ort
+        self._session = self._create_session(ort, self._model_file())
+
+
+class QuantizedOnnxBackend(OnnxBackend):
+    """ONNX export with weights dynamically quantized to int8 (smaller and faster on CPU)."""
+
+    name = "int8"
+
+    def _model_file(self) -> Path:
+        quantized = self._model_dir() / "model.int8.onnx"
+        if not quantized.exists():
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            quantize_dynamic(str(super()._model_file()), str(quantized), weight_type=QuantType.QInt8)
+        return quantized
+
+
+class ChromaDefaultBackend(EmbeddingBackend):
+    """
+    Chroma's default embedding function (all-MiniLM-L6-v2 on ONNX Runtime).
+    Saves written before the manager computed embeddings itself were
+    embedded by Chroma with this model, so they keep being served by it.
+    """
+
+    name = "chroma"
+    family = "chroma"
+    MODEL_ID = 'all-MiniLM-L6-v2'
+
+    def __init__(self, model_id: Optional[str] = None, num_threads: Optional[int] = None):
+        """
+        Args:
+            model_id: Ignored; Chroma's default function has one model
+            num_threads: Unused (Chroma creates its own session)
+        """
+        super().__init__(self.MODEL_ID, num_threads)
+
+    def _load(self):
+        from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+        self._function = DefaultEmbeddingFunction()
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self._function(texts), dtype=np.float32)
+
+
+class HashingBackend(EmbeddingBackend):
+    """
+    Deterministic character n-gram hashing model. Needs no dependencies and
+    loads instantly; meant for tests and benchmarks, not for real retrieval.
+    """
+
+    name = "hash"
+    family = "hash"
+    NGRAM_SIZES = (1, 2, 3)
+
+    def __init__(self, model_id: Optional[str] = None, num_threads: Optional[int] = None, dim: int = 256):
+        """
+        Args:
+            model_id: Ignored; the model ID is always "hash-ngram-<dim>"
+            num_threads: Unused
+            dim: Output dimension
+        """
+        super().__init__(f"hash-ngram-{dim}", num_threads)
+        self._dim = dim
+
+    @property
+    def cache_id(self) -> str:
+        return self.model_id
+
+    def _load(self):
+        pass
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self._dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for n in self.NGRAM_SIZES:
+                for i in range(len(text) - n + 1):
+                    digest = hashlib.blake2b(text[i:i + n].encode("utf-8"), digest_size=8).digest()
+                    value = int.from_bytes(digest, "little")
+                    vectors[row, value % self._dim] += 1.0 if (value >> 63) else -1.0
+            if not text:
+                vectors[row, 0] = 1.0
+        return vectors
+
+
+BACKENDS: Dict[str, Callable[..., EmbeddingBackend]] = {
+    TorchBackend.name: TorchBackend,
+    OnnxBackend.name: OnnxBackend,
+    QuantizedOnnxBackend.name: QuantizedOnnxBackend,
+    ChromaDefaultBackend.name: ChromaDefaultBackend,
+    HashingBackend.name: HashingBackend,
+}
+
+
+def register_backend(name: str, factory: Callable[..., EmbeddingBackend]):
+    """Make a custom backend selectable by name."""
+    BACKENDS[name] = factory
+
+
+def backend_family(name: str) -> str:
+    """Family of a registered backend (which model IDs it can load)."""
+    return getattr(BACKENDS.get(name), "family", EmbeddingBackend.family)
+
+
+def create_backend(name: str, model_id: Optional[str] = None, **options) -> EmbeddingBackend:
+    """
+    Instantiate a registered backend.
+
+    Args:
+        name: Registry name ("torch", "onnx", "int8", "chroma", "hash", or a registered one)
+        model_id: Model to load (backend default if None)
+        **options: Backend-specific keyword arguments
+    """
+    factory = BACKENDS.get(name)
+    if factory is None:
+        raise ValueError(f"Unknown embedding backend '{name}' (available: {', '.join(sorted(BACKENDS))})")
+    if model_id is not None:
+        options["model_id"] = model_id
+    return factory(**options)
@@ -0,0 +1,261 @@
+"""
+Content-addressed embedding cache for RimTalk ChromaDB.
+Vectors are keyed by a hash of (model id, text) and kept in two tiers:
+an in-memory LRU and an on-disk, memory-mapped ring of float32 rows,
+both bounded by a byte budget.
+"""
+import hashlib
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+KEY_SIZE = 20  # sha1 digest length
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache shared by queries and ingestion.
+
+    - Memory tier: LRU of recently used vectors, evicted by `memory_budget` bytes.
+    - Disk tier: `keys.bin` / `vectors.bin` memory-mapped files holding up to
+      `disk_budget` bytes of rows. Rows are written in ring order, so once the
+      budget is used up the oldest rows are overwritten first. The key file is
+      the source of truth; the in-memory index is rebuilt from it on open.
+    """
+
+    # Persist the ring cursor after this many disk writes
+    STATE_SYNC_INTERVAL = 256
+
+    def __init__(
+        self,
+        cache_dir: Optional[Path],
+        model_id: str,
+        memory_budget: int = 64 * 1024 * 1024,
+        disk_budget: int = 256 * 1024 * 1024
+    ):
+        """
+        Args:
+            cache_dir: Directory for the disk tier (None keeps the cache in memory only)
+            model_id: Identifier of the embedding model; part of every key
+            memory_budget: Maximum bytes of vectors held in the LRU tier
+            disk_budget: Maximum bytes of keys + vectors held on disk
+        """
+        self.model_id = model_id
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self._lock = threading.Lock()
+
+        self._memory: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._memory_bytes = 0
+
+        self._dir = None
+        if cache_dir is not None:
+            model_tag = hashlib.sha1(model_id.encode("utf-8")).hexdigest()[:16]
+            self._dir = Path(cache_dir) / model_tag
+            self._dir.mkdir(parents=True, exist_ok=True)
+        self._dim = 0
+        self._rows = 0
+        self._max_rows = 0
+        self._cursor = 0
+        self._keys: Optional[np.memmap] = None
+        self._vectors: Optional[np.memmap] = None
+        self._index: Dict[bytes, int] = {}
+        self._unsynced_writes = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self._dir is not None:
+            self._open_disk_tier()
+
+    def key(self, text: str) -> bytes:
+        """Content address of a text under this cache's model."""
+        return hashlib.sha1(f"{self.model_id}\0{text}".encode("utf-8")).digest()
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Look up vectors for `texts`; missing entries are None."""
+        results: List[Optional[np.ndarray]] = []
+        with self._lock:
+            for text in texts:
+                k = self.key(text)
+                vector = self._memory.get(k)
+                if vector is not None:
+                    self._memory.move_to_end(k)
+                    self.memory_hits += 1
+                    results.append(vector)
+                    continue
+
+                row = self._index.get(k)
+                if row is not None:
+                    vector = np.array(self._vectors[row], dtype=np.float32)
+                    self._remember(k, vector)
+                    self.disk_hits += 1
+                    results.append(vector)
+                    continue
+
+                self.misses += 1
+                results.append(None)
+        return results
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[np.ndarray]):
+        """Store freshly computed vectors in both tiers."""
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                k = self.key(text)
+                vector = np.asarray(vector, dtype=np.float32)
+                self._remember(k, vector)
+                if self._dir is not None and k not in self._index:
+                    self._write_disk(k, vector)
+
+    def embed(self, texts: Sequence[str], encode_fn) -> List[np.ndarray]:
+        """
+        Return vectors for `texts`, calling `encode_fn` only for cache misses.
+
+        Args:
+            texts: Texts to embed
+            encode_fn: Callable(list of texts) -> array of shape (n, dim)
+        """
+        vectors = self.get_many(texts)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            # Encode each distinct missing text once
+            unique_texts = list(dict.fromkeys(texts[i] for i in missing))
+            encoded = np.asarray(encode_fn(unique_texts), dtype=np.float32)
+            self.put_many(unique_texts, encoded)
+            by_text = dict(zip(unique_texts, encoded))
+            for i in missing:
+                vectors[i] = by_text[texts[i]]
+        return vectors
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and tier sizes."""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "model": self.model_id,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_entries": len(self._index),
+                "disk_bytes": self._rows * (KEY_SIZE + self._dim * 4),
+            }
+
+    def flush(self):
+        """Write the disk tier's pages and ring cursor to disk."""
+        with self._lock:
+            self._sync_disk()
+
+    def _remember(self, k: bytes, vector: np.ndarray):
+        """Insert into the LRU tier and evict down to the memory budget."""
+        if k in self._memory:
+            self._memory.move_to_end(k)
+            return
+        self._memory[k] = vector
+        self._memory_bytes += vector.nbytes
+        while self._memory_bytes > self.memory_budget and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted.nbytes
+
+    # --- disk tier -------------------------------------------------------
+
+    def _state_path(self) -> Path:
+        return self._dir / "state.json"
+
+    def _open_disk_tier(self):
+        """Map existing cache files and rebuild the key index."""
+        state_path = self._state_path()
+        if not state_path.exists():
+            return
+        try:
+            with open(state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            self._dim = int(state["dim"])
+            self._cursor = int(state.get("cursor", 0))
+            self._max_rows = self._max_rows_for(self._dim)
+            rows = os.path.getsize(self._dir / "keys.bin") // KEY_SIZE
+            self._map_files(min(rows, self._max_rows))
+            self._cursor %= max(1, self._max_rows)
+
+            empty = bytes(KEY_SIZE)
+            for row in range(self._rows):
+                k = self._keys[row].tobytes()
+                if k != empty:
+                    self._index[k] = row
+        except Exception as e:
+            print(
+                f"[RimTalk ChromaDB] Discarding unreadable embedding cache {self._dir}: {e}",
+                file=sys.stderr, flush=True
+            )
+            self._keys = None
+            self._vectors = None
+            self._index = {}
+            self._dim = 0
+            self._rows = 0
+            self._cursor = 0
+            for name in ("keys.bin", "vectors.bin", "state.json"):
+                try:
+                    (self._dir / name).unlink()
+                except FileNotFoundError:
+                    pass
+
+    def _max_rows_for(self, dim: int) -> int:
+        return max(1, self.disk_budget // (KEY_SIZE + dim * 4))
+
+    def _map_files(self, rows: int):
+        """(Re)map the key and vector files with `rows` rows, growing them if needed."""
+        self._keys = None
+        self._vectors = None
+        for name, row_bytes in (("keys.bin", KEY_SIZE), ("vectors.bin", self._dim * 4)):
+            path = self._dir / name
+            with open(path, "ab") as f:
+                if f.tell() < rows * row_bytes:
+                    f.truncate(rows * row_bytes)
+        self._rows = rows
+        if rows:
+            self._keys = np.memmap(self._dir / "keys.bin", dtype=np.uint8, mode="r+", shape=(rows, KEY_SIZE))
+            self._vectors = np.memmap(self._dir / "vectors.bin", dtype=np.float32, mode="r+", shape=(rows, self._dim))
+
+    def _write_disk(self, k: bytes, vector: np.ndarray):
+        if self._dim == 0:
+            self._dim = int(vector.shape[0])
+            self._max_rows = self._max_rows_for(self._dim)
+        if vector.shape[0] != self._dim:
+            return
+
+        row = self._cursor
+        if row >= self._rows:
+            # Grow geometrically up to the disk budget instead of allocating it all upfront
+            self._map_files(min(self._max_rows, max(row + 1, self._rows * 2, 1024)))
+
+        old_key = self._keys[row].tobytes()
+        if old_key != bytes(KEY_SIZE):
+            self._index.pop(old_key, None)
+        self._keys[row] = np.frombuffer(k, dtype=np.uint8)
+        self._vectors[row] = vector
+        self._index[k] = row
+        self._cursor = (row + 1) % self._max_rows
+
+        self._unsynced_writes += 1
+        if self._unsynced_writes >= self.STATE_SYNC_INTERVAL:
+            self._sync_disk()
+
+    def _sync_disk(self):
+        if self._dir is None or self._keys is None:
+            return
+        self._keys.flush()
+        self._vectors.flush()
+        tmp_path = self._state_path().with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"model": self.model_id, "dim": self._dim, "cursor": self._cursor}, f)
+        os.replace(tmp_path, self._state_path())
+        self._unsynced_writes = 0
@@ -0,0 +1,179 @@
+"""
+Cross-request micro-batching for RimTalk embedding calls.
+Concurrent callers submit small encode requests; a single worker gathers
+them for a short window and runs bounded, length-bucketed forward passes,
+handing each caller its own rows as soon as they are encoded.
+"""
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class _EncodeRequest:
+    __slots__ = ("texts", "order", "taken", "result", "error", "done")
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        # Texts are handed out in length order, so the slices of a large request bucket well
+        self.order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        self.taken = 0
+        self.result: Optional[np.ndarray] = None
+        self.error: Optional[BaseException] = None
+        self.done = threading.Event()
+
+    @property
+    def remaining(self) -> int:
+        return len(self.texts) - self.taken
+
+
+class EmbeddingScheduler:
+    """
+    Micro-batching front end for an encode function.
+
+    The worker waits for the first pending request, keeps collecting for up to
+    `max_wait` seconds (or until `max_batch_size` texts are waiting), then
+    takes at most `max_batch_size` texts, deduplicates them, sorts them by
+    length and encodes them in one forward pass. Requests that fit whole are taken first, so a short
+    query is not held up behind a bulk write; larger requests are handed out
+    in slices of similar length, which keeps padding waste low. A caller is
+    released as soon as its last rows are encoded. Errors are delivered to
+    every caller with texts in the failed pass.
+    """
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], np.ndarray],
+        max_batch_size: int = 64,
+        max_wait: float = 0.005
+    ):
+        """
+        Args:
+            encode_fn: Callable(list of texts) -> array of shape (n, dim)
+            max_batch_size: Maximum texts per forward pass
+            max_wait: Seconds to keep collecting after the first request arrives
+        """
+        self._encode_fn = encode_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait))
+
+        self._pending: List[_EncodeRequest] = []
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self.requests = 0
+        self.batches = 0
+        self.texts_encoded = 0
+        self.texts_deduplicated = 0
+
+        self._worker = threading.Thread(target=self._run, name="RimTalkEmbedding", daemon=True)
+        self._worker.start()
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        """Encode `texts` as part of the next micro-batch; blocks until done."""
+        request = _EncodeRequest(list(texts))
+        if not request.texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Embedding scheduler is closed")
+            self._pending.append(request)
+            self.requests += 1
+            self._cond.notify_all()
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                "requests": self.requests,
+                "batches": self.batches,
+                "texts_encoded": self.texts_encoded,
+                "texts_deduplicated": self.texts_deduplicated,
+                "avg_requests_per_batch": self.requests / self.batches if self.batches else 0.0,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+            }
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._worker.join()
+
+    def _collect(self) -> List[Tuple[_EncodeRequest, int, int]]:
+        """
+        Wait for a micro-batch to fill (or its window to pass) and take up to
+        max_batch_size of the waiting texts.
+
+        Returns:
+            (request, start, stop) slices of the requests' length-ordered texts
+        """
+        with self._cond:
+            while not self._pending:
+                if self._closed:
+                    return []
+                self._cond.wait()
+
+            deadline = time.monotonic() + self.max_wait
+            while not self._closed:
+                waiting = sum(r.remaining for r in self._pending)
+                remaining = deadline - time.monotonic()
+                if waiting >= self.max_batch_size or remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            # Requests that fit whole first (in arrival order), then slices of the rest
+            budget = self.max_batch_size
+            batch = []
+            for whole in (True, False):
+                for request in self._pending:
+                    if budget <= 0:
+                        break
+                    if request.remaining == 0 or (whole and request.remaining > budget):
+                        continue
+                    start = request.taken
+                    request.taken = min(len(request.texts), start + budget)
+                    budget -= request.taken - start
+                    batch.append((request, start, request.taken))
+            self._pending = [r for r in self._pending if r.remaining > 0]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if not batch:
+                return
+            try:
+                self._encode_batch(batch)
+            except BaseException as e:
+                failed = [request for request, _, _ in batch if not request.done.is_set()]
+                with self._cond:
+                    self._pending = [r for r in self._pending if r not in failed]
+                for request in failed:
+                    request.error = e
+                    request.done.set()
+
+    def _encode_batch(self, batch: List[Tuple[_EncodeRequest, int, int]]):
+        texts = [request.texts[i] for request, start, stop in batch for i in request.order[start:stop]]
+        # Texts of all requests in the pass, shortest first, so backends that
+        # split a call into sub-batches pad similar lengths together
+        unique_texts = sorted(dict.fromkeys(texts), key=len)
+        encoded = np.asarray(self._encode_fn(unique_texts), dtype=np.float32)
+
+        row_of = {text: i for i, text in enumerate(unique_texts)}
+        for request, start, stop in batch:
+            if request.result is None:
+                request.result = np.empty((len(request.texts), encoded.shape[1]), dtype=np.float32)
+            positions = request.order[start:stop]
+            request.result[positions] = encoded[[row_of[request.texts[i]] for i in positions]]
+            if stop == len(request.texts):
+                request.done.set()
+
+        with self._cond:
+            self.batches += 1
+            self.texts_encoded += len(unique_texts)
+            self.texts_deduplicated += len(texts) - len(unique_texts)
@@ -0,0 +1,87 @@
+"""
+In-game time helpers for RimTalk ChromaDB.
+Conversation entries store the absolute game tick they were spoken at (when
+the game sends it) and the absolute game day derived from it, so queries can
+restrict themselves to a time window inside Chroma's where clause and rank
+recent memories above stale ones.
+"""
+import re
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+TICKS_PER_DAY = 60000
+DAYS_PER_QUADRUM = 15
+QUADRUMS = ("aprimay", "jugust", "septober", "decembary")
+DAYS_PER_YEAR = DAYS_PER_QUADRUM * len(QUADRUMS)
+# Year of absolute tick 0
+FIRST_YEAR = 5500
+
+# English date strings as written by GenDate.DateFullStringAt,
+# e.g. "5th of Septober, 5500" or "5th of Septober, year 5500"
+_DATE_PATTERN = re.compile(
+    r"(\d+)\s*(?:st|nd|rd|th)?\s+of\s+([A-Za-z]+)\s*,?\s*(?:year\s+)?(\d+)",
+    re.IGNORECASE
+)
+
+
+def day_from_tick(tick: int) -> int:
+    """Absolute game day (0 = 1st of Aprimay, 5500) of an absolute tick."""
+    return int(tick) // TICKS_PER_DAY
+
+
+def parse_game_day(date_string: str) -> Optional[int]:
+    """
+    Absolute game day of an English in-game date string.
+
+    Returns:
+        The day, or None if the string is not a recognizable date
+        (e.g. "Not Specified" or a translated date)
+    """
+    match = _DATE_PATTERN.search(date_string or "")
+    if not match:
+        return None
+    day, quadrum, year = match.groups()
+    try:
+        quadrum_index = QUADRUMS.index(quadrum.lower())
+    except ValueError:
+        return None
+    day = int(day)
+    if not 1 <= day <= DAYS_PER_QUADRUM:
+        return None
+    return (int(year) - FIRST_YEAR) * DAYS_PER_YEAR + quadrum_index * DAYS_PER_QUADRUM + day - 1
+
+
+def time_metadata(tick: Optional[int], date_string: str) -> Dict[str, int]:
+    """
+    Numeric time fields of a conversation entry: "tick" if the game sent one,
+    and "day" from the tick or, failing that, from the date string.
+    Fields that cannot be determined are left out.
+    """
+    fields = {}
+    if tick is not None:
+        fields["tick"] = int(tick)
+        fields["day"] = day_from_tick(tick)
+    else:
+        day = parse_game_day(date_string)
+        if day is not None:
+            fields["day"] = day
+    return fields
+
+
+def recency_factors(
+    days: Sequence[Optional[float]],
+    now_day: float,
+    half_life_days: float,
+    floor: float
+) -> np.ndarray:
+    """
+    Per-entry multipliers in [floor, 1] decaying with age.
+
+    An entry from `now_day` keeps its full score; one `half_life_days` older
+    keeps floor + (1 - floor) / 2. Entries without a day get `floor`.
+    """
+    days = np.array([np.nan if d is None else d for d in days], dtype=np.float64)
+    age = np.maximum(now_day - days, 0.0)
+    decay = np.where(np.isnan(days), 0.0, np.exp2(-age / max(half_life_days, 1e-9)))
+    return floor + (1.0 - floor) * decay
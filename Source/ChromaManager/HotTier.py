@@ -0,0 +1,208 @@
+"""
+In-memory hot tier of a save's most recent conversation entries.
+The embeddings of the newest N conversation entries are held in one
+contiguous matrix (a ring buffer) next to compact per-row metadata, and
+searched with a single matrix product per request. The tier always holds
+every conversation entry from `coverage_low` on, so the persistent (cold)
+index only has to be searched below it, or not at all.
+"""
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+class HotTier:
+    """
+    Ring buffer of the newest conversation entries of one save.
+
+    Rows are added as the manager's commits land (write-through), which is
+    mostly but not strictly in "seq" order: concurrent writers may commit
+    out of order, and the lines of a turn written before sequences were per
+    line share one seq. When the buffer is full the row added longest ago
+    is overwritten and coverage_low moves above its seq, so the tier never
+    claims a seq it may no longer hold in full. Rows below coverage_low are
+    not added; the cold search covers them.
+    Speaker and listener filters use one boolean column per pawn, the game
+    day window a float column (NaN = undated, never inside a window), so a
+    filtered search is a mask over the full matrix product.
+    """
+
+    def __init__(self, capacity: int, dtype=np.float32, listener_prefix: str = "listener:"):
+        """
+        Args:
+            capacity: Maximum number of entries held
+            dtype: Storage type of the embeddings (float16 halves the memory;
+                rows are widened to float32 for the product)
+            listener_prefix: Metadata key prefix marking a listener ("<prefix><name>": True)
+        """
+        self.capacity = max(1, int(capacity))
+        self.dtype = np.dtype(dtype)
+        self.listener_prefix = listener_prefix
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.dim: Optional[int] = None
+        self._matrix: Optional[np.ndarray] = None
+        self._norms = np.zeros(self.capacity, dtype=np.float32)
+        self._seqs = np.full(self.capacity, -1, dtype=np.int64)
+        self._days = np.full(self.capacity, np.nan, dtype=np.float64)
+        self._ids: List[Optional[str]] = [None] * self.capacity
+        self._documents: List[Optional[str]] = [None] * self.capacity
+        self._metadatas: List[Optional[Dict]] = [None] * self.capacity
+        self._slots: Dict[str, int] = {}
+        self._speakers: Dict[str, np.ndarray] = {}
+        self._listeners: Dict[str, np.ndarray] = {}
+        self._next = 0
+        self._filled = 0
+        self.max_seq = -1
+        # Every conversation entry with seq >= coverage_low is held
+        self.coverage_low = 0
+        self.searches = 0
+
+    @property
+    def size(self) -> int:
+        return int(np.count_nonzero(self._seqs >= 0))
+
+    @property
+    def nbytes(self) -> int:
+        return 0 if self._matrix is None else int(self._matrix.nbytes)
+
+    def load(self, ids: List[str], embeddings, documents: List[str], metadatas: List[Dict], coverage_low: int):
+        """
+        Fill the tier from stored rows (ascending seq) and mark it loaded.
+
+        Args:
+            coverage_low: Lowest seq from which the rows are complete
+        """
+        self.coverage_low = int(coverage_low)
+        self.add(ids, embeddings, documents, metadatas)
+        self.loaded = True
+
+    def add(self, ids: List[str], embeddings, documents: List[str], metadatas: List[Dict]):
+        """Append committed conversation rows; rows already held or below coverage_low are skipped."""
+        if not ids:
+            return
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if self._matrix is None:
+            self.dim = int(embeddings.shape[1])
+            self._matrix = np.zeros((self.capacity, self.dim), dtype=self.dtype)
+        for doc_id, vector, doc, meta in zip(ids, embeddings, documents, metadatas):
+            seq = meta.get("seq", -1)
+            if meta.get("talk_type") == "info" or doc_id in self._slots or seq < self.coverage_low:
+                continue
+            slot = self._next
+            dropped = int(self._seqs[slot])
+            if dropped >= 0:
+                self._clear(slot)
+                self.coverage_low = max(self.coverage_low, dropped + 1)
+            self._matrix[slot] = vector
+            self._norms[slot] = float(np.dot(vector, vector))
+            self._seqs[slot] = seq
+            day = meta.get("day")
+            self._days[slot] = np.nan if day is None else day
+            self._ids[slot] = doc_id
+            self._slots[doc_id] = slot
+            self._documents[slot] = doc
+            self._metadatas[slot] = meta
+            self._column(self._speakers, meta.get("speaker", "Unknown"))[slot] = True
+            for key in meta:
+                if key.startswith(self.listener_prefix):
+                    self._column(self._listeners, key[len(self.listener_prefix):])[slot] = True
+            self.max_seq = max(self.max_seq, seq)
+            self._next = (slot + 1) % self.capacity
+            self._filled = max(self._filled, slot + 1)
+
+    def discard_below(self, seq: int):
+        """Drop rows below `seq` (evicted from the save)."""
+        for slot in np.flatnonzero((self._seqs >= 0) & (self._seqs < seq)):
+            self._clear(int(slot))
+        self.coverage_low = max(self.coverage_low, int(seq))
+
+    def _column(self, columns: Dict[str, np.ndarray], name: str) -> np.ndarray:
+        column = columns.get(name)
+        if column is None:
+            column = columns[name] = np.zeros(self.capacity, dtype=bool)
+        return column
+
+    def _clear(self, slot: int):
+        self._slots.pop(self._ids[slot], None)
+        self._seqs[slot] = -1
+        self._days[slot] = np.nan
+        self._ids[slot] = self._documents[slot] = self._metadatas[slot] = None
+        for column in self._speakers.values():
+            column[slot] = False
+        for column in self._listeners.values():
+            column[slot] = False
+
+    def search(
+        self,
+        query_embeddings,
+        n_results: int,
+        speakers: Optional[Sequence[str]] = None,
+        listeners: Optional[Sequence[str]] = None,
+        since_day: Optional[int] = None,
+        until_day: Optional[int] = None
+    ) -> Dict[str, List[List]]:
+        """
+        Nearest held entries per query, with the same filters as the cold search.
+
+        Returns:
+            A Chroma-style query result (ids, documents, metadatas, embeddings,
+            distances as squared L2 distances, one list per query)
+        """
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        results = {"ids": [], "documents": [], "metadatas": [], "embeddings": [], "distances": []}
+        self.searches += 1
+        n = self._filled if self._matrix is not None else 0
+        mask = self._seqs[:n] >= 0
+        if speakers:
+            mask &= self._any(self._speakers, speakers, n)
+        if listeners:
+            mask &= self._any(self._listeners, listeners, n)
+        if since_day is not None:
+            mask &= self._days[:n] >= since_day
+        if until_day is not None:
+            mask &= self._days[:n] <= until_day
+        candidates = int(np.count_nonzero(mask))
+        k = min(n_results, candidates)
+        if k == 0:
+            for key in results:
+                results[key] = [[] for _ in range(len(queries))]
+            return results
+
+        matrix = self._matrix[:n]
+        if matrix.dtype != np.float32:
+            matrix = matrix.astype(np.float32)
+        # ||q - m||^2 = ||q||^2 + ||m||^2 - 2 q.m, the same metric as the cold index
+        distances = (np.einsum("ij,ij->i", queries, queries)[:, None]
+                     + self._norms[:n][None, :] - 2.0 * (queries @ matrix.T))
+        distances[:, ~mask] = np.inf
+        top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        for row, slots in zip(distances, top):
+            slots = slots[np.argsort(row[slots])]
+            results["ids"].append([self._ids[s] for s in slots])
+            results["documents"].append([self._documents[s] for s in slots])
+            results["metadatas"].append([self._metadatas[s] for s in slots])
+            results["embeddings"].append(matrix[slots])
+            results["distances"].append(np.maximum(row[slots], 0.0).tolist())
+        return results
+
+    @staticmethod
+    def _any(columns: Dict[str, np.ndarray], names: Sequence[str], n: int) -> np.ndarray:
+        mask = np.zeros(n, dtype=bool)
+        for name in names:
+            column = columns.get(name)
+            if column is not None:
+                mask |= column[:n]
+        return mask
+
+    def stats(self) -> Dict:
+        return {
+            "size": self.size,
+            "capacity": self.capacity,
+            "dtype": self.dtype.name,
+            "bytes": self.nbytes,
+            "coverage_low": self.coverage_low,
+            "max_seq": self.max_seq,
+            "searches": self.searches,
+        }
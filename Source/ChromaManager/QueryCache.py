@@ -0,0 +1,97 @@
+"""
+Result cache for query_context in RimTalk ChromaDB.
+Entries are tagged with the save's write generation at the time they were
+computed; any write to the save bumps the generation, which invalidates
+exactly the entries computed before it.
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+
+def normalize_queries(query_texts: Sequence[str]) -> Tuple[str, ...]:
+    """Canonical form of a query list: whitespace collapsed, deduplicated, order-independent."""
+    normalized = {" ".join(q.split()) for q in query_texts}
+    normalized.discard("")
+    return tuple(sorted(normalized))
+
+
+class QueryResultCache:
+    """LRU of query results validated against per-save write generations."""
+
+    def __init__(self, capacity: int = 256):
+        """
+        Args:
+            capacity: Maximum number of cached result lists (0 disables caching)
+        """
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        # key -> (generation, results)
+        self._entries: "OrderedDict[Hashable, Tuple[int, List[Dict]]]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(
+        save_id: str,
+        query_texts: Sequence[str],
+        n_results: int,
+        speakers: Optional[Sequence[str]],
+        listeners: Optional[Sequence[str]],
+        **extra
+    ) -> Hashable:
+        return (
+            save_id,
+            normalize_queries(query_texts),
+            n_results,
+            tuple(sorted(speakers or ())),
+            tuple(sorted(listeners or ())),
+            tuple(sorted(extra.items())),
+        )
+
+    def get(self, key: Hashable, generation: int) -> Optional[List[Dict]]:
+        """Return a copy of the cached results if they were computed at `generation`."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] != generation:
+                del self._entries[key]
+                self.invalidations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return [dict(r) for r in entry[1]]
+
+    def put(self, key: Hashable, generation: int, results: List[Dict]):
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (generation, [dict(r) for r in results])
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def drop_save(self, save_id: str):
+        """Forget every entry of a save (closed or reset)."""
+        with self._lock:
+            stale = [key for key in self._entries if key[0] == save_id]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
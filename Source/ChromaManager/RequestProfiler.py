@@ -0,0 +1,211 @@
+"""
+On-demand request profiling for the RimTalk ChromaManager CLI.
+When armed, requests run under cProfile (and optionally tracemalloc); the
+profile is kept for the next N requests, or only for requests slower than a
+threshold, and dumped to a per-save directory. Slow requests are also
+appended to a per-save log together with their stage breakdown.
+Only the standard library is used, and only when a request is profiled.
+"""
+import io
+import json
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+# Request fields whose length is reported as the request size
+SIZE_FIELDS = ("queries", "responses", "entries", "query_embeddings")
+
+
+def request_size(command: Dict) -> int:
+    """Number of items a request carries (queries, turns, background entries)."""
+    return sum(len(command[f]) for f in SIZE_FIELDS if isinstance(command.get(f), list))
+
+
+def _safe_name(name: str) -> str:
+    return re.sub(r"[^\w.-]", "_", name) or "_"
+
+
+class _Capture:
+    __slots__ = ("forced", "profile", "memory_before", "started_tracing")
+
+    def __init__(self, forced: bool):
+        self.forced = forced
+        self.profile = None
+        self.memory_before = None
+        self.started_tracing = False
+
+
+class RequestProfiler:
+    """
+    Decides which requests to profile and writes the results.
+
+    cProfile only follows the calling thread and Python allows a single active
+    profiler, so at most one request is captured at a time; requests arriving
+    meanwhile run unprofiled (they still reach the slow-request log).
+    """
+
+    MEMORY_FRAMES = 5
+    TOP_FUNCTIONS = 40
+    TOP_ALLOCATIONS = 25
+
+    def __init__(self, out_dir: Path, slow_log_ms: Optional[float] = 1000.0):
+        """
+        Args:
+            out_dir: Directory receiving one sub-directory per save
+            slow_log_ms: Requests at least this slow are logged (None disables the log)
+        """
+        self.out_dir = Path(out_dir)
+        self.slow_log_ms = slow_log_ms
+        self._lock = threading.Lock()
+        self._busy = False
+        self.remaining = 0
+        self.slower_than_ms: Optional[float] = None
+        self.actions: Optional[set] = None
+        self.memory = False
+        self.captured = 0
+
+    def configure(
+        self,
+        next_requests: int = 0,
+        slower_than_ms: Optional[float] = None,
+        actions: Optional[Iterable[str]] = None,
+        memory: bool = False
+    ):
+        """
+        Arm (or disarm) profiling.
+
+        Args:
+            next_requests: Profile the next N matching requests unconditionally
+            slower_than_ms: Also profile every matching request, keeping those at least this slow
+            actions: Actions eligible for profiling (None = all)
+            memory: Also trace allocations with tracemalloc
+        """
+        with self._lock:
+            self.remaining = max(0, int(next_requests))
+            self.slower_than_ms = slower_than_ms
+            self.actions = set(actions) if actions else None
+            self.memory = bool(memory)
+
+    def state(self) -> Dict:
+        with self._lock:
+            return {
+                "next_requests": self.remaining,
+                "slower_than_ms": self.slower_than_ms,
+                "actions": sorted(self.actions) if self.actions else None,
+                "memory": self.memory,
+                "slow_log_ms": self.slow_log_ms,
+                "captured": self.captured,
+                "out_dir": str(self.out_dir),
+            }
+
+    def start(self, command: Dict) -> Optional[_Capture]:
+        """Begin profiling `command` if profiling is armed for it; returns the capture or None."""
+        action = command.get("action")
+        with self._lock:
+            if self.remaining <= 0 and self.slower_than_ms is None:
+                return None
+            if self.actions is not None and action not in self.actions:
+                return None
+            if self._busy:
+                return None
+            self._busy = True
+            forced = self.remaining > 0
+            if forced:
+                self.remaining -= 1
+
+        capture = _Capture(forced)
+        try:
+            if self.memory:
+                import tracemalloc
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start(self.MEMORY_FRAMES)
+                    capture.started_tracing = True
+                capture.memory_before = tracemalloc.take_snapshot()
+            import cProfile
+            capture.profile = cProfile.Profile()
+            capture.profile.enable()
+        except Exception as e:
+            # e.g. another profiler or debugger is already attached
+            print(f"[RimTalk ChromaDB] Could not start profiler: {e}", file=sys.stderr, flush=True)
+            self._release(capture)
+            return None
+        return capture
+
+    def finish(self, capture: Optional[_Capture], command: Dict, seconds: float, stages: Dict[str, float]):
+        """Stop profiling, keep the profile if it qualifies and log the request if it was slow."""
+        elapsed_ms = seconds * 1000.0
+        profile_path = None
+        if capture is not None:
+            try:
+                capture.profile.disable()
+                memory_after = None
+                if capture.memory_before is not None:
+                    import tracemalloc
+                    memory_after = tracemalloc.take_snapshot()
+                keep = capture.forced or (self.slower_than_ms is not None and elapsed_ms >= self.slower_than_ms)
+                if keep:
+                    profile_path = self._dump(capture, memory_after, command, elapsed_ms)
+            except Exception as e:
+                print(f"[RimTalk ChromaDB] Could not write profile: {e}", file=sys.stderr, flush=True)
+            finally:
+                self._release(capture)
+
+        if self.slow_log_ms is not None and elapsed_ms >= self.slow_log_ms:
+            self._log_slow(command, elapsed_ms, stages, profile_path)
+
+    def _release(self, capture: _Capture):
+        if capture.started_tracing:
+            import tracemalloc
+            tracemalloc.stop()
+        with self._lock:
+            self._busy = False
+
+    def _save_dir(self, command: Dict) -> Path:
+        save_dir = self.out_dir / _safe_name(str(command.get("save_id") or "_global"))
+        save_dir.mkdir(parents=True, exist_ok=True)
+        return save_dir
+
+    def _dump(self, capture: _Capture, memory_after, command: Dict, elapsed_ms: float) -> str:
+        import pstats
+
+        action = _safe_name(str(command.get("action")))
+        stem = f"{time.strftime('%Y%m%d-%H%M%S')}_{action}_n{request_size(command)}_{int(elapsed_ms)}ms"
+        base = self._save_dir(command) / stem
+
+        capture.profile.dump_stats(str(base.with_suffix(".prof")))
+        summary = io.StringIO()
+        stats = pstats.Stats(capture.profile, stream=summary)
+        stats.sort_stats("cumulative").print_stats(self.TOP_FUNCTIONS)
+        with open(base.with_suffix(".txt"), "w", encoding="utf-8") as f:
+            f.write(f"action={command.get('action')} save_id={command.get('save_id')} "
+                    f"size={request_size(command)} elapsed_ms={elapsed_ms:.1f}\n\n")
+            f.write(summary.getvalue())
+
+        if memory_after is not None:
+            with open(base.with_suffix(".mem.txt"), "w", encoding="utf-8") as f:
+                for diff in memory_after.compare_to(capture.memory_before, "lineno")[:self.TOP_ALLOCATIONS]:
+                    f.write(f"{diff}\n")
+
+        with self._lock:
+            self.captured += 1
+        return str(base.with_suffix(".prof"))
+
+    def _log_slow(self, command: Dict, elapsed_ms: float, stages: Dict[str, float], profile_path: Optional[str]):
+        record = {
+            "timestamp": time.time(),
+            "action": command.get("action"),
+            "save_id": command.get("save_id"),
+            "id": command.get("id"),
+            "size": request_size(command),
+            "elapsed_ms": elapsed_ms,
+            "stages_ms": {name: seconds * 1000.0 for name, seconds in stages.items()},
+            "profile": profile_path,
+        }
+        try:
+            with open(self._save_dir(command) / "slow_requests.jsonl", "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"[RimTalk ChromaDB] Could not write slow-request log: {e}", file=sys.stderr, flush=True)
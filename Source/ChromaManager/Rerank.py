@@ -0,0 +1,156 @@
+"""
+Fusion and diversity reranking of the hits of a multi-query search.
+A query_context request runs every LLM-generated query against the
+background and conversation indexes; the hits (with their embeddings) are
+gathered into one candidate pool, fused across queries on NumPy arrays
+(best relevance, or reciprocal-rank fusion) and then picked by maximal
+marginal relevance, so near-duplicate lines do not crowd the result.
+"""
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+FUSION_METHODS = ("max", "rrf")
+# Rank offset of reciprocal-rank fusion (score = sum over queries of 1 / (k + rank))
+RRF_K = 60
+
+
+class CandidatePool:
+    """
+    Hits of one request, flattened across queries and searches.
+
+    Hits are keyed by entry: the "_short" title row of a background entry
+    and its full row count as the same entry, and an entry found by several
+    queries or searches is one candidate whose relevance per query is the
+    best of its hits.
+    """
+
+    def __init__(self, n_queries: int):
+        self.n_queries = n_queries
+        self.keys: List[str] = []
+        self.documents: List[str] = []
+        self.metadatas: List[Dict] = []
+        self._queries: List[np.ndarray] = []
+        self._relevances: List[np.ndarray] = []
+        self._embeddings: List[np.ndarray] = []
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def add(self, results: Dict[str, List[List]], factors: Optional[List[np.ndarray]] = None):
+        """
+        Add a Chroma-style query result (one list per query, with embeddings).
+
+        Args:
+            results: ids, documents, metadatas, distances (squared L2) and embeddings
+            factors: Optional per-query multipliers of each hit's relevance
+        """
+        for i, ids in enumerate(results["ids"]):
+            if not ids:
+                continue
+            # Normalize distance (L2 norm) to relevance score (1.0 - distance/2.0)
+            relevance = 1.0 - np.asarray(results["distances"][i], dtype=np.float64) / 2.0
+            if factors is not None:
+                relevance = relevance * factors[i]
+            self.keys.extend(doc_id.replace("_short", "") for doc_id in ids)
+            self.documents.extend(results["documents"][i])
+            self.metadatas.extend(results["metadatas"][i])
+            self._queries.append(np.full(len(ids), i, dtype=np.int64))
+            self._relevances.append(relevance)
+            self._embeddings.append(np.asarray(results["embeddings"][i], dtype=np.float32))
+
+    def select(
+        self,
+        n: int,
+        fusion: str = "max",
+        mmr_lambda: float = 1.0,
+        duplicate_similarity: Optional[float] = None,
+        budget: Optional[float] = None,
+        placed: Sequence[str] = ()
+    ) -> Tuple[List[int], List[float], Dict[str, int]]:
+        """
+        Fuse the hits per entry and pick up to n entries.
+
+        Args:
+            n: Maximum number of entries
+            fusion: "max" ranks entries by their best relevance over all queries,
+                "rrf" by reciprocal-rank fusion of their per-query ranks
+            mmr_lambda: Weight of relevance against novelty (1 = relevance only)
+            duplicate_similarity: Entries at least this similar to a picked entry
+                are dropped (None keeps them)
+            budget: Seconds the selection may take; when spent, the remaining
+                places are filled in fused order
+            placed: Keys of entries already placed ahead of the pick; they are not
+                picked again and count as picked for novelty and duplicates
+
+        Returns:
+            (hit index of each picked entry, its relevance, counters), in pick order
+        """
+        if fusion not in FUSION_METHODS:
+            raise ValueError(f"Unknown fusion method {fusion!r} (expected one of {FUSION_METHODS})")
+        stats = {"candidates": 0, "duplicates": 0, "budget_exceeded": 0}
+        if not self.keys or n <= 0:
+            return [], [], stats
+        deadline = None if budget is None else time.perf_counter() + budget
+
+        # Candidate per entry; its best hit supplies the text and embedding
+        queries = np.concatenate(self._queries)
+        relevances = np.concatenate(self._relevances)
+        keys, inverse = np.unique(np.asarray(self.keys, dtype=object), return_inverse=True)
+        inverse = inverse.reshape(-1)
+        order = np.lexsort((-relevances, inverse))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = inverse[order][1:] != inverse[order][:-1]
+        best_hit = order[first]
+        stats["candidates"] = len(keys)
+
+        per_query = np.full((self.n_queries, len(keys)), -np.inf)
+        np.maximum.at(per_query, (queries, inverse), relevances)
+        relevance = per_query.max(axis=0)
+        if fusion == "rrf":
+            found = np.isfinite(per_query)
+            ranks = np.argsort(np.argsort(-per_query, axis=1, kind="stable"), axis=1)
+            score = np.where(found, 1.0 / (RRF_K + ranks + 1), 0.0).sum(axis=0)
+            # Onto the relevance scale, so it weighs evenly against similarity
+            score = score / score.max() * relevance.max()
+        else:
+            score = relevance
+
+        embeddings = np.concatenate(self._embeddings)[best_hit]
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.maximum(norms, 1e-12)
+        similarity = embeddings @ embeddings.T
+
+        picked: List[int] = []
+        available = np.ones(len(keys), dtype=bool)
+        closest = np.full(len(keys), -np.inf)
+        ahead = np.flatnonzero(np.isin(keys, np.asarray(list(placed), dtype=object)))
+        if len(ahead):
+            available[ahead] = False
+            closest = similarity[ahead].max(axis=0)
+            if duplicate_similarity is not None:
+                duplicates = available & (closest >= duplicate_similarity)
+                stats["duplicates"] += int(np.count_nonzero(duplicates))
+                available &= ~duplicates
+        while len(picked) < n and available.any():
+            if deadline is not None and time.perf_counter() > deadline:
+                stats["budget_exceeded"] = 1
+                rest = np.flatnonzero(available)
+                picked.extend(rest[np.argsort(-score[rest], kind="stable")][:n - len(picked)].tolist())
+                break
+            if picked or len(ahead):
+                mmr = mmr_lambda * score - (1.0 - mmr_lambda) * closest
+            else:
+                mmr = score.copy()
+            mmr[~available] = -np.inf
+            choice = int(np.argmax(mmr))
+            picked.append(choice)
+            available[choice] = False
+            closest = np.maximum(closest, similarity[choice])
+            if duplicate_similarity is not None:
+                duplicates = available & (similarity[choice] >= duplicate_similarity)
+                stats["duplicates"] += int(np.count_nonzero(duplicates))
+                available &= ~duplicates
+
+        return best_hit[picked].tolist(), relevance[picked].tolist(), stats
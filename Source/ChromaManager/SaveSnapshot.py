@@ -0,0 +1,155 @@
+"""
+Snapshot files of a RimTalk save's memory, including stored embeddings.
+A snapshot is a zip archive holding the rows in chunks, each chunk as one
+JSON member with the columns (ids, documents, metadatas) and one .npy
+member with the float32 embedding matrix, plus a manifest.json describing
+the save (embedding model, sequence counter, collection metadata). Zip
+CRCs detect corrupted members when the chunks are read back.
+"""
+import io
+import json
+import os
+import time
+import zipfile
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+SNAPSHOT_FORMAT = "rimtalk-save-snapshot"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_SUFFIX = ".rtsnap"
+
+
+class SnapshotWriter:
+    """
+    Writes a snapshot chunk by chunk, so only one chunk is held in memory.
+
+    The archive is written to a temporary file and moved into place by
+    close(), so an interrupted export never leaves a truncated snapshot
+    under the final name.
+    """
+
+    def __init__(self, path: Path):
+        """
+        Args:
+            path: Snapshot file to create (replaced if it exists)
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp_path = self.path.with_name(self.path.name + ".tmp")
+        self._zip = zipfile.ZipFile(self._tmp_path, "w", allowZip64=True)
+        self.chunks: List[Dict] = []
+        self.count = 0
+        self.dim: Optional[int] = None
+
+    def add_chunk(self, ids: List[str], documents: List[str], metadatas: List[Dict], embeddings: np.ndarray):
+        """Append one chunk of rows (all columns in the same order)."""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if len(ids) != len(documents) or len(ids) != len(metadatas) or len(ids) != len(embeddings):
+            raise ValueError("Snapshot chunk columns have different lengths")
+        if self.dim is None:
+            self.dim = int(embeddings.shape[1])
+        elif embeddings.shape[1] != self.dim:
+            raise ValueError(f"Snapshot chunk has {embeddings.shape[1]}-dimensional embeddings, expected {self.dim}")
+
+        name = f"chunk-{len(self.chunks):05d}"
+        columns = {"ids": ids, "documents": documents, "metadatas": metadatas}
+        self._zip.writestr(
+            f"{name}.json",
+            json.dumps(columns, ensure_ascii=False, separators=(",", ":")),
+            compress_type=zipfile.ZIP_DEFLATED
+        )
+        matrix = io.BytesIO()
+        np.save(matrix, embeddings, allow_pickle=False)
+        # Float matrices barely compress, so they are stored as-is
+        self._zip.writestr(f"{name}.npy", matrix.getvalue(), compress_type=zipfile.ZIP_STORED)
+
+        self.chunks.append({"name": name, "count": len(ids)})
+        self.count += len(ids)
+
+    def close(self, manifest: Dict) -> Dict:
+        """
+        Write the manifest and move the snapshot into place.
+
+        Args:
+            manifest: Save description (merged with format, counts and chunk list)
+
+        Returns:
+            The manifest as written
+        """
+        manifest = dict(manifest)
+        manifest.update({
+            "format": SNAPSHOT_FORMAT,
+            "version": SNAPSHOT_VERSION,
+            "created": time.time(),
+            "count": self.count,
+            "dim": self.dim,
+            "chunks": self.chunks,
+        })
+        self._zip.writestr("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2),
+                           compress_type=zipfile.ZIP_DEFLATED)
+        self._zip.close()
+        os.replace(self._tmp_path, self.path)
+        return manifest
+
+    def abort(self):
+        """Discard a partially written snapshot."""
+        try:
+            self._zip.close()
+        finally:
+            try:
+                os.remove(self._tmp_path)
+            except OSError:
+                pass
+
+
+class SnapshotReader:
+    """Reads a snapshot's manifest and iterates over its chunks."""
+
+    def __init__(self, path: Path):
+        """
+        Args:
+            path: Snapshot file to read
+
+        Raises:
+            ValueError: If the file is not a snapshot of a supported version
+        """
+        self.path = Path(path)
+        try:
+            self._zip = zipfile.ZipFile(self.path, "r")
+            self.manifest = json.loads(self._zip.read("manifest.json").decode("utf-8"))
+        except (zipfile.BadZipFile, KeyError, ValueError) as e:
+            raise ValueError(f"{self.path} is not a save snapshot: {e}")
+        if self.manifest.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"{self.path} is not a save snapshot")
+        if self.manifest.get("version", 0) > SNAPSHOT_VERSION:
+            raise ValueError(f"Snapshot version {self.manifest.get('version')} is newer than supported ({SNAPSHOT_VERSION})")
+
+    @property
+    def count(self) -> int:
+        return int(self.manifest.get("count", 0))
+
+    def chunks(self) -> Iterator[Tuple[List[str], List[str], List[Dict], np.ndarray]]:
+        """Yield (ids, documents, metadatas, embeddings) per chunk, checking each against the manifest."""
+        dim = self.manifest.get("dim")
+        for chunk in self.manifest.get("chunks", []):
+            name = chunk["name"]
+            columns = json.loads(self._zip.read(f"{name}.json").decode("utf-8"))
+            embeddings = np.load(io.BytesIO(self._zip.read(f"{name}.npy")), allow_pickle=False)
+            ids = columns["ids"]
+            if len(ids) != chunk["count"] or len(embeddings) != chunk["count"] \
+                    or len(columns["documents"]) != chunk["count"] or len(columns["metadatas"]) != chunk["count"]:
+                raise ValueError(f"Snapshot chunk {name} does not hold {chunk['count']} rows")
+            if dim is not None and embeddings.shape[1] != dim:
+                raise ValueError(f"Snapshot chunk {name} has {embeddings.shape[1]}-dimensional embeddings, expected {dim}")
+            yield ids, columns["documents"], columns["metadatas"], embeddings
+
+    def close(self):
+        self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
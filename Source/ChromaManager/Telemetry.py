@@ -0,0 +1,230 @@
+"""
+Latency and resource telemetry for RimTalk ChromaDB.
+Stages (embed, search, post_filter, write, evict, ...) and CLI actions record
+their durations into rolling histograms; counters track processed items.
+Everything is kept in memory and reported by the CLI "stats" action, and can
+optionally be appended to a snapshot file at a fixed interval.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+
+def current_rss_bytes() -> Optional[int]:
+    """Resident set size of this process, or None if it cannot be determined."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    if os.name == "nt":
+        try:
+            import ctypes
+            from ctypes import wintypes
+
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [
+                    ("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                    ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t),
+                ]
+
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            handle = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+                return int(counters.WorkingSetSize)
+        except (OSError, AttributeError):
+            pass
+    return None
+
+
+class RollingHistogram:
+    """Latency distribution over the last `window` samples, plus lifetime count and total."""
+
+    def __init__(self, window: int = 1024):
+        self._samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds: float):
+        self._samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def summary(self) -> Dict:
+        ordered = sorted(self._samples)
+        if not ordered:
+            return {"count": self.count}
+
+        def pct(p):
+            return ordered[min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))] * 1000.0
+
+        return {
+            "count": self.count,
+            "total_ms": self.total * 1000.0,
+            "p50_ms": pct(50),
+            "p95_ms": pct(95),
+            "p99_ms": pct(99),
+            "max_ms": ordered[-1] * 1000.0,
+        }
+
+
+class Telemetry:
+    """
+    Process-wide collector of stage/action timings and counters.
+
+    stage() also adds its duration to the breakdown of the request running on
+    the current thread (see begin_request()/end_request()), so a slow request
+    can be reported with the time spent in each stage. When disabled, stage()
+    is a shared no-op context and record()/incr() return immediately.
+    """
+
+    def __init__(self, window: int = 1024, enabled: bool = True):
+        """
+        Args:
+            window: Samples kept per histogram
+            enabled: Whether anything is recorded
+        """
+        self.enabled = enabled
+        self.window = window
+        self._lock = threading.Lock()
+        self._stages: Dict[str, RollingHistogram] = {}
+        self._actions: Dict[str, RollingHistogram] = {}
+        self._counters: Dict[str, int] = {}
+        self._local = threading.local()
+        self._started = time.time()
+        self._snapshot_thread: Optional[threading.Thread] = None
+        self._snapshot_stop = threading.Event()
+
+    # --- recording -------------------------------------------------------
+
+    @contextmanager
+    def _timed_stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    @contextmanager
+    def _disabled_stage(self):
+        yield
+
+    def stage(self, name: str):
+        """Context manager timing one internal stage."""
+        if not self.enabled:
+            return self._disabled_stage()
+        return self._timed_stage(name)
+
+    def record(self, name: str, seconds: float):
+        """Add a stage duration measured elsewhere."""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._stages.get(name)
+            if histogram is None:
+                histogram = self._stages[name] = RollingHistogram(self.window)
+            histogram.add(seconds)
+        breakdown = getattr(self._local, "breakdown", None)
+        if breakdown is not None:
+            breakdown[name] = breakdown.get(name, 0.0) + seconds
+
+    def record_action(self, action: str, seconds: float):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._actions.get(action)
+            if histogram is None:
+                histogram = self._actions[action] = RollingHistogram(self.window)
+            histogram.add(seconds)
+
+    def incr(self, name: str, amount: int = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def begin_request(self):
+        """Start collecting the stage breakdown of the request on this thread."""
+        self._local.breakdown = {}
+
+    def end_request(self) -> Dict[str, float]:
+        """Stop collecting and return {stage: seconds} for the request on this thread."""
+        breakdown = getattr(self._local, "breakdown", None) or {}
+        self._local.breakdown = None
+        return breakdown
+
+    # --- reporting -------------------------------------------------------
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            stages = {name: h.summary() for name, h in self._stages.items()}
+            actions = {name: h.summary() for name, h in self._actions.items()}
+            counters = dict(self._counters)
+        return {
+            "enabled": self.enabled,
+            "timestamp": time.time(),
+            "uptime_seconds": time.time() - self._started,
+            "rss_bytes": current_rss_bytes(),
+            "actions": actions,
+            "stages": stages,
+            "counters": counters,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._actions.clear()
+            self._counters.clear()
+
+    def start_snapshots(self, path: str, interval: float = 60.0, extra: Optional[Callable[[], Dict]] = None):
+        """
+        Append a JSON snapshot line to `path` every `interval` seconds.
+
+        Args:
+            path: Snapshot file (JSON lines)
+            interval: Seconds between snapshots
+            extra: Optional callable whose dict is merged into each snapshot
+        """
+        if self._snapshot_thread is not None:
+            return
+
+        def run():
+            while not self._snapshot_stop.wait(interval):
+                self.write_snapshot(path, extra)
+
+        self._snapshot_thread = threading.Thread(target=run, name="RimTalkTelemetry", daemon=True)
+        self._snapshot_thread.start()
+
+    def write_snapshot(self, path: str, extra: Optional[Callable[[], Dict]] = None):
+        snapshot = self.snapshot()
+        if extra is not None:
+            try:
+                snapshot.update(extra())
+            except Exception as e:
+                snapshot["extra_error"] = f"{type(e).__name__}: {e}"
+        try:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(snapshot, ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"[RimTalk ChromaDB] Could not write telemetry snapshot to {path}: {e}", file=sys.stderr, flush=True)
+
+    def stop_snapshots(self):
+        self._snapshot_stop.set()
+
+
+# Global collector shared by the manager and the CLI
+telemetry = Telemetry()
@@ -0,0 +1,208 @@
+"""
+In-memory index over the titles of a save's background entries.
+Background entries are "name:definition" pairs; when a query names a thing
+outright ("龙娘毛发"), its entry is found by matching the title against the
+query text instead of relying on the vector search. Exact mentions are found
+with a prefix table (a flattened trie), near-misses (one or two edits) with a
+character-bigram inverted index and a bounded edit-distance check.
+"""
+import threading
+from collections import Counter
+from itertools import chain
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+# Titles shorter than this are never matched (single characters occur everywhere)
+MIN_TITLE_LENGTH = 2
+# Titles shorter than this are only matched exactly
+FUZZY_MIN_LENGTH = 4
+# Fuzzy candidates (by shared bigrams) verified per query text
+FUZZY_CANDIDATES = 32
+
+
+def normalize_title(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+
+def _bigrams(text: str) -> Set[str]:
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def _max_edits(length: int) -> int:
+    return 1 if length < 10 else 2
+
+
+def _substring_distance(pattern: str, text: str) -> Tuple[int, int]:
+    """
+    Fewest edits turning `pattern` into some substring of `text`.
+
+    Returns:
+        (edits, end) of the closest substring
+    """
+    # Sellers' algorithm: a match may start anywhere in the text, so row 0 stays 0
+    previous = list(range(len(pattern) + 1))
+    best, best_end = len(pattern), 0
+    for i, ch in enumerate(text, 1):
+        current = [0]
+        for j, p in enumerate(pattern, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (p != ch)))
+        if current[-1] < best:
+            best, best_end = current[-1], i
+        previous = current
+    return best, best_end
+
+
+class TitleIndex:
+    """
+    Titles of one save's active background entries.
+
+    Entries are keyed by their ID (without the "_short" suffix of the title
+    row); several entries may share a title. Adds and removes are
+    incremental, so a background sync only touches the entries it changed.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Background generation the index reflects (None = not loaded)
+        self.generation: Optional[int] = None
+        self.building = False
+        self._entries: Dict[str, Tuple[str, Dict]] = {}   # key -> (title, entry)
+        self._titles: Dict[str, Set[str]] = {}            # title -> keys
+        self._prefixes: Dict[str, int] = {}               # title prefix -> number of titles
+        self._postings: Dict[str, Set[str]] = {}          # bigram -> titles
+        self.lookups = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+        self._titles.clear()
+        self._prefixes.clear()
+        self._postings.clear()
+
+    def add(self, key: str, title: str, entry: Dict):
+        """Index an entry under its title (entry: the result dict returned on a match)."""
+        title = normalize_title(title)
+        if len(title) < MIN_TITLE_LENGTH:
+            return
+        self.remove(key)
+        self._entries[key] = (title, entry)
+        keys = self._titles.get(title)
+        if keys is not None:
+            keys.add(key)
+            return
+        self._titles[title] = {key}
+        for i in range(1, len(title) + 1):
+            self._prefixes[title[:i]] = self._prefixes.get(title[:i], 0) + 1
+        if len(title) >= FUZZY_MIN_LENGTH:
+            for bigram in _bigrams(title):
+                self._postings.setdefault(bigram, set()).add(title)
+
+    def remove(self, key: str):
+        stored = self._entries.pop(key, None)
+        if stored is None:
+            return
+        title = stored[0]
+        keys = self._titles[title]
+        keys.discard(key)
+        if keys:
+            return
+        del self._titles[title]
+        for i in range(1, len(title) + 1):
+            prefix = title[:i]
+            if self._prefixes[prefix] <= 1:
+                del self._prefixes[prefix]
+            else:
+                self._prefixes[prefix] -= 1
+        if len(title) >= FUZZY_MIN_LENGTH:
+            for bigram in _bigrams(title):
+                titles = self._postings[bigram]
+                titles.discard(title)
+                if not titles:
+                    del self._postings[bigram]
+
+    def _exact(self, text: str) -> List[Tuple[int, int, str]]:
+        """(start, end, title) of every title occurring in text, minus those inside a longer match."""
+        found = []
+        for start in range(len(text)):
+            end = start + 1
+            while end <= len(text) and text[start:end] in self._prefixes:
+                title = text[start:end]
+                if title in self._titles and self._bounded(text, start, end):
+                    found.append((start, end, title))
+                end += 1
+        return [
+            (s, e, t) for s, e, t in found
+            if not any(s2 <= s and e <= e2 and (s2, e2) != (s, e) for s2, e2, _ in found)
+        ]
+
+    @staticmethod
+    def _bounded(text: str, start: int, end: int) -> bool:
+        """Latin titles must match whole words ("ant" is not a mention inside "plant")."""
+        def word(ch):
+            return ch.isascii() and ch.isalnum()
+        if word(text[start]) and start > 0 and word(text[start - 1]):
+            return False
+        if word(text[end - 1]) and end < len(text) and word(text[end]):
+            return False
+        return True
+
+    def _fuzzy(self, text: str, spans: Sequence[Tuple[int, int, str]]) -> List[Tuple[float, str]]:
+        """(score, title) of titles within a few edits of a part of text not covered by an exact span."""
+        shared = Counter(chain.from_iterable(self._postings.get(bigram, ()) for bigram in _bigrams(text)))
+        # A title within k edits of a substring still shares len - 1 - 2k of its bigrams
+        candidates = [
+            (count, title) for title, count in shared.items()
+            if count >= max(1, len(title) - 1 - 2 * _max_edits(len(title))) and title not in text
+        ]
+        candidates.sort(key=lambda c: (-c[0], -len(c[1])))
+        found = []
+        for _, title in candidates[:FUZZY_CANDIDATES]:
+            distance, end = _substring_distance(title, text)
+            if distance > _max_edits(len(title)):
+                continue
+            # A variant of a title that is mentioned exactly ("龙娘毛皮" in "龙娘毛发") is no
+            # mention: skip it when its closest substring (at least len - distance
+            # characters, ending at `end`) fits inside an exact span
+            latest_start = end - (len(title) - distance)
+            if any(s <= latest_start and end <= e for s, e, _ in spans):
+                continue
+            found.append((1.0 - distance / len(title), title))
+        return found
+
+    def match(self, query_texts: Sequence[str], fuzzy: bool = True) -> List[Tuple[str, Dict]]:
+        """
+        Entries whose title is mentioned in the query texts.
+
+        Exact mentions come first (longer titles first) with relevance 1.0,
+        then near-misses that are not just variants of an exact mention, with
+        relevance 1 - edits / title length.
+
+        Returns:
+            (key, copy of the indexed entry dict with its "relevance") per entry
+        """
+        self.lookups += 1
+        scored: Dict[str, float] = {}
+        for text in query_texts:
+            text = normalize_title(text or "")
+            spans = self._exact(text)
+            for _, _, title in spans:
+                for key in self._titles[title]:
+                    scored[key] = 1.0
+            if not fuzzy or not self._postings:
+                continue
+            for score, title in self._fuzzy(text, spans):
+                for key in self._titles[title]:
+                    if score > scored.get(key, 0.0):
+                        scored[key] = score
+
+        ranked = sorted(scored.items(), key=lambda item: (-item[1], -len(self._entries[item[0]][0]), item[0]))
+        return [(key, dict(self._entries[key][1], relevance=score)) for key, score in ranked]
+
+    def stats(self) -> Dict:
+        return {
+            "entries": len(self._entries),
+            "titles": len(self._titles),
+            "generation": self.generation,
+            "lookups": self.lookups,
+        }
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Embedding backend benchmark on the bundled data.txt corpus.
+
+Each backend runs in its own interpreter, so load time and peak RSS are not
+polluted by the others. Per backend it reports:
+- load time and peak RSS after loading and after encoding the corpus
+- single-query encode latency (p50/p95) and corpus throughput in batches
+- retrieval recall: every line of data.txt is "title:description"; the title
+  is used as query and recall@k counts how often its own line is in the top k
+- agreement@k with the reference backend (overlap of the top-k lists)
+
+Backends whose dependencies are missing are reported with their error.
+Results are printed as JSON.
+
+Usage:
+    python bench_backends.py [--backends torch onnx int8 hash] [--reference torch]
+                             [--limit 1000] [--k 10] [--output backends.json]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+CHROMA_DIR = Path(__file__).resolve().parent.parent
+DATA_PATH = CHROMA_DIR.parent.parent / "data.txt"
+sys.path.insert(0, str(CHROMA_DIR))
+
+
+def load_corpus(limit):
+    titles, documents = [], []
+    with open(DATA_PATH, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            title, sep, _ = line.replace("：", ":").partition(":")
+            if not sep or not title:
+                continue
+            titles.append(title)
+            documents.append(line)
+            if limit and len(documents) >= limit:
+                break
+    return titles, documents
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def run_worker(name, limit, k, batch_size, latency_queries):
+    """Benchmark one backend in this process and return its result dict."""
+    from EmbeddingBackends import create_backend
+
+    titles, documents = load_corpus(limit)
+    backend = create_backend(name)
+
+    start = time.perf_counter()
+    backend.load()
+    backend.encode(["warm-up"])
+    result = {"backend": name, "model": backend.model_id, "load_seconds": time.perf_counter() - start}
+    result["rss_after_load_mb"] = peak_rss_mb()
+
+    latencies = []
+    for title in titles[:latency_queries]:
+        t = time.perf_counter()
+        backend.encode([title])
+        latencies.append(time.perf_counter() - t)
+    result["query_p50_ms"] = statistics.median(latencies) * 1000.0
+    result["query_p95_ms"] = percentile(latencies, 95) * 1000.0
+
+    start = time.perf_counter()
+    doc_vectors = np.vstack([
+        backend.encode(documents[i:i + batch_size]) for i in range(0, len(documents), batch_size)
+    ])
+    elapsed = time.perf_counter() - start
+    result["corpus_texts_per_s"] = len(documents) / elapsed
+    result["rss_peak_mb"] = peak_rss_mb()
+    result["dim"] = int(doc_vectors.shape[1])
+
+    query_vectors = np.vstack([
+        backend.encode(titles[i:i + batch_size]) for i in range(0, len(titles), batch_size)
+    ])
+    scores = query_vectors @ doc_vectors.T
+    top = np.argsort(-scores, axis=1)[:, :k]
+    own = np.arange(len(titles))[:, None]
+    result["recall@1"] = float(np.mean(top[:, 0] == own[:, 0]))
+    result[f"recall@{k}"] = float(np.mean(np.any(top == own, axis=1)))
+    result["top_k"] = top.tolist()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding backend benchmark")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "int8", "hash"])
+    parser.add_argument("--reference", default="torch", help="Backend the others are compared against")
+    parser.add_argument("--limit", type=int, default=1000, help="Corpus lines to use (0 = all)")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--latency-queries", type=int, default=50)
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--output", type=str, default=None)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.limit, args.k, args.batch_size, args.latency_queries)))
+        return
+
+    results = {}
+    for name in args.backends:
+        proc = subprocess.run(
+            [sys.executable, __file__, "--worker", name, "--limit", str(args.limit), "--k", str(args.k),
+             "--batch-size", str(args.batch_size), "--latency-queries", str(args.latency_queries)],
+            capture_output=True, text=True, encoding="utf-8"
+        )
+        lines = [line for line in proc.stdout.splitlines() if line.startswith("{")]
+        if proc.returncode != 0 or not lines:
+            error = proc.stderr.strip().splitlines()
+            results[name] = {"backend": name, "error": error[-1] if error else f"exit code {proc.returncode}"}
+            continue
+        results[name] = json.loads(lines[-1])
+
+    reference = results.get(args.reference, {}).get("top_k")
+    for result in results.values():
+        top_k = result.pop("top_k", None)
+        if reference is not None and top_k is not None:
+            overlaps = [len(set(a) & set(b)) / len(a) for a, b in zip(top_k, reference)]
+            result[f"agreement@{args.k}"] = float(np.mean(overlaps))
+
+    output = {"corpus": str(DATA_PATH), "limit": args.limit, "reference": args.reference,
+              "backends": list(results.values())}
+    text = json.dumps(output, indent=2, ensure_ascii=False)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
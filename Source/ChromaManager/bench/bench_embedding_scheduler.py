@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark for cross-request embedding micro-batching.
+
+Simulates concurrent query_context callers, each embedding a few short texts,
+and compares:
+- direct: every caller invokes the encoder itself, serialized by a lock
+  (the behaviour before the scheduler)
+- scheduler: callers go through EmbeddingScheduler with a given max_wait
+
+By default the encoder is a synthetic CPU model whose cost grows with the
+padded token count of the batch plus a fixed per-call overhead, which is the
+shape that makes batching pay off. Pass --real-model to use BAAI/bge-m3.
+
+Results (throughput, p50/p95 latency per configuration) are printed as JSON.
+
+Usage:
+    python bench_embedding_scheduler.py [--requests 400] [--concurrency 1 4 16]
+                                        [--max-wait-ms 0 2 5 10] [--output scheduler.json]
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+CHROMA_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(CHROMA_DIR))
+
+from EmbeddingScheduler import EmbeddingScheduler  # noqa: E402
+
+
+class SyntheticEncoder:
+    """CPU encoder whose cost is a per-call overhead plus work on the padded batch."""
+
+    def __init__(self, dim=1024, hidden=256, call_overhead=0.004):
+        rng = np.random.default_rng(0)
+        self.dim = dim
+        self.call_overhead = call_overhead
+        self.w1 = rng.standard_normal((hidden, hidden)).astype(np.float32)
+        self.w2 = rng.standard_normal((hidden, dim)).astype(np.float32)
+
+    def encode(self, texts):
+        time.sleep(self.call_overhead)
+        padded = max(len(t) for t in texts)
+        x = np.ones((len(texts), padded, self.w1.shape[0]), dtype=np.float32)
+        for i, t in enumerate(texts):
+            x[i, len(t):] = 0.0
+        h = np.tanh(x @ self.w1).mean(axis=1)
+        out = h @ self.w2
+        return out / np.linalg.norm(out, axis=1, keepdims=True)
+
+
+def make_workload(count, seed=0):
+    rng = random.Random(seed)
+    alphabet = "殖民者袭击猎物药草研究医疗交易商队天气寒冷"
+    return [
+        ["".join(rng.choice(alphabet) for _ in range(rng.randint(8, 120))) for _ in range(rng.randint(1, 4))]
+        for _ in range(count)
+    ]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def run(workload, concurrency, encode):
+    """Run the workload on `concurrency` threads; return wall time and per-request latencies."""
+    latencies = []
+    lock = threading.Lock()
+    cursor = iter(range(len(workload)))
+
+    def worker():
+        while True:
+            with lock:
+                i = next(cursor, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            encode(workload[i])
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start, latencies
+
+
+def summarize(wall, latencies):
+    return {
+        "requests_per_s": len(latencies) / wall,
+        "p50_ms": statistics.median(latencies) * 1000.0,
+        "p95_ms": percentile(latencies, 95) * 1000.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding micro-batching benchmark")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--max-wait-ms", type=float, nargs="+", default=[0.0, 2.0, 5.0, 10.0])
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--real-model", action="store_true", help="Use the real embedding model")
+    parser.add_argument("--output", type=str, default=None)
+    args = parser.parse_args()
+
+    if args.real_model:
+        import ChromaManager
+        encode_fn = ChromaManager.get_embedding_model().encode
+    else:
+        encode_fn = SyntheticEncoder().encode
+
+    workload = make_workload(args.requests)
+    encode_fn(workload[0])  # warm up
+
+    results = {"encoder": "bge-m3" if args.real_model else "synthetic", "runs": []}
+    for concurrency in args.concurrency:
+        direct_lock = threading.Lock()
+
+        def direct(texts):
+            with direct_lock:
+                return encode_fn(texts)
+
+        wall, latencies = run(workload, concurrency, direct)
+        results["runs"].append({"mode": "direct", "concurrency": concurrency, **summarize(wall, latencies)})
+
+        for max_wait_ms in args.max_wait_ms:
+            scheduler = EmbeddingScheduler(encode_fn, args.max_batch, max_wait_ms / 1000.0)
+            try:
+                wall, latencies = run(workload, concurrency, scheduler.encode)
+                stats = scheduler.stats()
+            finally:
+                scheduler.close()
+            results["runs"].append({
+                "mode": "scheduler",
+                "concurrency": concurrency,
+                "max_wait_ms": max_wait_ms,
+                **summarize(wall, latencies),
+                "avg_requests_per_batch": stats["avg_requests_per_batch"],
+            })
+
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
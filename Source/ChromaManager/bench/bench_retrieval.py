@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Retrieval benchmark for ChromaDBManager at realistic scales.
+
+For every scale (total entries in the save), a fresh save is filled with
+synthetic RimWorld dialogue plus data.txt-style background entries (10%),
+then the latency of each operation is sampled:
+- add_conversation (synchronous ingestion)
+- query_relevant_context without filters, with a speaker filter and with a listener filter,
+  restricted to the last few game days, and ranked by recency (each with the
+  mean number of entries and characters returned, i.e. the prompt it feeds),
+  and with queries naming background things (matched by title)
+- update_background (a differential resync with 10% of the entries replaced)
+- _enforce_entry_limit (and, when it triggers, the time until the eviction finished)
+- query_all_entry
+
+Embeddings come from the deterministic "hash" backend by default, so the
+benchmark runs offline and measures the storage/retrieval path rather than
+the model. Results (p50/p95/p99 in milliseconds per operation and scale)
+are printed as JSON together with the git commit, so runs of different
+commits can be compared.
+
+Usage:
+    python bench_retrieval.py [--scales 1000 10000 100000 200000] [--samples 200]
+                              [--backend hash] [--entry-limit N] [--hot-tier N] [--no-rerank]
+                              [--output retrieval.json]
+"""
+import argparse
+import json
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+CHROMA_DIR = Path(__file__).resolve().parent.parent
+DATA_PATH = CHROMA_DIR.parent.parent / "data.txt"
+sys.path.insert(0, str(CHROMA_DIR))
+
+import ChromaManager  # noqa: E402
+
+PAWNS = ["Alice", "Bob", "Cassandra", "Dmitri", "Engie", "Faye", "Grim", "Hana", "Ivo", "Jade",
+         "Kael", "Lin", "Mira", "Nox", "Oskar", "Pia"]
+TOPICS = ["猎物", "袭击", "药草", "研究", "商队", "寒潮", "食物", "婚礼", "伤口", "机械族", "龙娘", "白银"]
+TEMPLATES = [
+    "{a}对{b}说：今天的{t}真让人担心。",
+    "{a}抱怨{t}太少了，{b}点头表示同意。",
+    "{a}和{b}聊起了昨天的{t}，两人都笑了。",
+    "{a}问{b}有没有看到{t}，{b}说在北边。",
+    "{a}提醒{b}注意{t}，殖民地需要提前准备。",
+]
+DATE = "5th of Septober, year 5500"
+FILL_BATCH = 1000
+# Game ticks between consecutive synthetic turns (one in-game hour)
+TURN_TICKS = 2500
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=CHROMA_DIR, capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))] * 1000.0
+
+    return {
+        "n": len(samples),
+        "p50_ms": pct(50),
+        "p95_ms": pct(95),
+        "p99_ms": pct(99),
+        "mean_ms": statistics.mean(samples) * 1000.0,
+    }
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    fn(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def make_turn(rng):
+    """A conversation turn: talk responses, listeners."""
+    involved = rng.sample(PAWNS, rng.randint(2, 4))
+    responses = []
+    for _ in range(rng.randint(1, 3)):
+        a, b = rng.sample(involved, 2)
+        text = rng.choice(TEMPLATES).format(a=a, b=b, t=rng.choice(TOPICS)) + f"（{rng.randint(0, 10 ** 6)}）"
+        responses.append({"name": a, "text": text, "talk_type": "dialogue"})
+    return responses, involved
+
+
+def background_entries(count, variant=0):
+    """`count` "name:definition" lines from data.txt, suffixed to be unique beyond its size."""
+    with open(DATA_PATH, "r", encoding="utf-8") as f:
+        lines = [line.strip() for line in f if ":" in line]
+    entries = []
+    for i in range(count):
+        name, _, definition = lines[i % len(lines)].partition(":")
+        round_no = i // len(lines)
+        suffix = f"#{round_no}" if round_no else ""
+        entries.append(f"{name}{suffix}:{definition}" + (f" v{variant}" if i % 10 == 0 and variant else ""))
+    return entries
+
+
+def fill(manager, save_id, scale, rng):
+    """Fill a save with `scale` entries: 10% background, the rest dialogue, bulk-inserted."""
+    background = background_entries(max(1, scale // 10))
+    manager.sync_background(save_id, background, DATE)
+
+    remaining = scale - len(background)
+    tick = 0
+    while remaining > 0:
+        ids, documents, metadatas = [], [], []
+        while len(ids) < min(FILL_BATCH, remaining):
+            responses, listeners = make_turn(rng)
+            responses = responses[:min(FILL_BATCH, remaining) - len(ids)]
+            tick += TURN_TICKS
+            turn = manager._build_conversation_records(save_id, responses, listeners, DATE, tick)
+            ids += turn[0]
+            documents += turn[1]
+            metadatas += turn[2]
+        manager._commit_records(save_id, ids, documents, metadatas)
+        remaining -= len(ids)
+    return background
+
+
+def bench_scale(scale, args, rng):
+    workdir = tempfile.mkdtemp(prefix="rimtalk_bench_")
+    try:
+        manager = ChromaManager.ChromaDBManager(workdir)
+        manager.configure_ingestion(False)
+        manager.configure_pool(max_open_saves=0, idle_timeout=0)
+        # Measure retrieval, not the result cache
+        manager.query_cache.capacity = 0
+        if args.hot_tier is not None:
+            manager.configure_hot_tier(args.hot_tier)
+        if args.no_rerank:
+            manager.configure_rerank(mmr_lambda=1.0, duplicate_similarity=None)
+        save_id = "bench"
+
+        # Keep eviction out of the way until it is measured on purpose
+        entry_limit = args.entry_limit or manager.ENTRY_LIMIT
+        manager.ENTRY_LIMIT = 10 ** 9
+
+        start = time.perf_counter()
+        background = fill(manager, save_id, scale, rng)
+        result = {"scale": scale, "fill_seconds": time.perf_counter() - start}
+
+        samples = []
+        for _ in range(args.samples):
+            responses, listeners = make_turn(rng)
+            samples.append(timed(
+                manager.add_conversation, save_id, responses, [r["name"] for r in responses],
+                listeners, DATE, "dialogue"
+            ))
+        result["add_conversation"] = summarize(samples)
+
+        for label, filters in (
+            ("query_context", lambda: {}),
+            ("query_context_speakers", lambda: {"speakers": rng.sample(PAWNS, 2)}),
+            ("query_context_listeners", lambda: {"listeners": rng.sample(PAWNS, 2)}),
+            ("query_context_recent_days", lambda: {"recent_days": 3}),
+            ("query_context_recency", lambda: {"recent_days": 30, "recency_half_life_days": 5}),
+        ):
+            samples, entries, chars = [], [], []
+            for i in range(args.samples):
+                queries = [f"{rng.choice(PAWNS)}{rng.choice(TOPICS)} {i}", rng.choice(TOPICS)]
+                start = time.perf_counter()
+                found = manager.query_relevant_context(save_id, queries, 5, **filters())
+                samples.append(time.perf_counter() - start)
+                entries.append(len(found))
+                chars.append(sum(len(entry["text"]) for entry in found))
+            result[label] = summarize(samples)
+            result[label]["mean_entries"] = statistics.mean(entries)
+            result[label]["mean_chars"] = statistics.mean(chars)
+
+        # Queries naming background things, matched by title ahead of the vector hits
+        titles = [entry.partition(":")[0] for entry in background]
+        samples = []
+        for _ in range(args.samples):
+            queries = [f"{rng.choice(PAWNS)}想要{rng.choice(titles)}", rng.choice(TOPICS)]
+            samples.append(timed(manager.query_relevant_context, save_id, queries, 5))
+        result["query_context_titles"] = summarize(samples)
+
+        samples = []
+        for i in range(args.background_samples):
+            samples.append(timed(manager.sync_background, save_id, background_entries(len(background), i + 1), DATE))
+        result["update_background"] = summarize(samples)
+
+        samples = []
+        for _ in range(args.full_scan_samples):
+            samples.append(timed(manager.query_all_entry, save_id))
+        result["query_all_entry"] = summarize(samples)
+
+        # Entry limit last: at ENTRY_LIMIT it starts evicting 10% of the save
+        manager.ENTRY_LIMIT = entry_limit
+        triggered = manager._counts.get(save_id, 0) >= entry_limit
+        samples = []
+        for _ in range(args.samples):
+            samples.append(timed(manager._enforce_entry_limit, save_id))
+        result["enforce_entry_limit"] = summarize(samples)
+        result["eviction_triggered"] = triggered
+        if triggered:
+            start = time.perf_counter()
+            while save_id in manager._evicting:
+                time.sleep(0.01)
+            result["eviction_seconds"] = time.perf_counter() - start
+
+        manager.shutdown()
+        manager.close_save(save_id)
+        return result
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ChromaDBManager retrieval benchmark")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1000, 10000, 100000, 200000])
+    parser.add_argument("--samples", type=int, default=200, help="Samples per add/query/limit operation")
+    parser.add_argument("--background-samples", type=int, default=5)
+    parser.add_argument("--full-scan-samples", type=int, default=3)
+    parser.add_argument("--entry-limit", type=int, default=None, help="Override ENTRY_LIMIT for the eviction step")
+    parser.add_argument("--hot-tier", type=int, default=None,
+                        help="Hot tier size (default: the manager's, 0 disables it)")
+    parser.add_argument("--no-rerank", action="store_true",
+                        help="Rank by relevance only, keeping near-duplicates (the pre-MMR behaviour)")
+    parser.add_argument("--backend", default="hash", help="Embedding backend (default: deterministic hash)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=str, default=None)
+    args = parser.parse_args()
+
+    ChromaManager.configure_embedding_backend(args.backend)
+    rng = random.Random(args.seed)
+
+    results = {
+        "commit": git_commit(),
+        "backend": args.backend,
+        "hot_tier": args.hot_tier,
+        "rerank": not args.no_rerank,
+        "samples": args.samples,
+        "scales": [],
+    }
+    for scale in args.scales:
+        print(f"[bench] scale {scale}...", file=sys.stderr, flush=True)
+        results["scales"].append(bench_scale(scale, args, rng))
+
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
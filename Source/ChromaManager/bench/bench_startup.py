@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Startup benchmark for the ChromaManager CLI.
+
+Measures, per run:
+- import time of the heavy modules (chromadb, numpy, ChromaManager) in a fresh interpreter
+- time from process spawn to the handshake response
+- time until the "status" action reports every component ready
+- time from spawn to the first query_context response (init + query)
+
+Each run uses a fresh temporary database directory. Results are printed as JSON.
+
+Usage:
+    python bench_startup.py [--runs 3] [--output startup.json]
+Environment variables are passed through to the CLI (e.g. RIMTALK_WARMUP_MODEL=0).
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+CHROMA_DIR = Path(__file__).resolve().parent.parent
+CLI_PATH = CHROMA_DIR / "ChromaManager_CLI.py"
+
+
+def measure_imports():
+    """Import each heavy module in a fresh interpreter and time it."""
+    timings = {}
+    for module in ("numpy", "chromadb", "ChromaManager"):
+        code = (
+            "import sys, time; sys.path.insert(0, %r); t = time.perf_counter(); "
+            "import %s; print(time.perf_counter() - t)" % (str(CHROMA_DIR), module)
+        )
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+        timings[module] = float(result.stdout.strip()) if result.returncode == 0 else None
+    return timings
+
+
+class CliProcess:
+    def __init__(self, workdir):
+        self.start = time.perf_counter()
+        self.proc = subprocess.Popen(
+            [sys.executable, str(CLI_PATH)],
+            cwd=workdir,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+        )
+
+    def call(self, command):
+        self.proc.stdin.write(json.dumps(command, ensure_ascii=False) + "\n")
+        self.proc.stdin.flush()
+        while True:
+            line = self.proc.stdout.readline()
+            if not line:
+                raise RuntimeError("CLI exited before answering")
+            # The manager logs to stdout too; responses are the JSON lines
+            if line.startswith("{"):
+                return json.loads(line)
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def close(self):
+        self.proc.stdin.close()
+        self.proc.wait(timeout=60)
+
+
+def run_once(query_text):
+    with tempfile.TemporaryDirectory() as workdir:
+        cli = CliProcess(workdir)
+        try:
+            cli.call({"action": "handshake"})
+            handshake = cli.elapsed()
+
+            ready = None
+            while True:
+                status = cli.call({"action": "status"})["data"]
+                if status["ready"] or status["errors"]:
+                    ready = cli.elapsed()
+                    break
+                time.sleep(0.02)
+
+            # A second process measures the cold path: first query without waiting for warm-up
+            cold = CliProcess(workdir)
+            try:
+                cold.call({"action": "init", "save_id": "bench"})
+                response = cold.call({"action": "query_context", "save_id": "bench", "queries": [query_text]})
+                first_query = cold.elapsed()
+                query_status = response.get("status")
+            finally:
+                cold.close()
+
+            return {
+                "handshake_seconds": handshake,
+                "ready_seconds": ready,
+                "first_query_seconds": first_query,
+                "first_query_status": query_status,
+                "components": status["components"],
+                "errors": status["errors"],
+                "warmup_timings": status["timings"],
+            }
+        finally:
+            cli.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ChromaManager CLI startup benchmark")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--query", default="殖民者最近吃了什么")
+    parser.add_argument("--output", help="Write the JSON report to this file as well")
+    args = parser.parse_args()
+
+    runs = [run_once(args.query) for _ in range(args.runs)]
+    report = {
+        "python": sys.version.split()[0],
+        "imports_seconds": measure_imports(),
+        "runs": runs,
+        "median": {
+            key: statistics.median(r[key] for r in runs)
+            for key in ("handshake_seconds", "ready_seconds", "first_query_seconds")
+        },
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    print(text)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
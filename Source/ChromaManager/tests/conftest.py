@@ -0,0 +1,23 @@
+"""
+Shared fixtures for the ChromaManager tests.
+The manager's modules import each other as top-level modules (the CLI runs
+from this directory), so the directory is put on sys.path. Every test uses
+the dependency-free hashing backend instead of downloading a model.
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import ChromaManager  # noqa: E402
+
+
+@pytest.fixture
+def manager(tmp_path):
+    ChromaManager.configure_embedding_backend("hash")
+    manager = ChromaManager.ChromaDBManager(str(tmp_path / "chromadb"))
+    yield manager
+    manager.shutdown()
+    ChromaManager.configure_embedding_backend()
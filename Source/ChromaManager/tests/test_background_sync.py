@@ -0,0 +1,63 @@
+"""Differential background sync with generation-switched visibility."""
+import ChromaManager
+
+
+def _visible_background(manager, save_id):
+    generation = manager._bg_generations[save_id]
+    rows = manager.background_collection(save_id).get(
+        where={"$and": [{"gen_from": {"$lte": generation}}, {"gen_to": {"$gt": generation}}]},
+        include=["documents"]
+    )
+    return sorted(rows["documents"])
+
+
+def test_sync_touches_only_the_difference(manager):
+    first = manager.sync_background("save", ["apple:a fruit", "banana:another fruit", "frost"])
+    assert first == {"added": 3, "removed": 0, "unchanged": 0, "purged": 0, "generation": 1}
+    stored = set(manager.background_collection("save").get(include=[])["ids"])
+
+    second = manager.sync_background("save", ["apple:a fruit", "frost", "wedding:two pawns marry", "frost"])
+    assert second["added"] == 1 and second["removed"] == 1 and second["unchanged"] == 2
+    assert second["generation"] == 2
+    # Unchanged entries keep their stored rows
+    assert stored <= set(manager.background_collection("save").get(include=[])["ids"])
+    assert _visible_background(manager, "save") == ["apple", "apple:a fruit", "frost", "wedding", "wedding:two pawns marry"]
+
+    # The rows retired by the previous sync are purged by the next one
+    third = manager.sync_background("save", ["apple:a fruit", "frost", "wedding:two pawns marry"])
+    assert third["added"] == third["removed"] == 0 and third["purged"] == 2
+
+
+def test_retired_rows_are_not_counted(manager):
+    manager.sync_background("save", ["apple:a fruit", "banana:another fruit", "frost"])
+    assert manager.info("save")["background_count"] == 5
+    manager.sync_background("save", ["apple:a fruit"])
+    # banana (two rows) and frost stay stored until the next sync, but not counted
+    assert manager.background_collection("save").count() == 5
+    assert manager.info("save")["background_count"] == 2
+    assert manager._counts["save"] == 2
+
+
+def test_counts_survive_reopen_and_purge(manager):
+    manager.sync_background("save", ["apple:a fruit", "banana:another fruit"])
+    manager.sync_background("save", ["apple:a fruit"])
+    manager.close_save("save")
+    assert manager.info("save")["background_count"] == 2
+    assert manager._counts["save"] == 2
+    manager.sync_background("save", ["apple:a fruit", "cherry:red"])
+    assert manager.background_collection("save").count() == 4
+    assert manager._counts["save"] == 4
+
+
+def test_queries_only_see_the_active_generation(manager):
+    manager.configure_title_match("off")
+    manager.sync_background("save", ["apple:a fruit", "banana:another fruit"])
+    manager.sync_background("save", ["apple:a fruit"])
+    texts = [entry["text"] for entry in manager.query_relevant_context("save", ["banana another fruit"], 5)]
+    assert texts == ["apple:a fruit"]
+
+
+def test_generation_open_marks_live_rows(manager):
+    manager.sync_background("save", ["apple:a fruit"])
+    metas = manager.background_collection("save").get(include=["metadatas"])["metadatas"]
+    assert all(meta["gen_from"] == 1 and meta["gen_to"] == ChromaManager.GENERATION_OPEN for meta in metas)
@@ -0,0 +1,96 @@
+"""Protocol version 2 dispatching: per-save write lanes and their release."""
+import io
+import sys
+import time
+
+# The CLI rewraps the standard streams on import: let it wrap throwaway ones
+# instead of pytest's captured streams
+_streams = sys.stdin, sys.stdout, sys.stderr
+sys.stdin, sys.stdout, sys.stderr = (io.TextIOWrapper(io.BytesIO()) for _ in range(3))
+try:
+    import ChromaManager_CLI  # noqa: E402
+finally:
+    sys.stdin, sys.stdout, sys.stderr = _streams
+
+
+class _Warm:
+    """Warm-up stand-in handing out an already built manager."""
+
+    def __init__(self, manager):
+        self.manager = manager
+
+    def wait_manager(self, timeout=None):
+        return self.manager
+
+    def is_ready(self, component):
+        return True
+
+    def report(self):
+        return {"ready": True, "components": {}, "errors": {}, "timings": {}}
+
+
+def _dispatcher(manager):
+    dispatcher = ChromaManager_CLI.Dispatcher(_Warm(manager), workers=4)
+    responses = []
+    dispatcher.write = responses.append
+    return dispatcher, responses
+
+
+def _wait_for(responses, count, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while len(responses) < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(responses) == count, f"{len(responses)} of {count} responses"
+
+
+def _turn(request_id, save_id, text):
+    return {
+        "id": request_id, "action": "add_conversation", "save_id": save_id,
+        "responses": [{"name": "Alice", "text": text, "talk_type": "Normal"}],
+        "speakers": ["Alice"], "listeners": ["Bob"], "date": "5th of Aprimay, 5500"
+    }
+
+
+def test_writes_to_one_save_apply_in_arrival_order(manager):
+    dispatcher, responses = _dispatcher(manager)
+    turns = 40
+    for i in range(turns):
+        dispatcher.submit(_turn(i, "save", f"turn {i}"))
+        dispatcher.submit(_turn(1000 + i, "other", f"other {i}"))
+        if i % 10 == 0:
+            dispatcher.submit({"id": 2000 + i, "action": "info", "save_id": "save"})
+    _wait_for(responses, 2 * turns + 4)
+    assert all(r["status"] == "ok" for r in responses)
+    assert sorted(r["id"] for r in responses) == sorted(
+        list(range(turns)) + list(range(1000, 1000 + turns)) + [2000, 2010, 2020, 2030]
+    )
+
+    manager.flush()
+    for save_id, prefix in (("save", "turn"), ("other", "other")):
+        texts = [entry["text"] for page in manager.iter_entries(save_id) for entry in page["entries"]]
+        assert texts == [f"{prefix} {i}" for i in range(turns)]
+    dispatcher.shutdown()
+
+
+def test_lanes_are_dropped_when_their_save_closes(manager):
+    dispatcher, responses = _dispatcher(manager)
+    dispatcher.submit(_turn(1, "save", "first"))
+    dispatcher.submit(_turn(2, "other", "first"))
+    dispatcher.submit({"id": 3, "action": "close_save", "save_id": "save"})
+    _wait_for(responses, 3)
+    deadline = time.monotonic() + 10
+    while "save" in dispatcher._lanes and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert set(dispatcher._lanes) == {"other"}
+
+    # Closed by the manager itself (e.g. the open-save pool), not by a command
+    manager.close_save("other")
+    assert dispatcher._lanes == {}
+
+    # A later write to a closed save opens a fresh lane
+    dispatcher.submit(_turn(4, "save", "second"))
+    _wait_for(responses, 4)
+    assert responses[-1]["status"] == "ok"
+    manager.flush()
+    assert [e["text"] for e in manager.page_entries("save")["entries"]] == ["first", "second"]
+    dispatcher.shutdown()
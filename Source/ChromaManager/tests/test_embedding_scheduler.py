@@ -0,0 +1,62 @@
+"""Micro-batching of encode calls across concurrent requests."""
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from EmbeddingScheduler import EmbeddingScheduler
+
+
+def _fake_encode(calls):
+    def encode(texts):
+        calls.append(list(texts))
+        time.sleep(0.002)
+        return np.array([[len(t), sum(map(ord, t)) % 997] for t in texts], dtype=np.float32)
+    return encode
+
+
+def test_rows_follow_request_order_and_passes_are_bounded():
+    calls = []
+    scheduler = EmbeddingScheduler(_fake_encode(calls), max_batch_size=8, max_wait=0.0)
+    try:
+        texts = [f"text {'x' * (i % 5)} {i}" for i in range(50)] + ["dup", "dup"]
+        rows = scheduler.encode(texts)
+        assert np.array_equal(rows, _fake_encode([])(texts))
+        assert all(len(call) <= 8 for call in calls)
+        # Each pass is handed to the backend shortest first
+        assert all([len(t) for t in call] == sorted(len(t) for t in call) for call in calls)
+        assert scheduler.stats()["texts_deduplicated"] == 1
+    finally:
+        scheduler.close()
+
+
+def test_small_request_is_not_held_behind_a_bulk_request():
+    calls = []
+    scheduler = EmbeddingScheduler(_fake_encode(calls), max_batch_size=4, max_wait=0.0)
+    done = []
+    try:
+        bulk = threading.Thread(
+            target=lambda: done.append(("bulk", scheduler.encode([f"bulk {i}" for i in range(200)])))
+        )
+        bulk.start()
+        time.sleep(0.01)
+        rows = scheduler.encode(["query"])
+        done.append(("query", rows))
+        bulk.join()
+        assert [name for name, _ in done] == ["query", "bulk"]
+    finally:
+        scheduler.close()
+
+
+def test_errors_reach_every_caller_of_the_failed_pass():
+    def fail(texts):
+        raise RuntimeError("boom")
+    scheduler = EmbeddingScheduler(fail, max_batch_size=4, max_wait=0.0)
+    try:
+        with pytest.raises(RuntimeError):
+            scheduler.encode(list("abcdefghij"))
+        with pytest.raises(RuntimeError):
+            scheduler.encode(["again"])
+    finally:
+        scheduler.close()
@@ -0,0 +1,52 @@
+"""Eviction of the oldest conversation entries once a save reaches its entry limit."""
+import time
+
+
+def _wait_for_eviction(manager, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while manager._evicting and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not manager._evicting, "eviction did not finish in time"
+
+
+def _stored_seqs(manager, save_id):
+    rows = manager.get_or_create_collection(save_id).get(include=["metadatas"])
+    return sorted(meta["seq"] for meta in rows["metadatas"])
+
+
+def test_queue_writes_past_limit_keep_only_newest_entries(manager):
+    manager.ENTRY_LIMIT = 20
+    # One turn per commit, so the limit is checked before every write
+    manager.configure_ingestion(True, max_batch_size=1, max_delay=0.0)
+    turns = 60
+    for i in range(turns):
+        assert manager.enqueue_conversation(
+            "save", [{"name": "Alice", "text": f"turn {i}", "talk_type": "Normal"}],
+            ["Alice"], ["Bob"], "5th of Aprimay, 5500", "Normal"
+        )
+        if i % 10 == 9:
+            assert manager.flush("save", timeout=30)
+            _wait_for_eviction(manager)
+    assert manager.flush("save", timeout=30)
+    _wait_for_eviction(manager)
+
+    seqs = _stored_seqs(manager, "save")
+    assert 0 < len(seqs) < turns
+    # Exactly the newest entries survive, in one contiguous run up to the last turn
+    assert seqs == list(range(turns - len(seqs), turns))
+    assert manager._sequences["save"].floor == turns - len(seqs)
+    assert manager.info("save")["count"] == len(seqs)
+
+
+def test_evict_oldest_removes_lowest_seqs_across_windows(manager):
+    manager.EVICTION_BATCH_SIZE = 4
+    for i in range(25):
+        manager.add_conversation(
+            "save", [{"name": "Alice", "text": f"turn {i}", "talk_type": "Normal"}],
+            ["Alice"], ["Bob"], "5th of Aprimay, 5500", "Normal"
+        )
+
+    assert manager.evict_oldest("save", 10) == 10
+    assert _stored_seqs(manager, "save") == list(range(10, 25))
+    assert manager.evict_oldest("save", 3) == 3
+    assert _stored_seqs(manager, "save") == list(range(13, 25))
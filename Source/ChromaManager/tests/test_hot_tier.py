@@ -0,0 +1,103 @@
+"""In-memory hot tier: coverage invariant and agreement with the persistent index."""
+import random
+import threading
+
+import numpy as np
+import pytest
+
+from HotTier import HotTier
+
+
+def _rows(seqs, prefix="id"):
+    ids = [f"{prefix}{i}" for i in range(len(seqs))]
+    embeddings = np.eye(len(seqs), 8, dtype=np.float32)
+    metadatas = [{"seq": seq, "speaker": "Alice", "listener:Bob": True} for seq in seqs]
+    return ids, embeddings, [f"text {i}" for i in range(len(seqs))], metadatas
+
+
+def _assert_covers(tier, ids, metadatas):
+    """Every added row at or above coverage_low must still be held."""
+    held = set(tier._slots)
+    for doc_id, meta in zip(ids, metadatas):
+        if meta["seq"] >= tier.coverage_low:
+            assert doc_id in held, (doc_id, meta["seq"], tier.coverage_low)
+
+
+@pytest.mark.parametrize("capacity", [3, 7, 64])
+def test_out_of_order_rows_keep_the_coverage_invariant(capacity):
+    rng = random.Random(capacity)
+    seqs = list(range(40))
+    # Commits land roughly, not strictly, in seq order
+    for i in range(0, len(seqs) - 3, 3):
+        seqs[i:i + 4] = rng.sample(seqs[i:i + 4], 4)
+    ids, embeddings, documents, metadatas = _rows(seqs)
+    tier = HotTier(capacity)
+    for i in range(len(ids)):
+        tier.add(ids[i:i + 1], embeddings[i:i + 1], documents[i:i + 1], metadatas[i:i + 1])
+        _assert_covers(tier, ids[:i + 1], metadatas[:i + 1])
+    assert tier.size == min(capacity, len(ids))
+    assert tier.max_seq == max(seqs)
+
+
+def test_rows_sharing_a_seq_are_all_held_and_only_covered_in_full():
+    # Lines of migrated turns share the seq of their turn
+    seqs = [0, 0, 0, 3, 3, 3, 6, 6, 6]
+    ids, embeddings, documents, metadatas = _rows(seqs)
+    tier = HotTier(4)
+    tier.add(ids, embeddings, documents, metadatas)
+    assert sorted(tier._slots) == ["id5", "id6", "id7", "id8"]
+    # One line of seq 3 is still held, but not all of them
+    assert tier.coverage_low == 4
+    _assert_covers(tier, ids, metadatas)
+
+
+def test_rows_already_held_or_below_coverage_are_skipped():
+    ids, embeddings, documents, metadatas = _rows([5, 6, 7])
+    tier = HotTier(10)
+    tier.load(ids, embeddings, documents, metadatas, coverage_low=5)
+    tier.add(ids, embeddings, documents, metadatas)
+    old_ids, old_embeddings, old_documents, old_metadatas = _rows([2], prefix="old")
+    tier.add(old_ids, old_embeddings, old_documents, old_metadatas)
+    assert tier.size == 3
+
+
+def test_search_filters_and_orders_by_distance():
+    ids, embeddings, documents, metadatas = _rows([0, 1, 2])
+    metadatas[1] = {"seq": 1, "speaker": "Carol"}
+    tier = HotTier(10)
+    tier.add(ids, embeddings, documents, metadatas)
+    results = tier.search(embeddings[:1], 3)
+    assert results["ids"][0][0] == "id0"
+    assert results["distances"][0][0] == pytest.approx(0.0)
+    assert set(tier.search(embeddings[:1], 3, speakers=["Carol"])["ids"][0]) == {"id1"}
+    assert "id1" not in tier.search(embeddings[:1], 3, listeners=["Bob"])["ids"][0]
+
+
+@pytest.mark.parametrize("tier_size", [8, 5000])
+def test_concurrent_adds_stay_findable(manager, tier_size):
+    manager.configure_ingestion(False)
+    # No confident-hits shortcut: only the coverage decides whether the cold index is searched
+    manager.configure_hot_tier(size=tier_size, confidence=1.1)
+    manager.query_cache.capacity = 0
+    manager.add_conversation(
+        "save", [{"name": "Alice", "text": "seed", "talk_type": "Normal"}], ["Alice"], ["Bob"], "", "Normal"
+    )
+    # Load the tier before the concurrent writes, so they are written through
+    manager.query_relevant_context("save", ["seed"], 1)
+
+    texts = [f"unique entry {i} zebra" for i in range(40)]
+    threads = [
+        threading.Thread(
+            target=manager.add_conversation,
+            args=("save", [{"name": "Alice", "text": text, "talk_type": "Normal"}], ["Alice"], ["Bob"], "", "Normal")
+        )
+        for text in texts
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for text in texts:
+        results = manager.query_relevant_context("save", [text], 3)
+        assert text in [entry["text"] for entry in results]
@@ -0,0 +1,70 @@
+"""Cursor and offset paging over a save's entries."""
+
+
+def _add_turns(manager, save_id, texts):
+    for text in texts:
+        manager.add_conversation(
+            save_id, [{"name": "Alice", "text": text, "talk_type": "Normal"}],
+            ["Alice"], ["Bob"], "5th of Aprimay, 5500", "Normal"
+        )
+
+
+def _cursor_pages(manager, save_id, **kwargs):
+    return list(manager.iter_entries(save_id, **kwargs))
+
+
+def test_cursor_pages_cover_every_entry_once_in_seq_order(manager):
+    _add_turns(manager, "save", [f"turn {i}" for i in range(23)])
+    manager.sync_background("save", ["apple:a fruit", "frost"])
+
+    pages = _cursor_pages(manager, "save", limit=4, fields=["id", "seq"])
+    entries = [entry for page in pages for entry in page["entries"]]
+    assert len(entries) == 23 + 3
+    assert len({entry["id"] for entry in entries}) == len(entries)
+    assert [entry["seq"] for entry in entries] == sorted(entry["seq"] for entry in entries)
+    assert all(page["total"] == 26 for page in pages)
+    # A background entry and its title share a seq and stay on one page
+    assert all(len(page["entries"]) <= 5 for page in pages)
+
+
+def test_cursor_survives_writes_between_pages(manager):
+    _add_turns(manager, "save", [f"turn {i}" for i in range(10)])
+    first = manager.page_entries("save", limit=5)
+    _add_turns(manager, "save", ["late turn"])
+    manager.evict_oldest("save", 2)
+    second = manager.page_entries("save", limit=10, cursor=first["next_cursor"])
+    texts = [entry["text"] for entry in first["entries"] + second["entries"]]
+    assert texts == [f"turn {i}" for i in range(10)] + ["late turn"]
+    assert second["next_cursor"] is None
+
+
+def test_filtered_offset_pages_cross_both_collections(manager):
+    _add_turns(manager, "save", [f"turn {i}" for i in range(7)])
+    manager.sync_background("save", ["apple:a fruit", "banana:another fruit"])
+    where = {"seq": {"$gte": 2}}
+
+    entries, offset = [], 0
+    while offset is not None:
+        page = manager.page_entries("save", limit=3, offset=offset, where=where, fields=["id", "seq"])
+        assert "total" not in page
+        entries += page["entries"]
+        offset = page["next_offset"]
+    assert len(entries) == 5 + 4
+    assert len({entry["id"] for entry in entries}) == len(entries)
+    assert all(entry["seq"] >= 2 for entry in entries)
+
+    assert manager.page_entries("save", limit=3, offset=0)["total"] == 7 + 4
+
+
+def test_rows_sharing_one_seq_are_not_lost(manager):
+    # Saves migrated from before seq numbers existed give many rows the same seq
+    _add_turns(manager, "save", [f"turn {i}" for i in range(12)])
+    _add_turns(manager, "save", ["after the legacy rows"])
+    collection = manager.get_or_create_collection("save")
+    legacy = collection.get(where={"seq": {"$lt": 12}}, include=[])["ids"]
+    collection.update(ids=legacy, metadatas=[{"seq": 0}] * len(legacy))
+
+    pages = _cursor_pages(manager, "save", limit=2, fields=["text"])
+    texts = [entry["text"] for page in pages for entry in page["entries"]]
+    assert sorted(texts[:12]) == sorted(f"turn {i}" for i in range(12))
+    assert texts[12:] == ["after the legacy rows"]
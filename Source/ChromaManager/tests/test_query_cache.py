@@ -0,0 +1,56 @@
+"""Query result cache: keying, generation checks and invalidation by writes."""
+from QueryCache import QueryResultCache
+
+
+def _add_turn(manager, save_id, text):
+    manager.add_conversation(
+        save_id, [{"name": "Alice", "text": text, "talk_type": "Normal"}],
+        ["Alice"], ["Bob"], "5th of Aprimay, 5500", "Normal"
+    )
+
+
+def test_key_ignores_query_order_whitespace_and_duplicates():
+    a = QueryResultCache.make_key("save", ["apple  pie", "frost"], 5, ["Alice"], None, fusion="max")
+    b = QueryResultCache.make_key("save", ["frost", "apple pie", "frost"], 5, ["Alice"], [], fusion="max")
+    assert a == b
+    assert a != QueryResultCache.make_key("save", ["frost", "apple pie"], 5, ["Alice"], None, fusion="rrf")
+    assert a != QueryResultCache.make_key("other", ["frost", "apple pie"], 5, ["Alice"], None, fusion="max")
+
+
+def test_entries_from_an_older_generation_are_invalidated():
+    cache = QueryResultCache(capacity=2)
+    cache.put("k", 3, [{"text": "a"}])
+    hit = cache.get("k", 3)
+    assert hit == [{"text": "a"}]
+    hit[0]["text"] = "changed"
+    assert cache.get("k", 3) == [{"text": "a"}]
+    assert cache.get("k", 4) is None
+    assert cache.get("k", 3) is None
+    assert cache.stats()["invalidations"] == 1
+
+    cache.put(("save", 1), 0, [])
+    cache.put(("other", 1), 0, [])
+    cache.put(("save", 2), 0, [])
+    # Capacity 2: the least recently used entry went first
+    assert cache.get(("save", 1), 0) is None
+    cache.drop_save("save")
+    assert cache.get(("save", 2), 0) is None
+    assert cache.get(("other", 1), 0) == []
+
+
+def test_writes_invalidate_cached_query_results(manager):
+    manager.configure_title_match("off")
+    _add_turn(manager, "save", "the caravan brought apples")
+    first = manager.query_relevant_context("save", ["apples"], 5)
+    assert manager.query_relevant_context("save", ["apples"], 5) == first
+    assert manager.query_cache.stats()["hits"] == 1
+
+    _add_turn(manager, "save", "apples again, fresh from the orchard")
+    texts = [entry["text"] for entry in manager.query_relevant_context("save", ["apples"], 5)]
+    assert "apples again, fresh from the orchard" in texts
+    assert manager.query_cache.stats()["invalidations"] == 1
+
+    # A background sync is a write too
+    manager.sync_background("save", ["apples:a red fruit"])
+    texts = [entry["text"] for entry in manager.query_relevant_context("save", ["apples"], 5)]
+    assert "apples:a red fruit" in texts
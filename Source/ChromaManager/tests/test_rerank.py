@@ -0,0 +1,68 @@
+"""Candidate fusion across queries and MMR selection."""
+import numpy as np
+import pytest
+
+from Rerank import CandidatePool
+
+
+def _result(ids, distances, embeddings):
+    """One query's Chroma-style result."""
+    return {
+        "ids": [ids],
+        "documents": [[f"doc {i}" for i in ids]],
+        "metadatas": [[{"id": i} for i in ids]],
+        "distances": [distances],
+        "embeddings": [np.asarray(embeddings, dtype=np.float32)],
+    }
+
+
+def _merge(*results):
+    return {key: [r[key][0] for r in results] for key in results[0]}
+
+
+def _keys(pool, picked):
+    return [pool.keys[i] for i in picked]
+
+
+def test_hits_of_one_entry_fuse_to_its_best_relevance():
+    pool = CandidatePool(2)
+    e = np.eye(3)
+    pool.add(_merge(
+        _result(["a", "b_short"], [0.2, 0.4], [e[0], e[1]]),
+        _result(["b", "c"], [0.1, 0.6], [e[1], e[2]]),
+    ))
+    picked, relevance, stats = pool.select(3)
+    # The title row "b_short" and the full row "b" are one entry
+    assert stats["candidates"] == 3
+    assert _keys(pool, picked) == ["b", "a", "c"]
+    assert relevance == pytest.approx([0.95, 0.9, 0.7])
+
+
+def test_rrf_favours_entries_found_by_several_queries():
+    e = np.eye(4)
+    results = _merge(
+        _result(["solo", "shared"], [0.0, 0.3], [e[0], e[1]]),
+        _result(["other", "shared"], [0.0, 0.3], [e[2], e[1]]),
+        _result(["third", "shared"], [0.0, 0.3], [e[3], e[1]]),
+    )
+    by_max = CandidatePool(3)
+    by_max.add(results)
+    assert _keys(by_max, by_max.select(1)[0]) != ["shared"]
+    by_rrf = CandidatePool(3)
+    by_rrf.add(results)
+    assert _keys(by_rrf, by_rrf.select(1, fusion="rrf")[0]) == ["shared"]
+    with pytest.raises(ValueError):
+        by_rrf.select(1, fusion="sum")
+
+
+def test_mmr_and_duplicates_prefer_novel_entries():
+    near = [1.0, 0.05, 0.0]
+    pool = CandidatePool(1)
+    pool.add(_result(["a", "a2", "b"], [0.10, 0.12, 0.30], [[1, 0, 0], near, [0, 0, 1]]))
+
+    assert _keys(pool, pool.select(2)[0]) == ["a", "a2"]
+    assert _keys(pool, pool.select(2, mmr_lambda=0.5)[0]) == ["a", "b"]
+    picked, _, stats = pool.select(3, duplicate_similarity=0.99)
+    assert _keys(pool, picked) == ["a", "b"] and stats["duplicates"] == 1
+    # Entries placed ahead (e.g. title matches) are not picked again and count for novelty
+    assert _keys(pool, pool.select(1, mmr_lambda=0.5, placed=["a"])[0]) == ["b"]
@@ -0,0 +1,81 @@
+"""Snapshot export and import, including replacing a save that already holds entries."""
+import json
+import zipfile
+
+import pytest
+
+
+def _add_turns(manager, save_id, texts):
+    for text in texts:
+        manager.add_conversation(
+            save_id, [{"name": "Alice", "text": text, "talk_type": "Normal"}],
+            ["Alice"], ["Bob"], "5th of Aprimay, 5500", "Normal"
+        )
+
+
+def _stored(manager, save_id):
+    rows = manager.query_all_entry(save_id)
+    return sorted((entry["id"], entry["text"]) for entry in rows)
+
+
+def test_round_trip_replaces_existing_entries(manager, tmp_path):
+    _add_turns(manager, "source", [f"turn {i}" for i in range(30)])
+    manager.sync_background("source", ["apple:a fruit", "frost"])
+    manager.sync_background("source", ["apple:a fruit"])
+    snapshot = manager.export_save("source", str(tmp_path / "source.rtsnap"))
+    assert snapshot["count"] == 30 + 3
+
+    _add_turns(manager, "target", ["something else entirely"])
+    with pytest.raises(ValueError):
+        manager.import_save("target", snapshot["path"])
+
+    result = manager.import_save("target", snapshot["path"], replace=True)
+    assert result["count"] == 30 + 3 and result["verified"] is True
+    expected = [(doc_id.replace("source_", "target_", 1), text) for doc_id, text in _stored(manager, "source")]
+    assert _stored(manager, "target") == expected
+    # Counters are restored: retired background rows stay uncounted, new IDs continue the sequence
+    counts = ("count", "conversation_count", "background_count")
+    assert [manager.info("target")[k] for k in counts] == [30 + 2, 30, 2]
+    assert manager._sequences["target"].peek() >= manager._sequences["source"].peek()
+    assert not (manager.base_dir / "target.importing").exists()
+    assert not (manager.base_dir / "target.replaced").exists()
+
+    texts = [entry["text"] for entry in manager.query_relevant_context("target", ["turn 7"], 1)]
+    assert texts == ["turn 7"]
+
+
+def test_failed_verification_leaves_save_intact(manager, tmp_path, monkeypatch):
+    _add_turns(manager, "source", [f"turn {i}" for i in range(10)])
+    snapshot = manager.export_save("source", str(tmp_path / "source.rtsnap"))
+    _add_turns(manager, "target", ["keep me"])
+    before = _stored(manager, "target")
+
+    def fail(*args, **kwargs):
+        raise ValueError("verification failed")
+
+    monkeypatch.setattr(manager, "_verify_import", fail)
+    with pytest.raises(ValueError):
+        manager.import_save("target", snapshot["path"], replace=True)
+    assert _stored(manager, "target") == before
+    assert manager.info("target")["count"] == 1
+    assert not (manager.base_dir / "target.importing").exists()
+
+
+def test_mismatched_dimension_is_rejected_before_the_save_is_touched(manager, tmp_path):
+    _add_turns(manager, "source", ["turn 0"])
+    snapshot = manager.export_save("source", str(tmp_path / "source.rtsnap"))
+    altered = tmp_path / "altered.rtsnap"
+    with zipfile.ZipFile(snapshot["path"]) as src, zipfile.ZipFile(altered, "w") as dst:
+        for name in src.namelist():
+            data = src.read(name)
+            if name == "manifest.json":
+                manifest = json.loads(data)
+                manifest["dim"] = 384
+                data = json.dumps(manifest)
+            dst.writestr(name, data)
+
+    _add_turns(manager, "target", ["keep me"])
+    with pytest.raises(ValueError, match="384"):
+        manager.import_save("target", str(altered), replace=True)
+    assert _stored(manager, "target")[0][1] == "keep me"
+    assert not (manager.base_dir / "target.importing").exists()
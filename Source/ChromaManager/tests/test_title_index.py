@@ -0,0 +1,49 @@
+"""Matching background titles mentioned in query texts."""
+from TitleIndex import TitleIndex
+
+
+def _index(*titles):
+    index = TitleIndex()
+    for i, title in enumerate(titles):
+        index.add(f"k{i}", title, {"text": title})
+    return index
+
+
+def _matched(index, *texts, fuzzy=True):
+    return [(entry["text"], round(entry["relevance"], 2)) for _, entry in index.match(texts, fuzzy=fuzzy)]
+
+
+def test_exact_mentions_prefer_the_longest_title():
+    index = _index("龙娘", "龙娘毛发", "Ant", "Plant")
+    assert _matched(index, "她想要龙娘毛发做的披风") == [("龙娘毛发", 1.0)]
+    # Latin titles only match whole words
+    assert _matched(index, "water the plant") == [("Plant", 1.0)]
+    assert _matched(index, "an ANT colony") == [("Ant", 1.0)]
+    assert _matched(index, "nothing here") == []
+
+
+def test_near_misses_match_unless_they_are_variants_of_an_exact_mention():
+    index = _index("Boomalope", "龙娘毛发", "龙娘毛皮")
+    assert _matched(index, "a boomalop wandered in") == [("Boomalope", 0.89)]
+    assert _matched(index, "a boomalop wandered in", fuzzy=False) == []
+    assert _matched(index, "龙娘毛发") == [("龙娘毛发", 1.0)]
+
+
+def test_remove_and_shared_titles():
+    index = TitleIndex()
+    index.add("a", "Frost", {"text": "Frost:cold"})
+    index.add("b", "frost", {"text": "frost:also cold"})
+    index.add("c", "x", {"text": "too short"})
+    assert len(index) == 2
+    assert sorted(key for key, _ in index.match(["FROST tonight"])) == ["a", "b"]
+    index.remove("a")
+    assert [key for key, _ in index.match(["frost tonight"])] == ["b"]
+    index.remove("b")
+    assert index.match(["frost tonight"]) == [] and index.stats()["titles"] == 0
+
+
+def test_manager_returns_title_matches_first(manager):
+    manager.sync_background("save", ["Boomalope:explodes when killed", "Muffalo:a woolly pack animal"])
+    manager._title_index("save", wait=True)
+    texts = [entry["text"] for entry in manager.query_relevant_context("save", ["what about the muffalo herd"], 2)]
+    assert texts[0] == "Muffalo:a woolly pack animal"
@@ -1,9 +1,13 @@
 using System;
+using System.Collections.Concurrent;
 using System.Collections.Generic;
 using System.Diagnostics;
+using System.Globalization;
 using System.IO;
 using System.Linq;
+using System.Text.RegularExpressions;
 using System.Threading;
+using System.Threading.Tasks;
 using RimTalk.Data;
 using RimTalk.Util;
 
@@ -12,16 +16,64 @@ namespace RimTalk.Service;
 /// <summary>
 /// Client for communicating with Python ChromaManager via subprocess/IPC.
 /// Handles serialization/deserialization of ChromaDB operations.
+/// 
+/// With protocol version 2 every command carries an "id" and several commands
+/// can be in flight at once: a reader thread matches each response line to
+/// its request by id, so a query is not held up behind a long background
+/// refresh. Streamed commands receive their intermediate frames through a
+/// callback. A CLI that does not answer the handshake with version 2 is
+/// driven with version 1, one command at a time.
 /// </summary>
 public class ChromaClient
 {
+    private const int MaxStderrLines = 50;
+    private static readonly TimeSpan CommandTimeout = TimeSpan.FromSeconds(45);
+    private static readonly TimeSpan HandshakeTimeout = TimeSpan.FromSeconds(15);
+    private static readonly TimeSpan ReadyPollInterval = TimeSpan.FromMilliseconds(500);
+
+    // The CLI writes the request id as the last field of a response line
+    private static readonly Regex ResponseIdPattern = new Regex("\"id\":\\s*(\\d+)\\s*}\\s*$", RegexOptions.Compiled);
+    private static readonly Regex StatusPattern = new Regex("^\\{\"status\":\\s*\"(\\w+)\"", RegexOptions.Compiled);
+    private static readonly Regex OpenFramePattern = new Regex("^\\{\"status\":\\s*\"ok\",\\s*\"frame\":\\s*\\d+,\\s*\"done\":\\s*false", RegexOptions.Compiled);
+    private static readonly Regex ProtocolVersionPattern = new Regex("\"protocol_version\":\\s*(\\d+)", RegexOptions.Compiled);
+    private static readonly Regex ReadyPattern = new Regex("\"ready\":\\s*true", RegexOptions.Compiled);
+
+    /// <summary>
+    /// A command waiting for its response; frames of a streamed response go to OnFrame.
+    /// </summary>
+    private class PendingRequest
+    {
+        public readonly TaskCompletionSource<string> Completion =
+            new TaskCompletionSource<string>(TaskCreationOptions.RunContinuationsAsynchronously);
+        public Action<string> OnFrame;
+    }
+
     private Process _pythonProcess;
     private StreamWriter _stdin;
     private StreamReader _stdout;
+    private Thread _readerThread;
     private readonly object _lock = new object();
+    private readonly object _writeLock = new object();
+    private readonly object _v1Lock = new object();
+    private readonly ConcurrentDictionary<long, PendingRequest> _pending = new ConcurrentDictionary<long, PendingRequest>();
+    private readonly ConcurrentQueue<string> _stderrTail = new ConcurrentQueue<string>();
+    private PendingRequest _v1Pending;
+    private long _nextId;
+    private int _protocolVersion = 1;
+    private volatile bool _ready;
     private readonly string _chromaManagerPath="D:\\steam\\steamapps\\common\\RimWorld\\Mods\\RimTalk-main\\Source\\ChromaManager\\ChromaManager_CLI.py";
     private readonly string _modDirectory="D:\\steam\\steamapps\\common\\RimWorld\\Mods\\RimTalk-main\\Source\\ChromaManager";
 
+    /// <summary>
+    /// Protocol version spoken with the CLI (2: concurrent, id-tagged commands).
+    /// </summary>
+    public int ProtocolVersion => _protocolVersion;
+
+    /// <summary>
+    /// Whether chromadb and the embedding model have finished loading in the CLI.
+    /// </summary>
+    public bool IsReady => _ready;
+
     /// <summary>
     /// Initialize the ChromaDB client for a specific save.
     /// </summary>
@@ -58,37 +110,64 @@ public class ChromaClient
                 _stdin = _pythonProcess.StandardInput;
                 _stdout = _pythonProcess.StandardOutput;
 
-                // Give process time to initialize and fail if it's going to crash
-                Thread.Sleep(500);
-                
-                if (_pythonProcess.HasExited)
+                // Diagnostics arrive on stderr; it must be drained or the CLI blocks once the pipe is full
+                _pythonProcess.ErrorDataReceived += (_, e) => OnStderrLine(e.Data);
+                _pythonProcess.BeginErrorReadLine();
+                _readerThread = new Thread(ReadLoop) { IsBackground = true, Name = "ChromaClientReader" };
+                _readerThread.Start();
+
+                // The CLI answers the handshake at once, while chromadb and the model are still loading
+                var handshake = SendCommand(new Dictionary<string, object> { { "action", "handshake" } }, timeout: HandshakeTimeout);
+                if (handshake == null || _pythonProcess.HasExited)
                 {
-                    Logger.Error($"[ChromaClient] Python process exited immediately with code: {_pythonProcess.ExitCode}");
-                    try
+                    if (_pythonProcess.HasExited)
                     {
-                        var stderr = _pythonProcess.StandardError.ReadToEnd();
-                        if (!string.IsNullOrEmpty(stderr))
-                        {
-                            Logger.Error($"[ChromaClient] Python startup error: {stderr}");
-                        }
+                        Logger.Error($"[ChromaClient] Python process exited with code: {_pythonProcess.ExitCode}");
+                    }
+                    var stderr = string.Join("\n", _stderrTail);
+                    if (!string.IsNullOrEmpty(stderr))
+                    {
+                        Logger.Error($"[ChromaClient] Python startup error: {stderr}");
                     }
-                    catch { }
-                    throw new Exception("Python process crashed on startup");
+                    throw new Exception("No handshake from Python process");
                 }
 
-                // Send initialization command
-                var initResponse = SendCommand(new Dictionary<string, object>
+                var version = ProtocolVersionPattern.Match(handshake);
+                _protocolVersion = IsStatus(handshake, "ok") && version.Success
+                    ? Math.Min(2, int.Parse(version.Groups[1].Value, CultureInfo.InvariantCulture))
+                    : 1;
+                _ready = _protocolVersion < 2 || ReadyPattern.IsMatch(handshake);
+                Logger.Debug($"[ChromaClient] Handshake: protocol_version={_protocolVersion}, ready={_ready}");
+
+                var init = new Dictionary<string, object>
                 {
                     { "action", "init" },
                     { "save_id", saveId }
-                });
-
-                if (initResponse == null)
+                };
+                if (_protocolVersion >= 2)
                 {
-                    throw new Exception("No response from Python process during initialization");
+                    // Queued by the CLI until warm-up is done; later writes to the save run after it
+                    BeginCommand(init, null).ContinueWith(t =>
+                    {
+                        if (t.Result == null || !IsStatus(t.Result, "ok"))
+                            Logger.Error($"[ChromaClient] Initialization failed for save {saveId}: {t.Result ?? "no response"}");
+                        else
+                            Logger.Debug($"[ChromaClient] Initialized for save: {saveId}");
+                    });
+                    if (!_ready)
+                    {
+                        Task.Run(WaitUntilReady);
+                    }
+                }
+                else
+                {
+                    var initResponse = SendCommand(init);
+                    if (initResponse == null)
+                    {
+                        throw new Exception("No response from Python process during initialization");
+                    }
+                    Logger.Debug($"[ChromaClient] Initialized for save: {saveId}");
                 }
-
-                Logger.Debug($"[ChromaClient] Initialized for save: {saveId}");
             }
             catch (Exception ex)
             {
@@ -133,7 +212,8 @@ public class ChromaClient
         List<TalkResponse> responses,
         List<string> speakers,
         List<string> listeners,
-        string dateString)
+        string dateString,
+        long? tick = null)
     {
         Logger.Debug($"[ChromaClient] AddConversation called: {responses.Count} responses, speakers={string.Join(",", speakers)}, date={dateString}");
         
@@ -149,8 +229,7 @@ public class ChromaClient
             });
         }
         
-        // 修改：使用同步方法而不是异步方法
-        var response = SendCommand(new Dictionary<string, object>
+        var command = new Dictionary<string, object>
         {
             { "action", "add_conversation" },
             { "save_id", saveId },
@@ -159,7 +238,13 @@ public class ChromaClient
             { "listeners", listeners },
             { "date", dateString },
             {"type", responses[0].TalkType.ToString() }
-        });
+        };
+        // Absolute game tick: stored as numeric time so queries can filter/rank by recency
+        if (tick.HasValue)
+            command["tick"] = tick.Value;
+
+        // 修改：使用同步方法而不是异步方法
+        var response = SendCommand(command);
 
         if (response == null)
         {
@@ -182,14 +267,18 @@ public class ChromaClient
     {
         Logger.Debug($"[ChromaClient] QueryContext called: queries_count={queries.Count}, listeners={string.Join(",", listeners)}, maxResults={maxResults}");
         
-        var response = SendCommand(new Dictionary<string, object>
+        var command = new Dictionary<string, object>
         {
             { "action", "query_context" },
             { "save_id", saveId },
             { "queries", queries }, // CHANGED: "prompt" -> "queries"
             { "listeners", listeners },
             { "n_results", maxResults }
-        });
+        };
+        // While the model is loading, answer without history instead of waiting for it
+        if (!_ready)
+            command["if_warming"] = "reject";
+        var response = SendCommand(command);
 
         if (response == null)
         {
@@ -197,6 +286,12 @@ public class ChromaClient
             return new List<ContextEntry>();
         }
 
+        if (IsStatus(response, "warming"))
+        {
+            Logger.Debug("[ChromaClient] QueryContext skipped: ChromaManager is still warming up");
+            return new List<ContextEntry>();
+        }
+
         try
         {
             Logger.Debug($"[ChromaClient] QueryContext parsing response: {response}");
@@ -278,6 +373,52 @@ public class ChromaClient
         }
     }
 
+    /// <summary>
+    /// Read every stored entry of a save, one page at a time (streamed debug_get_all_entry).
+    /// Pages are passed to onPage on the reader thread, in order, as they arrive.
+    /// </summary>
+    /// <returns>Number of entries read, or -1 if the stream failed</returns>
+    public int StreamEntries(string saveId, Action<List<Dictionary<string, object>>> onPage, int pageSize = 500)
+    {
+        if (_protocolVersion < 2)
+        {
+            Logger.Warning("[ChromaClient] StreamEntries needs protocol version 2");
+            return -1;
+        }
+
+        int count = 0;
+        var response = SendCommand(new Dictionary<string, object>
+        {
+            { "action", "debug_get_all_entry" },
+            { "save_id", saveId },
+            { "limit", pageSize },
+            { "stream", true }
+        }, frame =>
+        {
+            try
+            {
+                var frameObj = JsonUtil.DeserializeToDictionary(frame);
+                if (frameObj.TryGetValue("data", out var data) && data is System.Collections.IList page)
+                {
+                    var entries = page.OfType<Dictionary<string, object>>().ToList();
+                    count += entries.Count;
+                    onPage(entries);
+                }
+            }
+            catch (Exception ex)
+            {
+                Logger.Warning($"[ChromaClient] Error handling entry page: {ex.Message}");
+            }
+        }, Timeout.InfiniteTimeSpan);
+
+        if (response == null || !IsStatus(response, "ok"))
+        {
+            Logger.Warning($"[ChromaClient] StreamEntries failed: {response ?? "no response"}");
+            return -1;
+        }
+        return count;
+    }
+
     /// <summary>
     /// Helper to safely get string value from dictionary.
     /// </summary>
@@ -342,41 +483,192 @@ public class ChromaClient
 
     /// <summary>
     /// Send a command and wait for response (synchronous).
+    /// update_background waits without a time limit; it may embed a large set on a cold model.
     /// </summary>
-    private string SendCommand(Dictionary<string, object> command)
+    private string SendCommand(Dictionary<string, object> command, Action<string> onFrame = null, TimeSpan? timeout = null)
     {
-        lock (_lock)
+        string action = command.ContainsKey("action") ? command["action"].ToString() : "unknown";
+        var wait = timeout ?? (action == "update_background" ? Timeout.InfiniteTimeSpan : CommandTimeout);
+        try
         {
-            try
+            if (_protocolVersion < 2)
             {
-                var json = SerializeDictToJson(command);
-                string action = command.ContainsKey("action") ? command["action"].ToString() : "unknown";
-                Logger.Debug($"[ChromaClient] Sending command: action={action}, json_length={json.Length}");
-                Logger.Debug($"[ChromaClient] Command JSON: {json}");
-                
-                _stdin.WriteLine(json);
-                _stdin.Flush();
-                Logger.Debug("[ChromaClient] Command sent to Python process");
-
-                // Read response with timeout
-                var responseTask = _stdout.ReadLineAsync();
-                if (command["action"].ToString()!="update_background" &&!responseTask.Wait(TimeSpan.FromSeconds(45)))
-                {
-                    Logger.Error("[ChromaClient] Command timeout - no response from Python process");
-                    return null;
-                }
+                return SendCommandV1(command, action, wait);
+            }
 
-                string response = responseTask.Result;
-                Logger.Debug($"[ChromaClient] Received response from Python: {response}");
-                return response;
+            var responseTask = BeginCommand(command, onFrame);
+            if (!responseTask.Wait(wait))
+            {
+                _pending.TryRemove(Convert.ToInt64(command["id"]), out _);
+                Logger.Error($"[ChromaClient] Command timeout - no response from Python process (action={action})");
+                return null;
             }
-            catch (Exception ex)
+
+            string response = responseTask.Result;
+            Logger.Debug($"[ChromaClient] Received response from Python: {response}");
+            return response;
+        }
+        catch (Exception ex)
+        {
+            Logger.Error($"[ChromaClient] Error sending command: {ex.GetType().Name}: {ex.Message}");
+            Logger.Debug($"[ChromaClient] Stack trace: {ex.StackTrace}");
+            return null;
+        }
+    }
+
+    /// <summary>
+    /// Send an id-tagged command (protocol version 2) without waiting.
+    /// The task completes with the final response line, or null if the process goes away.
+    /// </summary>
+    private Task<string> BeginCommand(Dictionary<string, object> command, Action<string> onFrame)
+    {
+        long id = Interlocked.Increment(ref _nextId);
+        var request = new PendingRequest { OnFrame = onFrame };
+        command["id"] = id;
+        _pending[id] = request;
+        try
+        {
+            WriteCommand(command);
+        }
+        catch
+        {
+            _pending.TryRemove(id, out _);
+            throw;
+        }
+        return request.Completion.Task;
+    }
+
+    /// <summary>
+    /// Protocol version 1: one command at a time, answered by the next line without an id.
+    /// </summary>
+    private string SendCommandV1(Dictionary<string, object> command, string action, TimeSpan wait)
+    {
+        lock (_v1Lock)
+        {
+            var request = new PendingRequest();
+            _v1Pending = request;
+            WriteCommand(command);
+
+            if (!request.Completion.Task.Wait(wait))
             {
-                Logger.Error($"[ChromaClient] Error sending command: {ex.GetType().Name}: {ex.Message}");
-                Logger.Debug($"[ChromaClient] Stack trace: {ex.StackTrace}");
+                // A late response is dropped by the reader instead of answering the next command
+                Interlocked.CompareExchange(ref _v1Pending, null, request);
+                Logger.Error($"[ChromaClient] Command timeout - no response from Python process (action={action})");
                 return null;
             }
+
+            string response = request.Completion.Task.Result;
+            Logger.Debug($"[ChromaClient] Received response from Python: {response}");
+            return response;
+        }
+    }
+
+    private void WriteCommand(Dictionary<string, object> command)
+    {
+        var json = SerializeDictToJson(command);
+        string action = command.ContainsKey("action") ? command["action"].ToString() : "unknown";
+        Logger.Debug($"[ChromaClient] Sending command: action={action}, json_length={json.Length}");
+        Logger.Debug($"[ChromaClient] Command JSON: {json}");
+
+        lock (_writeLock)
+        {
+            _stdin.WriteLine(json);
+            _stdin.Flush();
+        }
+        Logger.Debug("[ChromaClient] Command sent to Python process");
+    }
+
+    /// <summary>
+    /// Reader thread: hands every response line to the request it answers.
+    /// </summary>
+    private void ReadLoop()
+    {
+        try
+        {
+            string line;
+            while ((line = _stdout.ReadLine()) != null)
+            {
+                if (line.Length > 0)
+                    Dispatch(line);
+            }
+        }
+        catch (Exception ex)
+        {
+            Logger.Debug($"[ChromaClient] Reader stopped: {ex.GetType().Name}: {ex.Message}");
         }
+        finally
+        {
+            // The process is gone: nothing will answer the requests still waiting
+            foreach (var id in _pending.Keys)
+            {
+                if (_pending.TryRemove(id, out var request))
+                    request.Completion.TrySetResult(null);
+            }
+            Interlocked.Exchange(ref _v1Pending, null)?.Completion.TrySetResult(null);
+        }
+    }
+
+    private void Dispatch(string line)
+    {
+        var match = ResponseIdPattern.Match(line);
+        if (!match.Success)
+        {
+            var waiting = Interlocked.Exchange(ref _v1Pending, null);
+            if (waiting != null)
+                waiting.Completion.TrySetResult(line);
+            else
+                Logger.Warning($"[ChromaClient] Response without a waiting request: {line}");
+            return;
+        }
+
+        long id = long.Parse(match.Groups[1].Value, CultureInfo.InvariantCulture);
+        if (!_pending.TryGetValue(id, out var request))
+        {
+            Logger.Debug($"[ChromaClient] Late response for request {id} dropped");
+            return;
+        }
+        if (IsStatus(line, "progress") || OpenFramePattern.IsMatch(line))
+        {
+            // Intermediate frame; the request stays pending until its final response
+            request.OnFrame?.Invoke(line);
+            return;
+        }
+        if (_pending.TryRemove(id, out request))
+            request.Completion.TrySetResult(line);
+    }
+
+    /// <summary>
+    /// Poll the handshake until the CLI reports chromadb and the model as loaded.
+    /// </summary>
+    private void WaitUntilReady()
+    {
+        while (!_ready)
+        {
+            Thread.Sleep(ReadyPollInterval);
+            if (_pythonProcess == null || _pythonProcess.HasExited)
+                return;
+            var handshake = SendCommand(new Dictionary<string, object> { { "action", "handshake" } }, timeout: HandshakeTimeout);
+            if (handshake != null && ReadyPattern.IsMatch(handshake))
+            {
+                _ready = true;
+                Logger.Debug("[ChromaClient] ChromaManager finished warming up");
+            }
+        }
+    }
+
+    private void OnStderrLine(string line)
+    {
+        if (line == null)
+            return;
+        _stderrTail.Enqueue(line);
+        while (_stderrTail.Count > MaxStderrLines && _stderrTail.TryDequeue(out _)) { }
+        Logger.Debug($"[ChromaClient] Python: {line}");
+    }
+
+    private static bool IsStatus(string response, string status)
+    {
+        var match = StatusPattern.Match(response);
+        return match.Success && match.Groups[1].Value == status;
     }
 
     /// <summary>
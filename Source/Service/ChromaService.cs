@@ -105,6 +105,9 @@ public static class ChromaService
         if (!_initialized || _client == null)
             return;
 
+        // Read on the calling (main) thread; TickManager is not thread-safe
+        long tick = Find.TickManager.TicksAbs;
+
         Task.Run(() =>
         {
             try
@@ -117,7 +120,8 @@ public static class ChromaService
                     responses,
                     speakers,
                     listeners,
-                    gameDate
+                    gameDate,
+                    tick
                 );
             }
             catch (Exception ex)
@@ -99,14 +99,22 @@ public static class JsonUtil
         var result = new List<string>();
         int depth = 0;
         int start = 0;
+        bool inString = false;
         
         for (int i = 0; i < inner.Length; i++)
         {
             char c = inner[i];
             
-            if (c == '{' || c == '[') depth++;
+            // Brackets and commas inside string values are text
+            if (inString)
+            {
+                if (c == '\\') i++;
+                else if (c == '"') inString = false;
+            }
+            else if (c == '"') inString = true;
+            else if (c == '{' || c == '[') depth++;
             else if (c == '}' || c == ']') depth--;
-            else if (c == ','&&(inner[i-1]=='\"'||inner[i-1]==']'||inner[i-1]=='}')&&(inner[i+1]=='\"'||inner[i+1]=='{')&& depth == 0)
+            else if (c == ',' && depth == 0)
             {
                 result.Add(inner.Substring(start, i - start));
                 start = i + 1;
@@ -1,53 +1,326 @@
-import requests
+import asyncio
+import hashlib
 import json
+import math
+import os
+import random
+import re
+import threading
 import time
-from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import requests
+
+
+class APIError(Exception):
+    """API 请求失败；retry_after 为服务端要求的等待秒数（Retry-After）"""
+
+    def __init__(self, message: str, retryable: bool = True, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 头（秒数或 HTTP 日期）"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _char_tokens(ch: str) -> float:
+    # 中日韩字符与全角标点约 1 个 token，其余（拉丁字母、数字、半角标点）约 4 个字符 1 个 token
+    return 1.0 if ord(ch) >= 0x2E80 else 0.25
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算文本的 token 数（偏保守）"""
+    return int(math.ceil(sum(_char_tokens(ch) for ch in text)))
+
+
+# 句末标点、后面不是数字的英文句点、以及数据中的字面 "\n" 之后都可以断开
+_BREAK = re.compile(r'(?<=[。！？!?；;])|(?<=\.)(?!\d)|(?<=\\n)')
+
+
+def _hard_split(text: str, budget: int) -> List[str]:
+    """按字符切分，每段不超过 budget 个估算 token"""
+    pieces, current, tokens = [], "", 0.0
+    for ch in text:
+        cost = _char_tokens(ch)
+        if current and tokens + cost > budget:
+            pieces.append(current)
+            current, tokens = "", 0.0
+        current += ch
+        tokens += cost
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_line(line: str, budget: int) -> List[str]:
+    """
+    把超长的 "名称:描述" 行拆成多段，每段不超过 budget 个估算 token。
+    优先在句子与段落边界断开；每段都带上条目名称，以便模型保持名称一致。
+    """
+    name, sep, body = line.partition(":")
+    if not sep or estimate_tokens(name) * 2 > budget:
+        name, sep, body = "", "", line
+    prefix = name + sep
+    room = max(1, budget - estimate_tokens(prefix))
+
+    parts, current = [], ""
+    for sentence in _BREAK.split(body):
+        for piece in (_hard_split(sentence, room) if estimate_tokens(sentence) > room else [sentence]):
+            if current and estimate_tokens(current + piece) > room:
+                parts.append(current)
+                current = ""
+            current += piece
+    if current:
+        parts.append(current)
+    if len(parts) <= 1:
+        return [line]
+    return [prefix + part for part in parts]
+
+
+class Chunk:
+    """
+    一个请求的数据：若干文本行及其在源文件中的行号（从 1 开始）。
+    超长行拆出的段落只含一行，parts 记录它是第几段，如 ((2, 3),) 表示 3 段中的第 2 段。
+    """
+
+    __slots__ = ("lines", "numbers", "parts")
+
+    def __init__(self, lines: List[str], numbers: List[int], parts: Tuple[Tuple[int, int], ...] = ()):
+        self.lines = lines
+        self.numbers = numbers
+        self.parts = parts
+
+    @property
+    def first_line(self) -> int:
+        return self.numbers[0]
+
+    @property
+    def last_line(self) -> int:
+        return self.numbers[-1]
+
+    @property
+    def tokens(self) -> int:
+        return sum(estimate_tokens(line) + 1 for line in self.lines)
+
+    def describe(self) -> str:
+        text = f"行 {self.first_line}" if self.first_line == self.last_line else f"行 {self.first_line}-{self.last_line}"
+        if self.parts:
+            text += "（第 " + " / ".join(f"{i}/{n}" for i, n in self.parts) + " 段）"
+        return text
+
+    def split(self) -> List["Chunk"]:
+        """对半拆分（单行时按句子拆成两半左右），无法再拆时返回空列表"""
+        if len(self.lines) > 1:
+            middle = len(self.lines) // 2
+            return [
+                Chunk(self.lines[:middle], self.numbers[:middle], self.parts),
+                Chunk(self.lines[middle:], self.numbers[middle:], self.parts),
+            ]
+        pieces = split_line(self.lines[0], max(1, (self.tokens + 1) // 2))
+        if len(pieces) < 2:
+            return []
+        return [
+            Chunk([piece], self.numbers, self.parts + ((i, len(pieces)),))
+            for i, piece in enumerate(pieces, 1)
+        ]
+
+
+class TokenBucket:
+    """
+    令牌桶限速：平均每秒 rate 个请求，最多连续突发 burst 个。
+    收到 Retry-After 时整个桶暂停，所有并发请求一起等待。
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        """在 seconds 秒内不再放行请求，之后从空桶开始按速率放行，避免所有请求同时重发"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+        self.updated = self.paused_until
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                if self.rate <= 0:
+                    return
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class OrderedResultWriter:
+    """
+    按输入顺序写结果文件，并把每个完成的数据块记入检查点。
+
+    检查点每行一个 JSON（数据块内容指纹、源文件行号范围、结果），数据块完成即追加，
+    中断后重新运行时指纹一致的数据块直接复用。另有一个映射文件，逐块记录
+    结果文件中的行号范围对应源文件中的哪些行。
+    """
+
+    def __init__(self, result_file: str, checkpoint_file: str, map_file: str):
+        self.result_file = result_file
+        self.checkpoint_file = checkpoint_file
+        self.map_file = map_file
+        self.records: Dict[str, Dict] = {}
+        self._pending: Dict[int, Tuple[Chunk, Optional[str]]] = {}
+        self._next = 0
+        self._result_lines = 0
+        self._result = None
+        self._map = None
+        self._checkpoint = None
+
+    def load_checkpoint(self) -> Dict[str, str]:
+        """读取检查点：内容指纹 -> 结果"""
+        if not os.path.exists(self.checkpoint_file):
+            return {}
+        with open(self.checkpoint_file, 'r', encoding='utf-8') as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                    self.records[record["fingerprint"]] = record
+                except (ValueError, KeyError, TypeError):
+                    # 中断时写了一半的最后一行
+                    continue
+        return {fingerprint: record["result"] for fingerprint, record in self.records.items()}
+
+    def open(self):
+        """清空结果文件与映射文件，检查点改为追加"""
+        self._result = open(self.result_file, 'w', encoding='utf-8')
+        self._map = open(self.map_file, 'w', encoding='utf-8')
+        self._checkpoint = open(self.checkpoint_file, 'a', encoding='utf-8')
+
+    def complete(self, index: int, chunk: Chunk, fingerprint: str, result: Optional[str], resumed: bool = False):
+        """登记第 index 个数据块的结果（None 表示失败，结果文件中跳过）"""
+        if result is not None and not resumed:
+            record = {"fingerprint": fingerprint, "lines": [chunk.first_line, chunk.last_line], "result": result}
+            self.records[fingerprint] = record
+            self._checkpoint.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._checkpoint.flush()
+        self._pending[index] = (chunk, result)
+        self._drain()
+
+    def _drain(self):
+        while self._next in self._pending:
+            chunk, result = self._pending.pop(self._next)
+            entry = {"chunk": self._next, "source_lines": [chunk.first_line, chunk.last_line]}
+            if chunk.parts:
+                entry["parts"] = [list(part) for part in chunk.parts]
+            if result is not None:
+                self._result.write(f"{result}\n")
+                count = result.count("\n") + 1
+                entry["result_lines"] = [self._result_lines + 1, self._result_lines + count]
+                self._result_lines += count
+            else:
+                entry["failed"] = True
+            self._map.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._next += 1
+        self._result.flush()
+        self._map.flush()
+
+    def close(self, used: Optional[Set[str]] = None):
+        """关闭文件；给出本次用到的指纹时，检查点压缩为只保留这些记录"""
+        for file in (self._result, self._map, self._checkpoint):
+            if file is not None:
+                file.close()
+        if used is None:
+            return
+        tmp_file = self.checkpoint_file + ".tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as file:
+            for fingerprint, record in self.records.items():
+                if fingerprint in used:
+                    file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        os.replace(tmp_file, self.checkpoint_file)
+
 
 class DeepSeekProcessor:
-    def __init__(self, api_key: str, base_url: str = "https://api.deepseek.com/v1/chat/completions"):
+    def __init__(self, api_key: str, base_url: str = "https://api.deepseek.com/v1/chat/completions",
+                 model: str = "deepseek-chat", max_tokens: int = 4000):
         self.api_key = api_key
         self.base_url = base_url
+        self.model = model
+        self.max_tokens = max_tokens
         self.headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {api_key}"
         }
-    
-    def read_data_in_chunks(self, filename: str, chunk_size: int = 50) -> List[str]:
-        """从文件中按指定大小读取数据块"""
-        chunks = []
-        current_chunk = []
-        
-        try:
-            with open(filename, 'r', encoding='utf-8') as file:
-                for i, line in enumerate(file, 1):
-                    current_chunk.append(line.strip())
-                    if i % chunk_size == 0:
-                        chunks.append(current_chunk)
-                        current_chunk = []
-                
-                # 添加最后不足chunk_size的行
-                if current_chunk:
-                    chunks.append(current_chunk)
-            
-            print(f"成功读取文件，共分成 {len(chunks)} 个数据块")
-            return chunks
-        
-        except FileNotFoundError:
-            print(f"错误：文件 {filename} 未找到")
-            return []
-        except Exception as e:
-            print(f"读取文件时发生错误：{e}")
-            return []
-    
+        # 每个线程一个会话，复用连接
+        self._local = threading.local()
+
+    def iter_chunks(self, filename: str, max_input_tokens: int = 2000,
+                    max_lines: Optional[int] = None) -> Iterator[Chunk]:
+        """
+        逐行读取文件，按估算 token 数把行打包成数据块（不会一次读入整个文件）。
+        超过预算的单行按句子拆成多段，每段单独成块；空行跳过，行号仍按源文件计算。
+        """
+        lines: List[str] = []
+        numbers: List[int] = []
+        tokens = 0
+        with open(filename, 'r', encoding='utf-8') as file:
+            for number, raw in enumerate(file, 1):
+                line = raw.strip()
+                if not line:
+                    continue
+                cost = estimate_tokens(line) + 1
+                if cost > max_input_tokens:
+                    if lines:
+                        yield Chunk(lines, numbers)
+                        lines, numbers, tokens = [], [], 0
+                    pieces = split_line(line, max_input_tokens - 1)
+                    for i, piece in enumerate(pieces, 1):
+                        yield Chunk([piece], [number], ((i, len(pieces)),) if len(pieces) > 1 else ())
+                    continue
+                if lines and (tokens + cost > max_input_tokens or (max_lines and len(lines) >= max_lines)):
+                    yield Chunk(lines, numbers)
+                    lines, numbers, tokens = [], [], 0
+                lines.append(line)
+                numbers.append(number)
+                tokens += cost
+        if lines:
+            yield Chunk(lines, numbers)
+
     def create_prompt(self, custom_prompt: str, data_chunk: List[str]) -> str:
         """创建自定义提示词"""
         data_text = "\n".join(data_chunk)
         return f"{custom_prompt}\n\n数据：\n{data_text}"
-    
-    def send_to_deepseek(self, prompt: str, max_retries: int = 3) -> Optional[str]:
-        """发送请求到DeepSeek API"""
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def request_once(self, prompt: str) -> Tuple[str, Optional[str]]:
+        """发送一次请求，返回（回复内容, finish_reason）；失败时抛出 APIError"""
         payload = {
-            "model": "deepseek-chat",
+            "model": self.model,
             "messages": [
                 {
                     "role": "user",
@@ -56,37 +329,71 @@ class DeepSeekProcessor:
             ],
             "stream": False,
             "temperature": 0.7,
-            "max_tokens": 4000
+            "max_tokens": self.max_tokens
         }
-        
+        try:
+            response = self._session().post(
+                self.base_url,
+                headers=self.headers,
+                data=json.dumps(payload),
+                timeout=120
+            )
+        except requests.exceptions.Timeout:
+            raise APIError("请求超时")
+        except requests.exceptions.RequestException as e:
+            raise APIError(f"请求发生错误: {e}")
+
+        if response.status_code == 200:
+            choice = response.json()['choices'][0]
+            return choice['message']['content'], choice.get('finish_reason')
+        # 限流与服务端错误可以重试，其余（参数、鉴权错误）重试也不会成功
+        retryable = response.status_code in (408, 409, 429) or response.status_code >= 500
+        raise APIError(
+            f"{response.status_code} - {response.text[:500]}",
+            retryable=retryable,
+            retry_after=parse_retry_after(response.headers.get("Retry-After"))
+        )
+
+    def send_to_deepseek(self, prompt: str, max_retries: int = 3) -> Optional[str]:
+        """发送请求到DeepSeek API（同步版本，逐个请求使用）"""
         for attempt in range(max_retries):
             try:
-                response = requests.post(
-                    self.base_url,
-                    headers=self.headers,
-                    data=json.dumps(payload),
-                    timeout=120
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    return result['choices'][0]['message']['content']
-                else:
-                    print(f"API请求失败 (尝试 {attempt + 1}/{max_retries}): {response.status_code} - {response.text}")
-                    if attempt < max_retries - 1:
-                        time.sleep(2 ** attempt)  # 指数退避
-                    
-            except requests.exceptions.Timeout:
-                print(f"请求超时 (尝试 {attempt + 1}/{max_retries})")
+                return self.request_once(prompt)[0]
+            except APIError as e:
+                print(f"API请求失败 (尝试 {attempt + 1}/{max_retries}): {e}")
+                if not e.retryable:
+                    break
                 if attempt < max_retries - 1:
-                    time.sleep(2 ** attempt)
-            except Exception as e:
-                print(f"请求发生错误 (尝试 {attempt + 1}/{max_retries}): {e}")
-                if attempt < max_retries - 1:
-                    time.sleep(2 ** attempt)
-        
+                    time.sleep(e.retry_after if e.retry_after is not None else 2 ** attempt)  # 指数退避
+
         return None
-    
+
+    async def send_async(self, prompt: str, limiter: TokenBucket, executor: ThreadPoolExecutor,
+                         max_retries: int = 5, label: str = "",
+                         max_rate_limited: int = 50) -> Optional[Tuple[str, Optional[str]]]:
+        """
+        限速并重试地发送请求，返回（回复内容, finish_reason），失败返回 None。带 Retry-After 的限流响应让所有请求一起暂停，
+        且不计入 max_retries（最多等待 max_rate_limited 次）；其他错误指数退避加随机抖动。
+        """
+        loop = asyncio.get_running_loop()
+        attempt = 0
+        rate_limited = 0
+        while True:
+            await limiter.acquire()
+            try:
+                return await loop.run_in_executor(executor, self.request_once, prompt)
+            except APIError as e:
+                if e.retry_after is not None and e.retryable and rate_limited < max_rate_limited:
+                    rate_limited += 1
+                    print(f"{label}被限流，{e.retry_after:.1f} 秒后重试: {e}")
+                    limiter.pause(e.retry_after)
+                    continue
+                attempt += 1
+                print(f"{label}API请求失败 (尝试 {attempt}/{max_retries}): {e}")
+                if not e.retryable or attempt >= max_retries:
+                    return None
+                await asyncio.sleep(2 ** (attempt - 1) + random.uniform(0, 1))
+
     def save_result(self, result: str, filename: str = "result.txt"):
         """保存结果到文件"""
         try:
@@ -96,76 +403,166 @@ class DeepSeekProcessor:
         except Exception as e:
             print(f"保存结果时发生错误：{e}")
             return False
-    
-    def process_data(self, 
-                    data_file: str = "data.txt", 
+
+    async def process_chunk(self, chunk: Chunk, custom_prompt: str, limiter: TokenBucket,
+                            executor: ThreadPoolExecutor, max_retries: int, label: str) -> Optional[str]:
+        """发送一个数据块；输出被截断（finish_reason 为 length）时把它拆开单独重试"""
+        reply = await self.send_async(self.create_prompt(custom_prompt, chunk.lines), limiter, executor,
+                                      max_retries, f"{label}{chunk.describe()} ")
+        if reply is None:
+            return None
+        content, finish_reason = reply
+        if finish_reason != "length":
+            return content
+
+        pieces = chunk.split()
+        if not pieces:
+            print(f"{label}{chunk.describe()} 输出被截断且无法再拆分，保留截断的结果")
+            return content
+        print(f"{label}{chunk.describe()} 输出被截断，拆成 {len(pieces)} 块重试")
+        results = []
+        for piece in pieces:
+            result = await self.process_chunk(piece, custom_prompt, limiter, executor, max_retries, label)
+            if result is None:
+                return None
+            results.append(result)
+        return "\n".join(results)
+
+    def process_data(self,
+                    data_file: str = "data.txt",
                     result_file: str = "result.txt",
                     custom_prompt: str = "请分析以下数据：",
-                    chunk_size: int = 50,
-                    delay_between_requests: float = 1.0):
-        """主处理函数"""
-        
-        # 读取数据块
-        chunks = self.read_data_in_chunks(data_file, chunk_size)
-        if not chunks:
-            print("没有数据可处理")
-            return
-        
-        # 清空或创建结果文件
-        open(result_file, 'w', encoding='utf-8').close()
-        
-        total_chunks = len(chunks)
-        successful_requests = 0
-        
-        print(f"开始处理 {total_chunks} 个数据块...")
-        
-        for i, chunk in enumerate(chunks, 1):
-            print(f"处理第 {i}/{total_chunks} 个数据块...")
-            
-            # 创建提示词
-            prompt = self.create_prompt(custom_prompt, chunk)
-            
-            # 发送到DeepSeek
-            result = self.send_to_deepseek(prompt)
-            
-            if result:
-                # 保存结果
-                if self.save_result(result, result_file):
-                    successful_requests += 1
-                    print(f"✓ 第 {i} 个数据块处理完成并保存")
+                    max_input_tokens: int = 2000,
+                    output_ratio: float = 1.5,
+                    max_lines: Optional[int] = None,
+                    concurrency: int = 4,
+                    requests_per_second: float = 2.0,
+                    max_retries: int = 5,
+                    resume: bool = True) -> Dict:
+        """
+        主处理函数：并发发送数据块，结果按输入顺序写入 result_file。
+
+        数据块按估算 token 数打包：输入不超过 max_input_tokens，且按 output_ratio
+        （输出与输入 token 之比）估算的输出留在 max_tokens 的 80% 以内。
+        同时最多 concurrency 个请求，整体不超过 requests_per_second（0 表示不限速）。
+        已完成的数据块记录在 result_file + ".checkpoint.jsonl"，resume 时跳过，
+        因此中断后重新运行只处理剩余的数据块。result_file + ".map.jsonl" 记录
+        每个数据块的源文件行号与结果文件行号。
+        """
+        return asyncio.run(self.process_data_async(
+            data_file, result_file, custom_prompt, max_input_tokens, output_ratio, max_lines,
+            concurrency, requests_per_second, max_retries, resume
+        ))
+
+    async def process_data_async(self,
+                                 data_file: str = "data.txt",
+                                 result_file: str = "result.txt",
+                                 custom_prompt: str = "请分析以下数据：",
+                                 max_input_tokens: int = 2000,
+                                 output_ratio: float = 1.5,
+                                 max_lines: Optional[int] = None,
+                                 concurrency: int = 4,
+                                 requests_per_second: float = 2.0,
+                                 max_retries: int = 5,
+                                 resume: bool = True) -> Dict:
+        """process_data 的异步实现，可在已有事件循环中使用"""
+        if not os.path.exists(data_file):
+            print(f"错误：文件 {data_file} 未找到")
+            return {"total": 0, "succeeded": 0, "failed": 0, "resumed": 0, "seconds": 0.0}
+
+        # 输出预算：max_tokens 留 20% 余量
+        budget = max(16, min(max_input_tokens, int(self.max_tokens * 0.8 / max(output_ratio, 0.01))))
+
+        writer = OrderedResultWriter(result_file, result_file + ".checkpoint.jsonl", result_file + ".map.jsonl")
+        done = writer.load_checkpoint() if resume else {}
+        writer.open()
+
+        limiter = TokenBucket(requests_per_second, burst=concurrency)
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        executor = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="send")
+        stats = {"succeeded": 0, "failed": 0, "resumed": 0}
+        used: Set[str] = set()
+        start = time.perf_counter()
+
+        async def run(index: int, chunk: Chunk, fingerprint: str):
+            try:
+                label = f"[{index + 1}] "
+                result = await self.process_chunk(chunk, custom_prompt, limiter, executor, max_retries, label)
+                if result:
+                    stats["succeeded"] += 1
+                    print(f"✓ 第 {index + 1} 个数据块（{chunk.describe()}）处理完成")
                 else:
-                    print(f"✗ 第 {i} 个数据块结果保存失败")
-            else:
-                print(f"✗ 第 {i} 个数据块处理失败")
-            
-            # 添加延迟，避免请求过于频繁
-            if i < total_chunks:
-                print(f"等待 {delay_between_requests} 秒后继续...")
-                time.sleep(delay_between_requests)
-        
-        print(f"\n处理完成！成功处理 {successful_requests}/{total_chunks} 个数据块")
+                    result = None
+                    stats["failed"] += 1
+                    print(f"✗ 第 {index + 1} 个数据块（{chunk.describe()}）处理失败")
+                writer.complete(index, chunk, fingerprint, result)
+            finally:
+                semaphore.release()
+
+        print(f"开始处理（每块约 {budget} token，并发 {concurrency}，限速 {requests_per_second}/秒）...")
+        tasks = []
+        total_chunks = 0
+        completed = False
+        try:
+            for index, chunk in enumerate(self.iter_chunks(data_file, budget, max_lines)):
+                total_chunks += 1
+                prompt = self.create_prompt(custom_prompt, chunk.lines)
+                fingerprint = hashlib.sha1(f"{self.model}\n{self.max_tokens}\n{prompt}".encode('utf-8')).hexdigest()
+                used.add(fingerprint)
+                if fingerprint in done:
+                    stats["resumed"] += 1
+                    writer.complete(index, chunk, fingerprint, done[fingerprint], resumed=True)
+                    continue
+                await semaphore.acquire()
+                tasks.append(asyncio.create_task(run(index, chunk, fingerprint)))
+            await asyncio.gather(*tasks)
+            completed = True
+        finally:
+            for task in tasks:
+                task.cancel()
+            executor.shutdown(wait=False)
+            writer.close(used if completed else None)
+
+        elapsed = time.perf_counter() - start
+        if stats["resumed"]:
+            print(f"从检查点恢复 {stats['resumed']} 个数据块")
+        print(f"\n处理完成！成功处理 {stats['succeeded'] + stats['resumed']}/{total_chunks} 个数据块，用时 {elapsed:.1f} 秒")
+        if stats["failed"]:
+            print(f"{stats['failed']} 个数据块失败，重新运行即可只处理这些数据块")
         print(f"结果已保存到 {result_file}")
+        return {
+            "total": total_chunks,
+            "succeeded": stats["succeeded"],
+            "failed": stats["failed"],
+            "resumed": stats["resumed"],
+            "seconds": elapsed,
+        }
 
 def main():
     # 配置参数
-    API_KEY = "YOUR_DEEPSEEK_API_KEY"  # 替换为您的DeepSeek API密钥
+    API_KEY = os.environ.get("DEEPSEEK_API_KEY", "YOUR_DEEPSEEK_API_KEY")  # 替换为您的DeepSeek API密钥
+    BASE_URL = os.environ.get("DEEPSEEK_BASE_URL", "https://api.deepseek.com/v1/chat/completions")
     DATA_FILE = "data.txt"
     RESULT_FILE = "result.txt"
     CUSTOM_PROMPT = "请分析以下文本数据，将每一行输入根据语义拆解成一个或多个条目，拆解后条目名称与原条目完全一致。每个拆解后的条目分别占一行。条目输出格式（按照格式化字符串处理）：\n{条目名称}{使用文字连贯地衔接,不要用冒号}{描述}。\n不要输出其他内容"  # 可自定义的提示词
-    CHUNK_SIZE = 50  # 每次处理的行数
-    DELAY = .5  # 请求间隔时间（秒）
-    
+    MAX_INPUT_TOKENS = 2000  # 每个数据块的输入 token 预算（估算）
+    OUTPUT_RATIO = 1.5  # 预计输出与输入 token 之比，用于让输出留在 max_tokens 以内
+    CONCURRENCY = 4  # 同时进行的请求数
+    REQUESTS_PER_SECOND = 2.0  # 请求速率上限（0 表示不限）
+
     # 创建处理器实例
-    processor = DeepSeekProcessor(API_KEY)
-    
-    # 开始处理数据
+    processor = DeepSeekProcessor(API_KEY, BASE_URL)
+
+    # 开始处理数据（中断后重新运行会从检查点继续）
     processor.process_data(
         data_file=DATA_FILE,
         result_file=RESULT_FILE,
         custom_prompt=CUSTOM_PROMPT,
-        chunk_size=CHUNK_SIZE,
-        delay_between_requests=DELAY
+        max_input_tokens=MAX_INPUT_TOKENS,
+        output_ratio=OUTPUT_RATIO,
+        concurrency=CONCURRENCY,
+        requests_per_second=REQUESTS_PER_SECOND
     )
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,191 @@
+"""
+本地 OpenAI 兼容桩服务器，用于离线测试 send.py 与测量吞吐量。
+
+/v1/chat/completions 按行回显提示词中"数据："之后的内容，模拟固定延迟，
+可按设定速率限流（超出时返回 429 与 Retry-After）并随机返回 500。
+回复超过请求的 max_tokens（按字符计）时截断并返回 finish_reason "length"。
+
+用法：
+    python stub_openai_server.py --port 8000 [--latency 0.5] [--rate 5] [--error-rate 0.05]
+    python stub_openai_server.py --bench [--concurrency 1 4 8] [--latency 0.5] [--rate 0]
+"""
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubState:
+    """桩服务器配置与计数（服务端令牌桶限流）"""
+
+    def __init__(self, latency: float = 0.5, rate: float = 0.0, burst: int = 1, error_rate: float = 0.0):
+        self.latency = latency
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.error_rate = error_rate
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self.counts = {"requests": 0, "ok": 0, "rate_limited": 0, "errors": 0}
+
+    def admit(self) -> float:
+        """放行返回 0，否则返回需要等待的秒数"""
+        with self._lock:
+            self.counts["requests"] += 1
+            if self.rate <= 0:
+                return 0.0
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            self.counts["rate_limited"] += 1
+            return (1 - self._tokens) / self.rate
+
+    def count(self, key: str):
+        with self._lock:
+            self.counts[key] += 1
+
+
+def make_handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, status: int, body: dict, headers: dict = None):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                payload = json.loads(self.rfile.read(length).decode("utf-8"))
+            except ValueError:
+                return self._reply(400, {"error": {"message": "invalid JSON"}})
+            if not self.path.rstrip("/").endswith("chat/completions"):
+                return self._reply(404, {"error": {"message": f"unknown path {self.path}"}})
+
+            wait = state.admit()
+            if wait > 0:
+                # Retry-After 只能是整数秒
+                return self._reply(429, {"error": {"message": "rate limited"}},
+                                   {"Retry-After": str(max(1, math.ceil(wait)))})
+            if state.error_rate and random.random() < state.error_rate:
+                state.count("errors")
+                return self._reply(500, {"error": {"message": "injected failure"}})
+
+            time.sleep(state.latency)
+            prompt = payload["messages"][-1]["content"]
+            _, _, data = prompt.partition("\n\n数据：\n")
+            lines = [line for line in data.split("\n") if line]
+            content = "\n".join(lines)
+            finish_reason = "stop"
+            max_tokens = payload.get("max_tokens")
+            if max_tokens and len(content) > max_tokens:
+                content = content[:max_tokens]
+                finish_reason = "length"
+            state.count("ok")
+            self._reply(200, {
+                "id": f"stub-{time.time_ns()}",
+                "object": "chat.completion",
+                "model": payload.get("model", "stub"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": finish_reason,
+                }],
+                "usage": {"prompt_tokens": len(prompt), "completion_tokens": len(content),
+                          "total_tokens": len(prompt) + len(content)},
+            })
+
+    return Handler
+
+
+def start_server(state: StubState, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """在后台线程启动桩服务器（port 为 0 时自动选择端口）"""
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="stub-openai", daemon=True).start()
+    return server
+
+
+def bench(args):
+    """对每个并发数完整运行一次 send.py 流水线，输出吞吐量"""
+    from send import DeepSeekProcessor
+
+    results = []
+    for concurrency in args.concurrency:
+        state = StubState(args.latency, args.rate, args.burst, args.error_rate)
+        server = start_server(state)
+        workdir = tempfile.mkdtemp(prefix="send_bench_")
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+            processor = DeepSeekProcessor("stub", url)
+            summary = processor.process_data(
+                data_file=args.data,
+                result_file=os.path.join(workdir, "result.txt"),
+                max_input_tokens=args.max_input_tokens,
+                concurrency=concurrency,
+                requests_per_second=args.client_rate,
+                resume=False
+            )
+            summary.update({
+                "concurrency": concurrency,
+                "chunks_per_s": summary["total"] / summary["seconds"] if summary["seconds"] else None,
+                "server": dict(state.counts),
+            })
+            results.append(summary)
+        finally:
+            server.shutdown()
+            server.server_close()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps({"latency": args.latency, "server_rate": args.rate, "client_rate": args.client_rate,
+                      "results": results}, indent=2, ensure_ascii=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub server for send.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds per completion")
+    parser.add_argument("--rate", type=float, default=0.0, help="Requests/s admitted before 429 (0 = unlimited)")
+    parser.add_argument("--burst", type=int, default=1)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--bench", action="store_true", help="Run send.py against an in-process server")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--client-rate", type=float, default=0.0, help="requests_per_second used by send.py")
+    parser.add_argument("--max-input-tokens", type=int, default=2000)
+    parser.add_argument("--data", default="data.txt")
+    args = parser.parse_args()
+
+    if args.bench:
+        bench(args)
+        return
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(
+        StubState(args.latency, args.rate, args.burst, args.error_rate)))
+    print(f"Stub server on http://{args.host}:{args.port}/v1/chat/completions")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()